@@ -1,32 +1,51 @@
 import tkinter as tk
 from tkinter import messagebox, ttk
-import json
-from tkinter.scrolledtext import ScrolledText
 from datetime import datetime
 import os
-
-# Función para cargar el archivo JSON proporcionado por el usuario
+import ResultTable
+import SQLiteStore
+import TableModel
+import TaskProgress
+import TaskRunner
+import TicketStore
+
+# Los cálculos (monthly_balance, annual_balance, transactions_by_concept) no usan tkinter
+# y devuelven su resultado; las funciones calculate_*/show_* lo muestran. Si las
+# transacciones vienen de SQLite (SQLiteStore.TransactionQueries), el cálculo se le delega.
+# Las funciones calculate_* ejecutan el cálculo en un hilo de trabajo (TaskRunner); con
+# `task`, los cálculos informan del avance cada TaskProgress.PROGRESS_STEP transacciones.
+
+# Leer las transacciones de una cuenta: el JSON de un extracto o el almacén al que se
+# añaden los extractos (TicketAnalyzer.merge_bank_statement). El JSON de un extracto se
+# usa en su orden, como siempre; el almacén se ordena de la más reciente a la más
+# antigua, como en un extracto, aunque los extractos se hayan importado en otro orden
+# (las del mismo día conservan el orden en que aparecían).
+def read_bank_data(path):
+    return TicketStore.read_sorted_records(
+        path, lambda transaction: datetime.strptime(transaction['fecha_oper'], '%d/%m/%Y'), reverse=True)
+
+# Función para cargar el archivo JSON proporcionado por el usuario. No usa tkinter (se
+# ejecuta en un hilo de trabajo); los errores se muestran en load_bank_data_and_start.
 def load_bank_data_by_filename(filename):
     file_with_extension = f"{filename}.json"
-    if os.path.exists(file_with_extension):
-        try:
-            with open(file_with_extension, 'r', encoding='utf-8') as f:
-                bank_data = json.load(f)
-            return bank_data
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo cargar el archivo: {e}")
-    else:
-        messagebox.showerror("Error", f"El archivo {file_with_extension} no existe.")
-    return None
-
-# Calcular el balance de un mes y año dados
-def calculate_monthly_balance(bank_data, month, year):
+    if not TicketStore.store_exists(file_with_extension):
+        raise FileNotFoundError(f"El archivo {file_with_extension} no existe.")
+    if SQLiteStore.ENABLED:
+        return SQLiteStore.load_account(os.path.basename(filename), file_with_extension)
+    return read_bank_data(file_with_extension)
+
+# Balance de un mes y año dados: (transacciones, balance, saldo inicial, saldo final)
+def monthly_balance(bank_data, month, year, task=None):
+    if isinstance(bank_data, SQLiteStore.TransactionQueries):
+        return bank_data.monthly_balance(month, year)
     balance = 0.0
     transactions_in_month = []
     earliest_transaction = None
     latest_transaction = None
 
-    for transaction in bank_data:
+    for index, transaction in enumerate(bank_data):
+        if task is not None and index % TaskProgress.PROGRESS_STEP == 0:
+            task.progress(index, len(bank_data))
         transaction_date_str = transaction['fecha_oper']
         transaction_date = datetime.strptime(transaction_date_str, '%d/%m/%Y')
 
@@ -44,9 +63,13 @@ def calculate_monthly_balance(bank_data, month, year):
     # Buscar el saldo más temprano y más reciente
     saldo_final = transactions_in_month[0]['saldo'] if transactions_in_month else 'N/A'
     saldo_inicial = transactions_in_month[-1]['saldo'] if transactions_in_month else 'N/A'
+    return transactions_in_month, balance, saldo_inicial, saldo_final
 
-    # Mostrar el balance en una ventana
-    show_monthly_balance(transactions_in_month, balance, saldo_inicial, saldo_final, month, year)
+# Calcular el balance de un mes y año dados
+def calculate_monthly_balance(bank_data, month, year):
+    # Calcular en segundo plano y mostrar el balance en una ventana
+    TaskRunner.submit("balance mensual", monthly_balance, (bank_data, month, year), progress=True,
+                      on_done=lambda result: show_monthly_balance(*result, month, year))
 
 
 # Mostrar el balance mensual en una nueva ventana con scroll
@@ -54,27 +77,8 @@ def show_monthly_balance(transactions, balance, saldo_inicial, saldo_final, mont
     month_names = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
     month_name = month_names[month - 1]
 
-    balance_window = tk.Toplevel()
-    balance_window.title(f"Balance de {month_name} {year}")
-    balance_window.geometry("500x400")
-
-    scrolled_text = ScrolledText(balance_window, wrap=tk.WORD, width=60, height=20)
-    scrolled_text.pack(pady=10, padx=10)
-
-    # Mostrar primero el saldo inicial y final, luego el balance total del mes
-    scrolled_text.insert(tk.END, f"Saldo inicial: {saldo_inicial} €\n")
-    scrolled_text.insert(tk.END, f"Saldo final: {saldo_final} €\n\n")
-    scrolled_text.insert(tk.END, f"Balance total de {month_name} {year}: {balance:.2f} €\n\n")
-
-    # Luego mostrar las transacciones
-    scrolled_text.insert(tk.END, "Transacciones del mes:\n\n")
-    for item in transactions:
-        scrolled_text.insert(tk.END, f"Fecha: {item['fecha_oper']}\n")
-        scrolled_text.insert(tk.END, f"Concepto: {item['concepto']}\n")
-        scrolled_text.insert(tk.END, f"Importe: {item['importe']} €\n")
-        scrolled_text.insert(tk.END, f"Saldo: {item['saldo']} €\n\n")
-
-    scrolled_text.config(state=tk.DISABLED)
+    show_balance(f"Balance de {month_name} {year}", f"Balance total de {month_name} {year}",
+                 transactions, balance, saldo_inicial, saldo_final)
 
 
 # Ventana para seleccionar el mes y año
@@ -113,9 +117,25 @@ def ask_for_filename():
 
     submit_button = tk.Button(filename_window, text="Cargar Archivo", command=lambda: load_bank_data_and_start(filename_entry.get()))
     submit_button.pack(pady=10)
+# Transacciones cuyo concepto contiene el texto dado (sin distinguir mayúsculas)
+def transactions_by_concept(bank_data, concept, task=None):
+    if isinstance(bank_data, SQLiteStore.TransactionQueries):
+        return bank_data.transactions_by_concept(concept)
+    concept = concept.lower()
+    filtered_transactions = []
+    for index, item in enumerate(bank_data):
+        if task is not None and index % TaskProgress.PROGRESS_STEP == 0:
+            task.progress(index, len(bank_data))
+        if concept in item['concepto'].lower():
+            filtered_transactions.append(item)
+    return filtered_transactions
+
 # Filtrar transacciones por concepto
 def filter_transactions_by_concept(bank_data, concept):
-    filtered_transactions = [item for item in bank_data if concept.lower() in item['concepto'].lower()]
+    TaskRunner.submit("filtro por concepto", transactions_by_concept, (bank_data, concept), progress=True,
+                      on_done=show_filtered_result)
+
+def show_filtered_result(filtered_transactions):
     if filtered_transactions:
         show_filtered_transactions(filtered_transactions)
     else:
@@ -123,19 +143,11 @@ def filter_transactions_by_concept(bank_data, concept):
     
 def show_filtered_transactions(transactions):
     transactions_window = tk.Toplevel()
-    transactions_window.title("Transacciones Filtradas")
-    transactions_window.geometry("500x400")
-
-    scrolled_text = ScrolledText(transactions_window, wrap=tk.WORD, width=60, height=20)
-    scrolled_text.pack(pady=10, padx=10)
-
-    for item in transactions:
-        scrolled_text.insert(tk.END, f"Fecha: {item['fecha_oper']}\n")
-        scrolled_text.insert(tk.END, f"Concepto: {item['concepto']}\n")
-        scrolled_text.insert(tk.END, f"Importe: {item['importe']} €\n")
-        scrolled_text.insert(tk.END, f"Saldo: {item['saldo']} €\n\n")
+    transactions_window.title(f"Transacciones Filtradas ({len(transactions)})")
+    transactions_window.geometry("560x460")
 
-    scrolled_text.config(state=tk.DISABLED)
+    table = ResultTable.VirtualTable(transactions_window, TableModel.transaction_columns(), transactions)
+    table.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
 # Ventana para ingresar el concepto por el cual se quieren filtrar las transacciones
 def ask_concept_to_filter(bank_data):
@@ -149,13 +161,18 @@ def ask_concept_to_filter(bank_data):
     submit_button = tk.Button(concept_window, text="Filtrar", command=lambda: filter_transactions_by_concept(bank_data, concept_entry.get()))
     submit_button.pack(pady=10)
 
-def calculate_annual_balance(bank_data, year):
+# Balance de un año: (transacciones, balance, saldo inicial, saldo final)
+def annual_balance(bank_data, year, task=None):
+    if isinstance(bank_data, SQLiteStore.TransactionQueries):
+        return bank_data.annual_balance(year)
     balance = 0.0
     transactions_in_year = []
     earliest_transaction = None
     latest_transaction = None
 
-    for transaction in bank_data:
+    for index, transaction in enumerate(bank_data):
+        if task is not None and index % TaskProgress.PROGRESS_STEP == 0:
+            task.progress(index, len(bank_data))
         transaction_date_str = transaction['fecha_oper']
         transaction_date = datetime.strptime(transaction_date_str, '%d/%m/%Y')
 
@@ -173,34 +190,35 @@ def calculate_annual_balance(bank_data, year):
     # Buscar el saldo más temprano y más reciente
     saldo_final = transactions_in_year[0]['saldo'] if transactions_in_year else 'N/A'
     saldo_inicial = transactions_in_year[-1]['saldo'] if transactions_in_year else 'N/A'
+    return transactions_in_year, balance, saldo_inicial, saldo_final
 
-    # Mostrar el balance anual en una ventana
-    show_annual_balance(transactions_in_year, balance, saldo_inicial, saldo_final, year)
+def calculate_annual_balance(bank_data, year):
+    # Calcular en segundo plano y mostrar el balance anual en una ventana
+    TaskRunner.submit("balance anual", annual_balance, (bank_data, year), progress=True,
+                      on_done=lambda result: show_annual_balance(*result, year))
 
 
 # Mostrar el balance anual en una nueva ventana con scroll
 def show_annual_balance(transactions, balance, saldo_inicial, saldo_final, year):
-    balance_window = tk.Toplevel()
-    balance_window.title(f"Balance de {year}")
-    balance_window.geometry("500x400")
+    show_balance(f"Balance de {year}", f"Balance total de {year}",
+                 transactions, balance, saldo_inicial, saldo_final)
 
-    scrolled_text = ScrolledText(balance_window, wrap=tk.WORD, width=60, height=20)
-    scrolled_text.pack(pady=10, padx=10)
 
-    # Mostrar primero el saldo inicial y final, luego el balance total del año
-    scrolled_text.insert(tk.END, f"Saldo inicial: {saldo_inicial} €\n")
-    scrolled_text.insert(tk.END, f"Saldo final: {saldo_final} €\n\n")
-    scrolled_text.insert(tk.END, f"Balance total de {year}: {balance:.2f} €\n\n")
+# Ventana de un balance: saldos y balance total arriba y, debajo, la tabla de transacciones
+# (ResultTable.VirtualTable solo pinta las filas visibles, aunque el año tenga miles)
+def show_balance(title, balance_title, transactions, balance, saldo_inicial, saldo_final):
+    balance_window = tk.Toplevel()
+    balance_window.title(title)
+    balance_window.geometry("560x520")
 
-    # Luego mostrar las transacciones
-    scrolled_text.insert(tk.END, "Transacciones del año:\n\n")
-    for item in transactions:
-        scrolled_text.insert(tk.END, f"Fecha: {item['fecha_oper']}\n")
-        scrolled_text.insert(tk.END, f"Concepto: {item['concepto']}\n")
-        scrolled_text.insert(tk.END, f"Importe: {item['importe']} €\n")
-        scrolled_text.insert(tk.END, f"Saldo: {item['saldo']} €\n\n")
+    summary = (f"Saldo inicial: {saldo_inicial} €\n"
+               f"Saldo final: {saldo_final} €\n"
+               f"{balance_title}: {balance:.2f} €")
+    tk.Label(balance_window, text=summary, justify=tk.LEFT).pack(anchor=tk.W, padx=10, pady=10)
+    tk.Label(balance_window, text=f"Transacciones ({len(transactions)}):").pack(anchor=tk.W, padx=10)
 
-    scrolled_text.config(state=tk.DISABLED)
+    table = ResultTable.VirtualTable(balance_window, TableModel.transaction_columns(), transactions)
+    table.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
 
 # Ventana para seleccionar el año
@@ -225,15 +243,21 @@ def ask_year_to_calculate_annual_balance(bank_data):
 
 # Cargar el archivo y comenzar la aplicación
 def load_bank_data_and_start(filename):
-    bank_data = load_bank_data_by_filename(filename)
-    
+    # La lectura y ordenación del historial se hacen en segundo plano
+    TaskRunner.submit("carga de la cuenta", load_bank_data_by_filename, (filename,),
+                      on_done=start_bank_analysis,
+                      on_error=lambda e: messagebox.showerror("Error", f"No se pudo cargar el archivo: {e}"))
+
+# Ventana de análisis de la cuenta ya cargada
+def start_bank_analysis(bank_data):
     if not bank_data:
         return
 
-    # Crear la ventana principal para análisis si el archivo se cargó con éxito
-    root = tk.Tk()
+    root = tk.Toplevel()
     root.title("Analizador de Cuentas Bancarias")
 
+    # Los cálculos se hacen en segundo plano con el runner de la ventana principal (main);
+    # su avance se ve en la barra de esa ventana, que sigue abierta si esta se cierra
     # Botón para calcular el balance de un mes y año
     btn_calculate_balance = tk.Button(root, text="Calcular Balance Mensual", command=lambda: ask_month_and_year_to_calculate_balance(bank_data))
     btn_calculate_balance.pack(pady=10)
@@ -243,7 +267,6 @@ def load_bank_data_and_start(filename):
     btn_calculate_annual_balance.pack(pady=10)
     # Configurar la ventana
     root.geometry("300x200")
-    root.mainloop()
 
 # Función principal
 def main():
@@ -254,8 +277,11 @@ def main():
     btn_select_file = tk.Button(root, text="Seleccionar archivo", command=ask_for_filename)
     btn_select_file.pack(pady=20)
 
+    status = TaskRunner.StatusBar(root)
+    TaskRunner.install(root, status)
+
     # Configurar la ventana
-    root.geometry("300x150")
+    root.geometry("300x180")
     root.mainloop()
 
 if __name__ == "__main__":
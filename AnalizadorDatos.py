@@ -1,32 +1,147 @@
+import os
 import tkinter as tk
 from tkinter import messagebox, ttk
 from tkinter.scrolledtext import ScrolledText
-import json
-import os
-from collections import Counter, defaultdict
-from datetime import datetime
+from datetime import datetime, timedelta
 from tkcalendar import Calendar
+import ResultTable
+import SQLiteStore
+import TableModel
+import TaskRunner
+import TicketModel
+import TicketStore
+
+# Filas que se cargan cada vez en la tabla de productos más comprados
+MOST_PURCHASED_PAGE_SIZE = 100
 
 def load_tickets_data(filename='mercadona_tickets.json'):
-    if os.path.exists(filename):
-        with open(filename, 'r', encoding='utf-8') as file:
-            return json.load(file)
+    """
+    Carga los tickets del almacén en el modelo en memoria (TicketModel.Tickets). Con el
+    almacén SQLite activado (TICKET_BACKEND=sqlite) devuelve un SQLiteStore.TicketQueries,
+    que resuelve los mismos cálculos con índices.
+    """
+    if TicketStore.store_exists(filename):
+        if SQLiteStore.ENABLED:
+            tiendas = {path: tienda for tienda, path in SQLiteStore.TICKET_STORES.items()}
+            tienda = tiendas.get(os.path.basename(filename), os.path.splitext(os.path.basename(filename))[0])
+            return SQLiteStore.load_tickets(tienda, filename)
+        return TicketModel.load(filename)
     else:
         messagebox.showerror("Error", f"El archivo {filename} no existe.")
         return []
 
+# Los cálculos (total_expense, count_purchased_items, expense_in_date_range...) no usan
+# tkinter y devuelven su resultado; las funciones calculate_*/ask_* lo muestran.
+# Trabajan sobre el modelo de TicketModel (una lista de registros JSON se convierte
+# antes). Si los tickets vienen de SQLite (SQLiteStore.TicketQueries), el cálculo se le delega.
+# Con TICKET_COLUMNAR=1, el gasto total, los productos más comprados y el ticket mensual
+# salen de la tabla columnar de NumPy (TicketModel.ItemColumns).
+#
+# Las funciones calculate_* y las ventanas lanzan los cálculos con TaskRunner.submit, que
+# los ejecuta en un hilo de trabajo; el argumento `task` de los cálculos sirve para
+# informar del avance al construir los índices y para cancelarlos.
+
+def total_expense(tickets_data, task=None):
+    if isinstance(tickets_data, SQLiteStore.TicketQueries):
+        return tickets_data.total_expense()
+    tickets = TicketModel.as_tickets(tickets_data)
+    if TicketModel.COLUMNAR:
+        return tickets.columns(task).total_expense()
+    return sum(ticket.precio_total for ticket in tickets)
+
 def calculate_total_expense(tickets_data):
-    total_expense = sum(ticket['precio_total'] for ticket in tickets_data)
-    messagebox.showinfo("Gasto Total", f"Gasto total: {total_expense} €")
+    TaskRunner.submit("gasto total", total_expense, (tickets_data,), progress=True,
+                      on_done=lambda total: messagebox.showinfo("Gasto Total", f"Gasto total: {total:.2f} €"))
+
+def count_purchased_items(tickets_data, task=None):
+    """Devuelve [(producto, cantidad)] ordenado de más a menos comprado."""
+    if isinstance(tickets_data, SQLiteStore.TicketQueries):
+        return tickets_data.count_purchased_items()
+    tickets = TicketModel.as_tickets(tickets_data)
+    if TicketModel.COLUMNAR:
+        return tickets.columns(task).product_totals()
+    # Las cantidades por producto ya están acumuladas en el cubo; solo falta ordenarlas
+    return tickets.cube(task).product_totals.most_common()
+
+def top_purchased_items(tickets_data, k, offset=0, task=None):
+    """
+    Devuelve los puestos offset..offset+k-1 del ranking de count_purchased_items, sin
+    ordenar todo el catálogo (selección con un montículo de tamaño offset+k).
+    """
+    if isinstance(tickets_data, SQLiteStore.TicketQueries):
+        return tickets_data.top_purchased_items(k, offset)
+    tickets = TicketModel.as_tickets(tickets_data)
+    if TicketModel.COLUMNAR:
+        return tickets.columns(task).top_products(k, offset)
+    # Counter.most_common(n) usa heapq.nlargest y respeta el orden de los empates
+    return tickets.cube(task).product_totals.most_common(offset + k)[offset:]
+
+def most_purchased_items(tickets_data, page_size=MOST_PURCHASED_PAGE_SIZE):
+    TaskRunner.submit("productos más comprados", top_purchased_items, (tickets_data, page_size), progress=True,
+                      on_done=lambda first_page: show_most_purchased_items(tickets_data, first_page, page_size))
+
+def show_most_purchased_items(tickets_data, first_page, page_size=MOST_PURCHASED_PAGE_SIZE):
+    """
+    Muestra el ranking de productos más comprados en una tabla que se carga por páginas:
+    al llegar al final de lo cargado con el scroll se pide la página siguiente, también
+    en un hilo de trabajo (con el índice ya construido, cada página es una selección rápida).
+    """
+    if not first_page:
+        messagebox.showinfo("Productos Más Comprados", "No hay productos comprados.")
+        return
 
-def most_purchased_items(tickets_data):
-    item_counter = Counter()
-    for ticket in tickets_data:
-        for item in ticket['items']:
-            item_counter[item['descripcion']] += item['cantidad']
-    most_common_items = item_counter.most_common()
-    result = "\n".join([f"{item}: {count} veces" for item, count in most_common_items])
-    messagebox.showinfo("Productos Más Comprados", result)
+    items_window = tk.Toplevel()
+    items_window.title("Productos Más Comprados")
+    items_window.geometry("450x400")
+
+    frame = tk.Frame(items_window)
+    frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+    tree = ttk.Treeview(frame, columns=('producto', 'veces'), show='headings')
+    tree.heading('producto', text="Producto")
+    tree.heading('veces', text="Veces")
+    tree.column('producto', width=320)
+    tree.column('veces', width=80, anchor=tk.E)
+    scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+    state = {'offset': 0, 'done': False, 'loading': False}
+
+    def add_page(page):
+        # La ventana puede haberse cerrado mientras se calculaba la página
+        if not tree.winfo_exists():
+            return
+        for product, count in page:
+            tree.insert('', tk.END, values=(product, count))
+        state['offset'] += len(page)
+        state['done'] = len(page) < page_size
+        state['loading'] = False
+
+    def load_next_page():
+        if not state['done']:
+            TaskRunner.submit("página de productos más comprados", top_purchased_items,
+                              (tickets_data, page_size, state['offset']), progress=True, on_done=add_page)
+
+    def on_scroll(first, last):
+        scrollbar.set(first, last)
+        # Al ver el final de lo cargado, pedir la página siguiente (una sola vez)
+        if float(last) >= 1.0 and not state['done'] and not state['loading']:
+            state['loading'] = True
+            items_window.after_idle(load_next_page)
+
+    tree.configure(yscrollcommand=on_scroll)
+    add_page(first_page)
+
+def expense_in_date_range(tickets_data, start_date, end_date, task=None):
+    """Suma el gasto de los tickets con fecha entre start_date y end_date (objetos date)."""
+    if isinstance(tickets_data, SQLiteStore.TicketQueries):
+        return tickets_data.expense_in_date_range(start_date, end_date)
+    # Límites como datetime: desde el inicio de start_date hasta antes del día siguiente a end_date
+    start = datetime(start_date.year, start_date.month, start_date.day)
+    end = datetime(end_date.year, end_date.month, end_date.day) + timedelta(days=1)
+    # Índice ordenado por fecha con sumas acumuladas: dos búsquedas binarias y una resta.
+    # Los tickets sin fecha válida ya se avisaron al cargar y no están en el índice.
+    return TicketModel.as_tickets(tickets_data).date_index(task).expense(start, end)
 
 
 def calculate_expense_in_date_range(tickets_data, start_date_str, end_date_str):
@@ -42,22 +157,13 @@ def calculate_expense_in_date_range(tickets_data, start_date_str, end_date_str):
             messagebox.showerror("Error", "La fecha de inicio debe ser antes de la fecha de fin.")
             return
 
-        expenses_in_range = 0.0
-        for ticket in tickets_data:
-            date_str = ticket.get('fecha_compra', None)
-            if date_str:
-                try:
-                    # Convertir la fecha del ticket a un objeto datetime (con tiempo)
-                    ticket_datetime = datetime.strptime(date_str, '%d/%m/%Y %H:%M')
-                    ticket_date = ticket_datetime.date()
-
-                    if start_date <= ticket_date <= end_date:
-                        expenses_in_range += ticket['precio_total']
-                except ValueError:
-                    print(f"Error al convertir la fecha del ticket '{date_str}'.")
-
-        # Mostrar el resultado
-        messagebox.showinfo("Gasto en Rango de Fechas", f"Gasto total entre {start_date_str} y {end_date_str}: {expenses_in_range:.2f} €")
+        # Calcular en segundo plano y mostrar el resultado
+        TaskRunner.submit(
+            "gasto por fechas", expense_in_date_range, (tickets_data, start_date, end_date), progress=True,
+            on_done=lambda expenses_in_range: messagebox.showinfo(
+                "Gasto en Rango de Fechas",
+                f"Gasto total entre {start_date_str} y {end_date_str}: {expenses_in_range:.2f} €")
+        )
     except ValueError as e:
         messagebox.showerror("Error", f"Error al procesar las fechas. Por favor verifica el formato (dd/mm/yyyy).\n{e}")
 
@@ -103,25 +209,45 @@ def get_unique_products(tickets_data):
     """
     Obtiene una lista de productos únicos comprados en los tickets.
     """
-    product_set = set()
-    for ticket in tickets_data:
-        for item in ticket['items']:
-            product_set.add(item['descripcion'])
-    return sorted(list(product_set))  # Ordenar para mejor visualización
+    if isinstance(tickets_data, SQLiteStore.TicketQueries):
+        return tickets_data.unique_products()
+    # El diccionario de productos del modelo ya tiene cada producto una sola vez
+    return sorted(TicketModel.as_tickets(tickets_data).products)  # Ordenar para mejor visualización
 
-def find_product_purchases(tickets_data, selected_product):
+def product_purchases(tickets_data, selected_product, task=None):
     """
-    Encuentra el historial de compras para un producto y calcula la cantidad total comprada.
+    Devuelve las fechas de compra de un producto y la cantidad total comprada.
     """
+    if isinstance(tickets_data, SQLiteStore.TicketQueries):
+        return tickets_data.product_purchases(selected_product)
+    tickets = TicketModel.as_tickets(tickets_data)
     purchases = []
     total_quantity = 0
 
-    for ticket in tickets_data:
-        for item in ticket['items']:
-            if item['descripcion'] == selected_product:
-                purchases.append(ticket['fecha_compra'])
-                total_quantity += item['cantidad']  # Sumar la cantidad de productos comprados
+    # Solo se recorren las compras del producto, sacadas del índice invertido
+    for position, _, cantidad, _ in tickets.product_index(task).purchases(tickets.product_id(selected_product)):
+        purchases.append(tickets[position].fecha_compra)
+        total_quantity += cantidad  # Sumar la cantidad de productos comprados
+    return purchases, total_quantity
 
+def product_price_series(tickets_data, selected_product, task=None):
+    """
+    Devuelve la evolución del precio unitario de un producto: [(fecha, precio)] de sus
+    compras con fecha válida, ordenadas por fecha.
+    """
+    if isinstance(tickets_data, SQLiteStore.TicketQueries):
+        return tickets_data.price_series(selected_product)
+    tickets = TicketModel.as_tickets(tickets_data)
+    return tickets.product_index(task).price_series(tickets.product_id(selected_product))
+
+def find_product_purchases(tickets_data, selected_product):
+    """
+    Encuentra el historial de compras para un producto y calcula la cantidad total comprada.
+    """
+    TaskRunner.submit("historial de producto", product_purchases, (tickets_data, selected_product), progress=True,
+                      on_done=lambda result: show_product_purchases(selected_product, *result))
+
+def show_product_purchases(selected_product, purchases, total_quantity):
     if purchases:
         dates = "\n".join(purchases)
         messagebox.showinfo("Historial de Compras", f"Producto: {selected_product}\nCantidad total comprada: {total_quantity}\nFechas:\n{dates}")
@@ -129,6 +255,32 @@ def find_product_purchases(tickets_data, selected_product):
         messagebox.showinfo("Historial de Compras", f"No se encontraron compras para {selected_product}.")
 
 
+def show_product_prices(tickets_data, selected_product):
+    """
+    Muestra la evolución del precio unitario de un producto en una ventana con scroll.
+    """
+    TaskRunner.submit("evolución de precio", product_price_series, (tickets_data, selected_product), progress=True,
+                      on_done=lambda series: show_price_series(selected_product, series))
+
+def show_price_series(selected_product, series):
+    if not series:
+        messagebox.showinfo("Evolución de Precio", f"No se encontraron compras con fecha de {selected_product}.")
+        return
+
+    prices_window = tk.Toplevel()
+    prices_window.title(f"Evolución de Precio - {selected_product}")
+    prices_window.geometry("400x400")
+
+    scrolled_text = ScrolledText(prices_window, wrap=tk.WORD, width=50, height=20)
+    scrolled_text.pack(pady=10, padx=10)
+
+    prices = [precio for _, precio in series]
+    lines = [f"Producto: {selected_product}",
+             f"Precio mínimo: {min(prices):.2f} €  Precio máximo: {max(prices):.2f} €  Último: {prices[-1]:.2f} €", ""]
+    lines += [f"{fecha.strftime('%d/%m/%Y %H:%M')}: {precio:.2f} €" for fecha, precio in series]
+    scrolled_text.insert(tk.END, "\n".join(lines))
+    scrolled_text.config(state=tk.DISABLED)
+
 def ask_product(tickets_data):
     """
     Abre una ventana con un desplegable para seleccionar un producto.
@@ -155,6 +307,16 @@ def ask_product(tickets_data):
     submit_button = tk.Button(product_window, text="Buscar", command=submit_product)
     submit_button.pack(pady=20)
 
+    def submit_prices():
+        selected_product = product_combobox.get()
+        if selected_product:
+            show_product_prices(tickets_data, selected_product)
+        else:
+            messagebox.showerror("Error", "Por favor, selecciona un producto.")
+
+    prices_button = tk.Button(product_window, text="Evolución de Precio", command=submit_prices)
+    prices_button.pack(pady=(0, 20))
+
 def ask_month_and_product(tickets_data):
     """
     Abre una ventana para seleccionar el mes, año y producto.
@@ -182,11 +344,8 @@ def ask_month_and_product(tickets_data):
             messagebox.showerror("Error", f"Error al procesar los datos. Por favor verifica tu selección.\n{e}")
 
     # Obtener la lista de productos únicos
-    products = set()
-    for ticket in tickets_data:
-        for item in ticket['items']:
-            products.add(item['descripcion'])
-    
+    products = get_unique_products(tickets_data)
+
     # Crear la ventana para la selección de mes, año y producto
     month_window = tk.Toplevel()
     month_window.title("Seleccionar Mes, Año y Producto")
@@ -214,94 +373,80 @@ def ask_month_and_product(tickets_data):
     submit_button = tk.Button(month_window, text="Calcular Cantidad", command=submit_month_and_product)
     submit_button.pack(pady=20)
 
+def product_in_month(tickets_data, month, year, selected_product, task=None):
+    """
+    Devuelve la cantidad de un producto comprada en un mes y año, y las fechas de compra.
+    """
+    if isinstance(tickets_data, SQLiteStore.TicketQueries):
+        return tickets_data.product_in_month(month, year, selected_product)
+    # Una consulta al cubo de agregados por (año, mes, producto)
+    cell = TicketModel.as_tickets(tickets_data).cube(task).cell(year, month, selected_product)
+    if cell is None:
+        return 0, []
+    return cell.cantidad, list(cell.fechas)
+
 def calculate_product_in_month(tickets_data, month, year, selected_product):
     """
     Calcula la cantidad de un producto comprado en un mes y año específico.
     """
-    total_quantity = 0
-    relevant_dates = []
-
-    # Iterar sobre los tickets para encontrar las compras del mes y producto seleccionados
-    for ticket in tickets_data:
-        date_str = ticket.get('fecha_compra', None)
-        if date_str:
-            try:
-                # Convertir la fecha del ticket a un objeto datetime
-                ticket_datetime = datetime.strptime(date_str, '%d/%m/%Y %H:%M')
-
-                # Verificar si el mes y año coinciden con el mes y año seleccionados
-                if ticket_datetime.month == month and ticket_datetime.year == year:
-                    for item in ticket['items']:
-                        if item['descripcion'] == selected_product:
-                            total_quantity += item['cantidad']
-                            relevant_dates.append(ticket['fecha_compra'])
-
-            except ValueError as ve:
-                print(f"Error al convertir la fecha del ticket '{date_str}': {ve}")
+    TaskRunner.submit(
+        "producto en el mes", product_in_month, (tickets_data, month, year, selected_product), progress=True,
+        on_done=lambda result: show_product_in_month(month, year, selected_product, *result)
+    )
 
+def show_product_in_month(month, year, selected_product, total_quantity, relevant_dates):
     if relevant_dates:
         dates_str = "\n".join(relevant_dates)
         messagebox.showinfo("Resultado", f"Producto: {selected_product}\nCantidad comprada en {month}/{year}: {total_quantity}\nFechas:\n{dates_str}")
     else:
         messagebox.showinfo("Resultado", f"No se encontraron compras de {selected_product} en {month}/{year}.")
 
+def monthly_ticket(tickets_data, month, year, task=None):
+    """
+    Devuelve el resumen por producto ({descripción: cantidad, precio unitario y total})
+    de las compras de un mes y año, y el gasto total del mes.
+    """
+    if isinstance(tickets_data, SQLiteStore.TicketQueries):
+        return tickets_data.monthly_ticket(month, year)
+    tickets = TicketModel.as_tickets(tickets_data)
+    if TicketModel.COLUMNAR:
+        return tickets.columns(task).monthly(year, month)
+    # Los productos del mes ya están agregados en el cubo, en orden de primera compra
+    cube = tickets.cube(task)
+    monthly_summary = {
+        descripcion: {'cantidad': cell.cantidad, 'precio_unitario': cell.precio_unitario, 'precio_total': cell.gasto}
+        for descripcion, cell in cube.month(year, month).items()
+    }
+    return monthly_summary, cube.month_totals.get((year, month), 0)
+
 def calculate_monthly_ticket(tickets_data, month, year):
     """
     Calcula el ticket de gasto para un mes y año específicos.
     """
-    monthly_summary = defaultdict(lambda: {'cantidad': 0, 'precio_unitario': 0, 'precio_total': 0})
-    total_expense = 0
-
-    # Filtrar los tickets por el mes y el año
-    for ticket in tickets_data:
-        date_str = ticket.get('fecha_compra', None)
-        if date_str:
-            try:
-                ticket_datetime = datetime.strptime(date_str, '%d/%m/%Y %H:%M')
-                ticket_month = ticket_datetime.month
-                ticket_year = ticket_datetime.year
-
-                if ticket_month == month and ticket_year == year:
-                    for item in ticket['items']:
-                        descripcion = item['descripcion']
-                        cantidad = item['cantidad']
-                        precio_unitario = abs(item['precio_unitario'])
-                        precio_total = cantidad * abs(precio_unitario)
-
-                        # Acumular la cantidad, precio unitario y precio total
-                        monthly_summary[descripcion]['cantidad'] += cantidad
-                        monthly_summary[descripcion]['precio_unitario'] = precio_unitario
-                        monthly_summary[descripcion]['precio_total'] += precio_total
-
-                        total_expense += precio_total
-            except ValueError as ve:
-                print(f"Error al procesar la fecha: {ve}")
-
-    # Crear una ventana de texto con scroll para mostrar el ticket
+    TaskRunner.submit("ticket mensual", monthly_ticket, (tickets_data, month, year), progress=True,
+                      on_done=lambda result: show_monthly_ticket(month, year, *result))
+
+def show_monthly_ticket(month, year, monthly_summary, total_expense):
+    # Mostrar el ticket en una tabla que solo pinta las filas visibles y se ordena por columnas
     if monthly_summary:
         ticket_window = tk.Toplevel()
         ticket_window.title(f"Ticket Mensual - {month}/{year}")
-        ticket_window.geometry("400x400")
-
-        # Crear el widget ScrolledText para el ticket
-        scrolled_text = ScrolledText(ticket_window, wrap=tk.WORD, width=50, height=20)
-        scrolled_text.pack(pady=10, padx=10)
-
-        # Construir el contenido del ticket
-        ticket_str = ""
-        for descripcion, data in monthly_summary.items():
-            ticket_str += f"Producto: {descripcion}\n"
-            ticket_str += f"  Cantidad comprada: {data['cantidad']}\n"
-            ticket_str += f"  Precio por unidad: {data['precio_unitario']:.2f} €\n"
-            ticket_str += f"  Total gastado: {data['precio_total']:.2f} €\n\n"
-
-        ticket_str += f"\nCoste total del mes: {total_expense:.2f} €"
-
-        # Insertar el texto en el widget ScrolledText
-        scrolled_text.insert(tk.END, ticket_str)
-
-        # Desactivar la edición del texto para que solo se pueda ver
-        scrolled_text.config(state=tk.DISABLED)
+        ticket_window.geometry("560x500")
+
+        columns = [
+            TableModel.Column("Producto", 0, key=str.lower, width=220),
+            TableModel.Column("Cantidad", 1, width=70, anchor=tk.E),
+            TableModel.Column("Precio unidad", 2, format=lambda value: f"{value:.2f} €", width=100, anchor=tk.E),
+            TableModel.Column("Total", 3, format=lambda value: f"{value:.2f} €", width=100, anchor=tk.E),
+        ]
+        rows = [
+            (descripcion, data['cantidad'], data['precio_unitario'], data['precio_total'])
+            for descripcion, data in monthly_summary.items()
+        ]
+        table = ResultTable.VirtualTable(ticket_window, columns, rows)
+        table.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        tk.Label(ticket_window, text=f"Coste total del mes: {total_expense:.2f} €").pack(pady=(0, 10))
     else:
         messagebox.showinfo("Ticket Mensual", "No se encontraron compras en el mes seleccionado.")
 
@@ -364,6 +509,10 @@ def main():
         messagebox.showerror("Error", "No hay datos de tickets para analizar.")
         return
 
+    # Los cálculos se hacen en segundo plano; su avance se ve en la barra inferior
+    status = TaskRunner.StatusBar(root)
+    TaskRunner.install(root, status)
+
     # Botón para calcular el gasto total
     btn_total_expense = tk.Button(root, text="Gasto Total", command=lambda: calculate_total_expense(tickets_data))
     btn_total_expense.pack(pady=10)
@@ -384,8 +533,12 @@ def main():
     btn_product_in_month = tk.Button(root, text="Cantidad de Producto por Mes/Año", command=lambda: ask_month_and_product(tickets_data))
     btn_product_in_month.pack(pady=10)
 
+    # Botón para ver el historial de compras y de precios de un producto
+    btn_product_history = tk.Button(root, text="Historial de Producto", command=lambda: ask_product(tickets_data))
+    btn_product_history.pack(pady=10)
+
     # Configurar la ventana
-    root.geometry("300x300")
+    root.geometry("300x390")
     root.mainloop()
 
 if __name__ == "__main__":
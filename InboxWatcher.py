@@ -0,0 +1,179 @@
+import os
+import time
+from datetime import datetime
+
+import MetricsStore
+import OCRCache
+import TicketAnalyzer
+import TicketStore
+
+# Importación continua desde una carpeta de entrada: el escáner deja ahí tickets
+# (imágenes o PDF) y extractos bancarios en PDF, y se procesan a medida que llegan.
+#
+# - Un archivo solo se procesa cuando su tamaño y fecha de modificación no han cambiado
+#   entre dos revisiones seguidas y lleva al menos `settle_seconds` sin tocarse, para no
+#   leer archivos que todavía se están escribiendo.
+# - Los archivos procesados se recuerdan por el hash de su contenido en un almacén de
+#   estado, así que al reiniciar no se repite el OCR de lo que ya estaba importado.
+# - Los extractos bancarios se guardan cada uno en su JSON dentro de `bank_output_dir`
+#   o, si se indica `bank_account`, se añaden al historial de esa cuenta.
+STATE_STORE = 'inbox_state.json'
+POLL_SECONDS = 2.0
+SETTLE_SECONDS = 5.0
+
+KIND_TICKET = 'ticket'
+KIND_BANK = 'banco'
+
+
+class InboxWatcher:
+    """Vigila una carpeta de entrada e importa los archivos nuevos."""
+
+    def __init__(self, inbox, bank_output_dir=None, poll_seconds=POLL_SECONDS,
+                 settle_seconds=SETTLE_SECONDS, workers=None, state_store=STATE_STORE, bank_account=None):
+        self.inbox = inbox
+        self.bank_output_dir = bank_output_dir or '.'
+        self.bank_account = bank_account
+        self.poll_seconds = poll_seconds
+        self.settle_seconds = settle_seconds
+        self.workers = workers
+        self.state_store = state_store
+        # Hash de los archivos ya importados (persistente entre ejecuciones)
+        self.processed = {entry["sha256"] for entry in TicketStore.iter_records(state_store)}
+        # Tamaño y fecha de cada archivo en la revisión anterior
+        self.previous = {}
+        # Archivos ya tratados en esta ejecución, para no volver a calcular su hash
+        self.handled = {}
+        # Registros de estado pendientes; se guardan todos juntos al final de cada revisión
+        self.new_state = []
+        # Si en la última revisión falló el lote de tickets entero (se reintenta en la siguiente)
+        self.batch_failed = False
+
+    def scan(self):
+        """Devuelve {ruta: (tamaño, fecha de modificación)} de los archivos de la carpeta."""
+        snapshot = {}
+        with os.scandir(self.inbox) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(TicketAnalyzer.TICKET_EXTENSIONS):
+                    stat = entry.stat()
+                    snapshot[entry.path] = (stat.st_size, stat.st_mtime)
+        return snapshot
+
+    def ready_files(self):
+        """Archivos nuevos que han dejado de cambiar y pueden procesarse."""
+        snapshot = self.scan()
+        now = time.time()
+        ready = [
+            path for path, signature in sorted(snapshot.items())
+            if self.handled.get(path) != signature
+            and self.previous.get(path) == signature
+            and now - signature[1] >= self.settle_seconds
+        ]
+        self.previous = snapshot
+        return [(path, snapshot[path]) for path in ready]
+
+    def classify(self, path):
+        if TicketAnalyzer.is_pdf(path) and TicketAnalyzer.is_bank_statement(path):
+            return KIND_BANK
+        return KIND_TICKET
+
+    def remember(self, path, signature, sha256, kind, error):
+        self.handled[path] = signature
+        if error is None:
+            # Solo se recuerdan los éxitos: los errores se reintentan al reiniciar
+            self.processed.add(sha256)
+            self.new_state.append({
+                "sha256": sha256,
+                "archivo": os.path.abspath(path),
+                "tipo": kind,
+                "fecha": datetime.now().strftime('%d/%m/%Y %H:%M:%S')
+            })
+
+    def import_bank_statement(self, path):
+        if self.bank_account:
+            added, duplicates = TicketAnalyzer.merge_bank_statement(path, self.bank_account, self.workers)
+            print(f"{added} transacciones de {path} añadidas a {self.bank_account} ({duplicates} ya estaban)")
+            return
+        stem = os.path.splitext(os.path.basename(path))[0]
+        output = os.path.join(self.bank_output_dir, stem + '.json')
+        count = TicketAnalyzer.save_transactions_to_json(TicketAnalyzer.iter_transacciones(path, self.workers), output)
+        print(f"{count} transacciones de {path} guardadas en {output}")
+
+    def poll_once(self):
+        """Procesa los archivos listos en esta revisión. Devuelve [(archivo, tipo, error)]."""
+        results = []
+        tickets = []
+        self.batch_failed = False
+        for path, signature in self.ready_files():
+            try:
+                sha256 = OCRCache.file_hash(path)
+            except OSError as e:
+                # Se anota como tratado para no repetir el error en cada revisión (y que
+                # --una-vez termine); se reintenta si el archivo cambia o al reiniciar
+                self.remember(path, signature, None, None, str(e))
+                results.append((path, None, str(e)))
+                continue
+            if sha256 in self.processed:
+                self.handled[path] = signature
+                continue
+            try:
+                kind = self.classify(path)
+            except Exception as e:
+                self.remember(path, signature, sha256, None, str(e))
+                results.append((path, None, str(e)))
+                continue
+            if kind == KIND_TICKET:
+                tickets.append((path, signature, sha256))
+                continue
+            try:
+                self.import_bank_statement(path)
+                error = None
+            except Exception as e:
+                error = str(e)
+            self.remember(path, signature, sha256, kind, error)
+            results.append((path, kind, error))
+
+        if tickets:
+            # Los tickets de una misma revisión se procesan juntos en el pool de OCR
+            try:
+                batch = TicketAnalyzer.process_ticket_files([path for path, _, _ in tickets], self.workers)
+            except Exception as e:
+                # Ha fallado el lote entero (por ejemplo, se ha caído un proceso del pool):
+                # los archivos no se anotan como tratados y se reintentan en la siguiente revisión
+                print(f"No se pudieron procesar {len(tickets)} tickets: {e}")
+                self.batch_failed = True
+                results.extend((path, KIND_TICKET, str(e)) for path, _, _ in tickets)
+            else:
+                for (path, signature, sha256), (_, _, error) in zip(tickets, batch):
+                    self.remember(path, signature, sha256, KIND_TICKET, error)
+                    results.append((path, KIND_TICKET, error))
+        if self.new_state:
+            # El estado se guarda después de los datos: si se corta antes, al reiniciar se
+            # reintentan los archivos y el índice de duplicados evita guardarlos dos veces
+            TicketStore.append_records(self.state_store, self.new_state)
+            self.new_state = []
+        if results:
+            MetricsStore.flush('watch')
+        return results
+
+    def run(self, once=False):
+        """
+        Revisa la carpeta cada `poll_seconds` hasta que se interrumpe (Ctrl+C).
+        Con once=True espera a que los archivos presentes se estabilicen, los procesa y termina
+        (también si falla el lote de tickets entero, en lugar de reintentarlo sin fin).
+        Devuelve la lista de resultados de toda la ejecución.
+        """
+        results = []
+        print(f"Vigilando {self.inbox} (Ctrl+C para terminar)")
+        try:
+            while True:
+                results.extend(self.poll_once())
+                if once and (self.batch_failed or not self.pending()):
+                    break
+                time.sleep(self.poll_seconds)
+        except KeyboardInterrupt:
+            print("Vigilancia detenida.")
+        return results
+
+    def pending(self):
+        """Indica si quedan archivos de la última revisión sin tratar."""
+        return any(self.handled.get(path) != signature for path, signature in self.previous.items())
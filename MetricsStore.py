@@ -0,0 +1,53 @@
+import os
+from datetime import datetime
+
+import PipelineMetrics
+import TicketStore
+
+# Almacén de las métricas de la importación (PipelineMetrics): un registro por ejecución,
+# con lo acumulado en ella, para poder agregar varias ejecuciones con aggregate().
+METRICS_STORE = os.environ.get('TICKET_METRICS_STORE', 'pipeline_metrics.json')
+
+
+def flush(command, path=None):
+    """
+    Añade al almacén de métricas un registro con lo acumulado desde el último volcado
+    y vacía los acumuladores. No escribe nada si no se ha medido nada.
+    """
+    data = PipelineMetrics.snapshot()
+    if not (PipelineMetrics.ENABLED and (data["etapas"] or data["contadores"])):
+        return None
+    record = {
+        "fecha": datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
+        "comando": command,
+        "pid": os.getpid(),
+        **data
+    }
+    TicketStore.append_record(path or METRICS_STORE, record)
+    # La escritura del propio registro no cuenta para la siguiente ejecución
+    PipelineMetrics.snapshot()
+    return record
+
+
+def aggregate(path=None, command=None):
+    """
+    Suma las métricas de todas las ejecuciones guardadas (o solo las de un comando) y
+    devuelve {"ejecuciones", "etapas", "contadores"}, con el tiempo medio por llamada.
+    """
+    runs = 0
+    stages = {}
+    counters = {}
+    for record in TicketStore.iter_records(path or METRICS_STORE):
+        if command and record.get("comando") != command:
+            continue
+        runs += 1
+        for stage, entry in record["etapas"].items():
+            total = stages.setdefault(stage, {"llamadas": 0, "segundos": 0.0})
+            total["llamadas"] += entry["llamadas"]
+            total["segundos"] += entry["segundos"]
+        for name, value in record["contadores"].items():
+            counters[name] = counters.get(name, 0) + value
+    for entry in stages.values():
+        entry["segundos"] = round(entry["segundos"], 6)
+        entry["media"] = round(entry["segundos"] / entry["llamadas"], 6) if entry["llamadas"] else 0.0
+    return {"ejecuciones": runs, "etapas": stages, "contadores": counters}
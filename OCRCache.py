@@ -0,0 +1,125 @@
+import hashlib
+import os
+
+import PipelineMetrics
+
+# Caché en disco del texto extraído de cada ticket, direccionada por contenido: la clave
+# es el hash del archivo más la configuración de preprocesado y OCR. Reimportar un ticket
+# que no ha cambiado devuelve el texto guardado sin volver a pasar por tesseract ni PyPDF2.
+CACHE_DIR = os.environ.get('TICKET_OCR_CACHE_DIR', '.ocr_cache')
+MAX_CACHE_BYTES = int(os.environ.get('TICKET_OCR_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
+# Permite desactivar la caché globalmente (TICKET_OCR_CACHE=0)
+ENABLED = os.environ.get('TICKET_OCR_CACHE', '1') != '0'
+
+CACHE_EXTENSION = '.txt'
+
+# Recorrer el directorio para medir la caché cuesta tanto como entradas tenga, así que no
+# se hace en cada escritura: cada proceso suma lo que escribe a la última medida y solo
+# vuelve a medir (y expulsa) cuando esa estimación pasa del límite o, como mucho, cada
+# EVICT_INTERVAL escrituras, porque otros procesos del pool también escriben.
+EVICT_INTERVAL = 100
+# Al expulsar se deja la caché en esta fracción del límite, para que con la caché llena
+# no haya que volver a medir en cada escritura
+EVICT_LOW_WATER = 0.9
+
+# Tamaño estimado de la caché en este proceso (None: sin medir) y escrituras desde la última medida
+_estimated_bytes = None
+_puts_since_evict = 0
+
+
+def file_hash(file_path):
+    """Calcula el SHA-256 del contenido del archivo."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(file_path, config):
+    """Clave de la caché: hash del archivo y descripción de la configuración usada."""
+    digest = hashlib.sha256()
+    digest.update(file_hash(file_path).encode('ascii'))
+    digest.update(config.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _entry_path(key):
+    return os.path.join(CACHE_DIR, key + CACHE_EXTENSION)
+
+
+def get(key):
+    """Devuelve el texto guardado para la clave, o None si no está en la caché."""
+    path = _entry_path(key)
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            text = file.read()
+    except FileNotFoundError:
+        return None
+    # Actualizar la fecha de modificación marca la entrada como usada recientemente (LRU)
+    os.utime(path)
+    return text
+
+
+def put(key, text):
+    """Guarda el texto en la caché y expulsa las entradas más antiguas si se supera el límite."""
+    global _estimated_bytes, _puts_since_evict
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _entry_path(key)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    data = text.encode('utf-8')
+    with open(temp_path, 'wb') as file:
+        file.write(data)
+    os.replace(temp_path, path)
+    _puts_since_evict += 1
+    if _estimated_bytes is not None:
+        _estimated_bytes += len(data)
+    if _estimated_bytes is None or _estimated_bytes > MAX_CACHE_BYTES or _puts_since_evict >= EVICT_INTERVAL:
+        _estimated_bytes = evict()
+        _puts_since_evict = 0
+
+
+def evict(max_bytes=None):
+    """
+    Si la caché no cabe en max_bytes, elimina las entradas usadas hace más tiempo hasta
+    dejarla en EVICT_LOW_WATER * max_bytes. Devuelve el tamaño de la caché que queda.
+    """
+    max_bytes = MAX_CACHE_BYTES if max_bytes is None else max_bytes
+    entries = []
+    total_bytes = 0
+    with os.scandir(CACHE_DIR) as scan:
+        for entry in scan:
+            if entry.name.endswith(CACHE_EXTENSION):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_bytes += stat.st_size
+    if total_bytes <= max_bytes:
+        return total_bytes
+    for _, size, path in sorted(entries):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_bytes -= size
+        if total_bytes <= max_bytes * EVICT_LOW_WATER:
+            break
+    return total_bytes
+
+
+def cached_text(file_path, config, extract, use_cache=True):
+    """
+    Devuelve el texto de file_path desde la caché o, si no está, lo obtiene con
+    extract(file_path) y lo guarda. Con use_cache=False se omite la caché por completo.
+    """
+    if not (use_cache and ENABLED):
+        return extract(file_path)
+    key = cache_key(file_path, config)
+    text = get(key)
+    if text is None:
+        PipelineMetrics.count(PipelineMetrics.COUNT_CACHE_MISSES)
+        text = extract(file_path)
+        put(key, text)
+    else:
+        PipelineMetrics.count(PipelineMetrics.COUNT_CACHE_HITS)
+    return text
@@ -0,0 +1,184 @@
+import atexit
+import os
+import shlex
+import subprocess
+import tempfile
+
+# Motores de OCR intercambiables. Todos reciben imágenes ya preprocesadas (arrays de
+# OpenCV) y devuelven el texto de tesseract sin corregir.
+#
+#   pytesseract  -> el comportamiento original: un proceso de tesseract por imagen,
+#                   con archivos temporales y carga del modelo de idioma cada vez.
+#   tesserocr    -> motor "en caliente": mantiene la API de tesseract cargada en el
+#                   proceso y le pasa las imágenes en memoria (requiere tesserocr).
+#   batch        -> un único proceso de tesseract por lote de imágenes (modo lista).
+#
+# El motor se elige con TICKET_OCR_ENGINE; por defecto ('auto') se usa tesserocr si
+# está instalado (y admite la configuración) y, si no, pytesseract. Cada motor importa
+# sus dependencias al crearse o al usarse, no al importar este módulo.
+DEFAULT_ENGINE = os.environ.get('TICKET_OCR_ENGINE', 'auto')
+
+# Separador de páginas que tesseract escribe al final de cada imagen en modo lista
+PAGE_SEPARATOR = '\f'
+
+
+# Opciones de línea de órdenes de tesseract con valor que admite la API de tesserocr
+TESSEROCR_OPTIONS = {'--psm': 'psm', '--oem': 'oem', '-l': 'lang', '--tessdata-dir': 'path'}
+
+
+def parse_tesseract_config(config):
+    """
+    Traduce una configuración de tesseract ('--psm 6 -l spa -c var=valor...') a los
+    parámetros de la API de tesserocr: devuelve ({psm, oem, lang, path}, {variable: valor}).
+    Lanza ValueError con las opciones que no se pueden aplicar por la API.
+    """
+    options = {}
+    variables = {}
+    arguments = shlex.split(config)
+    index = 0
+    while index < len(arguments):
+        option = arguments[index]
+        if index + 1 >= len(arguments) or (option not in TESSEROCR_OPTIONS and option != '-c'):
+            raise ValueError(f"Opción de tesseract no admitida por tesserocr: {option}")
+        value = arguments[index + 1]
+        index += 2
+        if option == '-c':
+            name, separator, variable_value = value.partition('=')
+            if not separator or not name:
+                raise ValueError(f"Variable de tesseract no válida: -c {value}")
+            variables[name] = variable_value
+        elif option in ('--psm', '--oem'):
+            try:
+                options[TESSEROCR_OPTIONS[option]] = int(value)
+            except ValueError:
+                raise ValueError(f"Valor no válido para {option}: {value}") from None
+        else:
+            options[TESSEROCR_OPTIONS[option]] = value
+    return options, variables
+
+
+class PytesseractEngine:
+    """Un proceso de tesseract por imagen, a través de pytesseract."""
+    name = 'pytesseract'
+
+    def __init__(self, config):
+        self.config = config
+
+    def image_to_string(self, image):
+        import pytesseract
+        return pytesseract.image_to_string(image, config=self.config)
+
+    def images_to_strings(self, images):
+        return [self.image_to_string(image) for image in images]
+
+    def close(self):
+        pass
+
+
+class TesserocrEngine:
+    """Mantiene una instancia de la API de tesseract cargada y reutilizada entre imágenes."""
+    name = 'tesserocr'
+
+    def __init__(self, config):
+        import tesserocr
+        # La configuración se interpreta antes de cargar el modelo: lo que no se puede
+        # aplicar por la API es un error (en 'auto' se usa entonces pytesseract)
+        options, variables = parse_tesseract_config(config)
+        psm = options.pop('psm', tesserocr.PSM.AUTO)
+        # Las variables se pasan a Init, que admite también las que solo se leen al cargar
+        self.api = tesserocr.PyTessBaseAPI(init=False)
+        self.api.Init(variables=variables, **options)
+        self.api.SetPageSegMode(psm)
+
+    def image_to_string(self, image):
+        from PIL import Image
+        self.api.SetImage(Image.fromarray(image))
+        return self.api.GetUTF8Text()
+
+    def images_to_strings(self, images):
+        return [self.image_to_string(image) for image in images]
+
+    def close(self):
+        self.api.End()
+
+
+class TesseractBatchEngine:
+    """
+    Procesa un lote de imágenes con una sola ejecución de tesseract usando una lista
+    de archivos, de modo que el arranque y la carga del modelo se pagan una vez por lote.
+    """
+    name = 'batch'
+
+    def __init__(self, config):
+        self.config = config
+        self.fallback = PytesseractEngine(config)
+
+    def image_to_string(self, image):
+        return self.images_to_strings([image])[0]
+
+    def images_to_strings(self, images):
+        if not images:
+            return []
+        import cv2
+        import pytesseract
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for index, image in enumerate(images):
+                path = os.path.join(tmp, f"{index:06d}.png")
+                cv2.imwrite(path, image)
+                paths.append(path)
+            list_path = os.path.join(tmp, 'images.txt')
+            with open(list_path, 'w', encoding='utf-8') as file:
+                file.write('\n'.join(paths) + '\n')
+
+            command = [pytesseract.pytesseract.tesseract_cmd, list_path, 'stdout'] + self.config.split()
+            result = subprocess.run(command, capture_output=True, check=True)
+
+        texts = result.stdout.decode('utf-8').split(PAGE_SEPARATOR)
+        if len(texts) < len(images):
+            # Si tesseract no ha separado las páginas como se esperaba, repetir imagen a imagen
+            return self.fallback.images_to_strings(images)
+        return texts[:len(images)]
+
+    def close(self):
+        pass
+
+
+ENGINES = {
+    PytesseractEngine.name: PytesseractEngine,
+    TesserocrEngine.name: TesserocrEngine,
+    TesseractBatchEngine.name: TesseractBatchEngine,
+}
+
+# Un motor por proceso (y por configuración): en los procesos del pool de importación
+# por lotes el motor se crea una vez y se reutiliza para todos los tickets.
+_engines = {}
+
+
+def create_engine(name, config):
+    """Crea un motor por nombre. 'auto' usa tesserocr si está disponible y admite la configuración."""
+    if name == 'auto':
+        try:
+            return TesserocrEngine(config)
+        except (ImportError, ValueError):
+            return PytesseractEngine(config)
+    return ENGINES[name](config)
+
+
+def get_engine(config, name=None):
+    """Devuelve el motor del proceso actual para la configuración dada, creándolo si hace falta."""
+    name = name or DEFAULT_ENGINE
+    key = (name, config)
+    if key not in _engines:
+        _engines[key] = create_engine(name, config)
+    return _engines[key]
+
+
+def close_engines():
+    """Libera los motores del proceso. Se llama al salir (en el pool, desde su finalizador)."""
+    for engine in _engines.values():
+        engine.close()
+    _engines.clear()
+
+
+atexit.register(close_engines)
@@ -0,0 +1,82 @@
+import os
+import time
+from contextlib import contextmanager
+
+# Métricas de la importación de tickets: tiempo por etapa (preprocesado, OCR, PyPDF2,
+# análisis, escritura en los almacenes) y contadores (líneas reconocidas y no
+# reconocidas, bytes escritos, aciertos de la caché...). Se acumulan en memoria durante
+# la importación y al terminar MetricsStore añade un registro por ejecución al almacén de
+# métricas. Este módulo no depende de los almacenes, porque TicketStore mide con él sus
+# propias escrituras.
+
+# Permite desactivar las métricas globalmente (TICKET_METRICS=0)
+ENABLED = os.environ.get('TICKET_METRICS', '1') != '0'
+
+# Etapas
+STAGE_PREPROCESS = 'preprocesado'
+STAGE_OCR = 'ocr'
+STAGE_IMAGE_TEXT = 'texto_imagen'
+STAGE_PDF_TEXT = 'texto_pdf'
+STAGE_PDF_TEXT_LAYER = 'pdf_capa_texto'
+STAGE_PARSE = 'analisis'
+STAGE_STORE_WRITE = 'escritura'
+
+# Contadores
+COUNT_MATCHED_LINES = 'lineas_reconocidas'
+COUNT_UNMATCHED_LINES = 'lineas_no_reconocidas'
+COUNT_BYTES_WRITTEN = 'bytes_escritos'
+COUNT_CACHE_HITS = 'cache_aciertos'
+COUNT_CACHE_MISSES = 'cache_fallos'
+
+# Acumuladores del proceso actual: {etapa: [llamadas, segundos]} y {contador: valor}
+_stages = {}
+_counters = {}
+
+
+def add_time(stage, seconds, calls=1):
+    if ENABLED:
+        entry = _stages.setdefault(stage, [0, 0.0])
+        entry[0] += calls
+        entry[1] += seconds
+
+
+def count(name, value=1):
+    if ENABLED:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+@contextmanager
+def timed(stage):
+    """Mide el tiempo de pared del bloque y lo suma a la etapa."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(stage, time.perf_counter() - start)
+
+
+def snapshot(reset=True):
+    """
+    Devuelve las métricas acumuladas como {"etapas": ..., "contadores": ...}.
+    Con reset=True se vacían los acumuladores (por ejemplo, en un proceso del pool
+    antes de devolver sus métricas al proceso principal).
+    """
+    data = {
+        "etapas": {stage: {"llamadas": calls, "segundos": round(seconds, 6)}
+                   for stage, (calls, seconds) in _stages.items()},
+        "contadores": dict(_counters),
+    }
+    if reset:
+        _stages.clear()
+        _counters.clear()
+    return data
+
+
+def merge(data):
+    """Suma a los acumuladores las métricas de otro proceso (resultado de snapshot)."""
+    if not data:
+        return
+    for stage, entry in data["etapas"].items():
+        add_time(stage, entry["segundos"], entry["llamadas"])
+    for name, value in data["contadores"].items():
+        count(name, value)
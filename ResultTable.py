@@ -0,0 +1,105 @@
+import tkinter as tk
+from tkinter import ttk
+
+import TableModel
+
+# Tabla virtualizada para mostrar resultados grandes (transacciones de un año, ticket
+# mensual...) sin crear una línea de widget por fila. Las filas y su orden están en un
+# TableModel; VirtualTable es un Treeview con tantas filas como caben en la ventana (se
+# recalculan al cambiar su tamaño) y al desplazarse se reescriben sus valores con las
+# filas visibles del modelo. Al pulsar la cabecera de una columna se ordena por ella (una
+# segunda pulsación invierte el orden).
+SORT_ASCENDING = ' ▲'
+SORT_DESCENDING = ' ▼'
+
+
+class VirtualTable:
+    """Treeview que solo pinta las filas visibles de un TableModel."""
+
+    def __init__(self, parent, columns, rows, height=TableModel.VISIBLE_ROWS):
+        self.model = TableModel.TableModel(columns, rows)
+        self.offset = 0
+        self.frame = tk.Frame(parent)
+
+        identifiers = [f"c{index}" for index in range(len(columns))]
+        self.tree = ttk.Treeview(self.frame, columns=identifiers, show='headings', height=height, selectmode='browse')
+        for index, (identifier, column) in enumerate(zip(identifiers, columns)):
+            self.tree.heading(identifier, text=column.title, command=lambda index=index: self.sort(index))
+            self.tree.column(identifier, width=column.width, anchor=column.anchor)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        # Filas fijas del Treeview; se reutilizan al desplazarse
+        self.items = [self.tree.insert('', tk.END) for _ in range(min(height, len(rows)))]
+
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.tree.bind(sequence, self.on_wheel)
+        self.tree.bind('<Prior>', lambda event: self.scroll_to(self.offset - len(self.items)))
+        self.tree.bind('<Next>', lambda event: self.scroll_to(self.offset + len(self.items)))
+        self.tree.bind('<Home>', lambda event: self.scroll_to(0))
+        self.tree.bind('<End>', lambda event: self.scroll_to(len(self.model)))
+        self.tree.bind('<Configure>', self.on_resize)
+        self.render()
+
+    def pack(self, **options):
+        self.frame.pack(**options)
+
+    def render(self):
+        for item, values in zip(self.items, self.model.window(self.offset, len(self.items))):
+            self.tree.item(item, values=values)
+        total = len(self.model)
+        if total:
+            self.scrollbar.set(self.offset / total, (self.offset + len(self.items)) / total)
+
+    def scroll_to(self, offset):
+        offset = max(0, min(offset, len(self.model) - len(self.items)))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def on_resize(self, event):
+        # La primera fila da la altura de la cabecera (su y) y la de cada fila
+        bbox = self.tree.bbox(self.items[0]) if self.items else None
+        if not bbox:
+            return
+        _, heading_height, _, row_height = bbox
+        self.set_visible_rows(max(1, (event.height - heading_height) // row_height))
+
+    def set_visible_rows(self, count):
+        """Ajusta las filas del Treeview a las que caben en la ventana."""
+        count = min(count, len(self.model))
+        if count > len(self.items):
+            self.items.extend(self.tree.insert('', tk.END) for _ in range(count - len(self.items)))
+        elif count < len(self.items):
+            self.tree.delete(*self.items[count:])
+            del self.items[count:]
+        else:
+            return
+        # Con más filas visibles puede sobrar desplazamiento al final del modelo
+        self.offset = max(0, min(self.offset, len(self.model) - count))
+        self.render()
+
+    def on_scrollbar(self, action, value, unit=None):
+        if action == tk.MOVETO:
+            self.scroll_to(int(float(value) * len(self.model)))
+        elif action == tk.SCROLL:
+            step = len(self.items) if unit == tk.PAGES else 1
+            self.scroll_to(self.offset + int(value) * step)
+
+    def on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.offset - 3)
+        else:
+            self.scroll_to(self.offset + 3)
+        return 'break'
+
+    def sort(self, column):
+        self.model.sort(column)
+        for index, identifier in enumerate(self.tree['columns']):
+            title = self.model.columns[index].title
+            if index == column:
+                title += SORT_DESCENDING if self.model.descending else SORT_ASCENDING
+            self.tree.heading(identifier, text=title)
+        self.offset = 0
+        self.render()
@@ -0,0 +1,413 @@
+import argparse
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import TicketStore
+
+# Almacén opcional en SQLite para las consultas de AnalizadorDatos y AnalizadorCB.
+# Los almacenes JSON siguen siendo la fuente de los datos: la base de datos se rellena
+# importándolos y se vuelve a sincronizar sola cuando cambian. Las consultas por rango
+# de fechas y por producto usan índices en lugar de recorrer todos los tickets.
+#
+# Se activa con TICKET_BACKEND=sqlite; la ruta de la base de datos se cambia con
+# TICKET_DATABASE.
+DATABASE = os.environ.get('TICKET_DATABASE', 'tickets.db')
+ENABLED = os.environ.get('TICKET_BACKEND', 'json') == 'sqlite'
+
+# Almacenes de tickets que se importan, por tienda
+TICKET_STORES = {
+    'mercadona': 'mercadona_tickets.json',
+    'lidl': 'lidl_tickets.json',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    rowid INTEGER PRIMARY KEY,
+    tienda TEXT NOT NULL,
+    id INTEGER,
+    fecha_compra TEXT,
+    fecha TEXT,              -- fecha_compra como 'AAAA-MM-DD HH:MM', NULL si no es válida
+    precio_total REAL
+);
+CREATE INDEX IF NOT EXISTS tickets_fecha ON tickets (tienda, fecha);
+
+CREATE TABLE IF NOT EXISTS items (
+    rowid INTEGER PRIMARY KEY,
+    ticket INTEGER NOT NULL REFERENCES tickets (rowid),
+    descripcion TEXT,
+    cantidad INTEGER,
+    precio_unitario REAL
+);
+CREATE INDEX IF NOT EXISTS items_descripcion ON items (descripcion);
+CREATE INDEX IF NOT EXISTS items_ticket ON items (ticket);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    rowid INTEGER PRIMARY KEY,
+    cuenta TEXT NOT NULL,
+    id INTEGER,
+    fecha_oper TEXT,
+    fecha TEXT,              -- fecha_oper como 'AAAA-MM-DD', NULL si no es válida
+    concepto TEXT,
+    concepto_minusculas TEXT,
+    fecha_valor TEXT,
+    importe TEXT,
+    saldo TEXT
+);
+CREATE INDEX IF NOT EXISTS transactions_fecha ON transactions (cuenta, fecha);
+
+-- Versión del origen importado, para saber cuándo hay que volver a sincronizar
+CREATE TABLE IF NOT EXISTS sources (
+    nombre TEXT PRIMARY KEY,
+    origen TEXT,
+    version TEXT
+);
+"""
+
+
+def connect(database=None, shared=False):
+    """
+    Abre la base de datos. Con shared=True la conexión puede usarse desde otros hilos
+    (las consultas de las interfaces se ejecutan en hilos de trabajo, ver TaskRunner).
+    """
+    connection = sqlite3.connect(database or DATABASE, check_same_thread=not shared)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+@contextmanager
+def open_database(database=None):
+    """Conexión para una transacción: confirma al salir (o deshace si hay error) y se cierra."""
+    connection = connect(database)
+    try:
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+def _iso_datetime(fecha_compra):
+    try:
+        return datetime.strptime(fecha_compra, '%d/%m/%Y %H:%M').strftime('%Y-%m-%d %H:%M')
+    except (TypeError, ValueError):
+        return None
+
+
+def _iso_date(fecha_oper):
+    try:
+        return datetime.strptime(fecha_oper, '%d/%m/%Y').strftime('%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+
+def _month_range(month, year):
+    """Límites [inicio, fin) de un mes como cadenas ISO comparables."""
+    start = f"{year:04d}-{month:02d}-01"
+    end = f"{year + 1:04d}-01-01" if month == 12 else f"{year:04d}-{month + 1:02d}-01"
+    return start, end
+
+
+def _source_version(connection, name):
+    row = connection.execute("SELECT origen, version FROM sources WHERE nombre = ?", (name,)).fetchone()
+    return row if row else (None, None)
+
+
+def _set_source_version(connection, name, path, version):
+    connection.execute(
+        "INSERT OR REPLACE INTO sources (nombre, origen, version) VALUES (?, ?, ?)",
+        (name, os.path.abspath(path), version)
+    )
+
+
+def _ticket_store_version(path):
+    meta = TicketStore.read_meta(path)
+    return f"{meta['data_version']}:{meta['log_size']}"
+
+
+def _file_version(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _account_version(path):
+    # Las cuentas pueden ser el JSON de un extracto o un almacén de TicketStore. Los
+    # almacenes se importan ya ordenados por fecha ('ordenado:' fuerza a reimportar los
+    # que se importaron antes sin ordenar)
+    if os.path.exists(TicketStore.store_log_path(path)):
+        return 'ordenado:' + _ticket_store_version(path)
+    return _file_version(path)
+
+
+def import_tickets(connection, tienda, records):
+    """Sustituye los tickets de la tienda por records (registros como los de los almacenes JSON)."""
+    connection.execute("DELETE FROM items WHERE ticket IN (SELECT rowid FROM tickets WHERE tienda = ?)", (tienda,))
+    connection.execute("DELETE FROM tickets WHERE tienda = ?", (tienda,))
+    count = 0
+    bad_dates = 0
+    for record in records:
+        fecha = _iso_datetime(record.get('fecha_compra'))
+        bad_dates += fecha is None
+        cursor = connection.execute(
+            "INSERT INTO tickets (tienda, id, fecha_compra, fecha, precio_total) VALUES (?, ?, ?, ?, ?)",
+            (tienda, record.get('id'), record.get('fecha_compra'), fecha, record['precio_total'])
+        )
+        connection.executemany(
+            "INSERT INTO items (ticket, descripcion, cantidad, precio_unitario) VALUES (?, ?, ?, ?)",
+            [(cursor.lastrowid, item['descripcion'], item['cantidad'], item['precio_unitario'])
+             for item in record['items']]
+        )
+        count += 1
+    if bad_dates:
+        print(f"{bad_dates} tickets de {tienda} con fecha no válida; no aparecerán en las consultas por fecha.")
+    return count
+
+
+def import_ticket_store(tienda, path=None, database=None):
+    """Importa un almacén de tickets JSON a la base de datos. Devuelve el número de tickets."""
+    path = path or TICKET_STORES[tienda]
+    with open_database(database) as connection:
+        count = import_tickets(connection, tienda, TicketStore.iter_records(path))
+        _set_source_version(connection, 'tickets:' + tienda, path, _ticket_store_version(path))
+    return count
+
+
+def sync_ticket_store(tienda, path=None, database=None):
+    """Vuelve a importar el almacén si ha cambiado desde la última importación."""
+    path = path or TICKET_STORES[tienda]
+    with open_database(database) as connection:
+        origin, version = _source_version(connection, 'tickets:' + tienda)
+    if origin != os.path.abspath(path) or version != _ticket_store_version(path):
+        import_ticket_store(tienda, path, database)
+
+
+def import_bank_json(cuenta, path, database=None):
+    """
+    Importa las transacciones de un JSON de extracto (o almacén de cuenta) a la cuenta,
+    en el orden de AnalizadorCB.read_bank_data. Devuelve cuántas hay.
+    """
+    transactions = TicketStore.read_sorted_records(
+        path, lambda transaction: _iso_date(transaction['fecha_oper']) or '', reverse=True)
+    with open_database(database) as connection:
+        connection.execute("DELETE FROM transactions WHERE cuenta = ?", (cuenta,))
+        connection.executemany(
+            "INSERT INTO transactions (cuenta, id, fecha_oper, fecha, concepto, concepto_minusculas, "
+            "fecha_valor, importe, saldo) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(cuenta, item.get('id'), item['fecha_oper'], _iso_date(item['fecha_oper']), item['concepto'],
+              item['concepto'].lower(), item.get('fecha_valor'), item['importe'], item['saldo'])
+             for item in transactions]
+        )
+        _set_source_version(connection, 'cuenta:' + cuenta, path, _account_version(path))
+    return len(transactions)
+
+
+def sync_bank_json(cuenta, path, database=None):
+    """Vuelve a importar el JSON de la cuenta si ha cambiado desde la última importación."""
+    with open_database(database) as connection:
+        origin, version = _source_version(connection, 'cuenta:' + cuenta)
+    if origin != os.path.abspath(path) or version != _account_version(path):
+        import_bank_json(cuenta, path, database)
+
+
+def export_tickets(tienda, json_path, database=None):
+    """Exporta los tickets de la tienda al formato de array JSON de los almacenes."""
+    TicketStore.check_not_shadowed(json_path)
+    tickets = TicketQueries(tienda, database)
+    records = tickets.records()
+    with open(json_path, 'w', encoding='utf-8') as file:
+        json.dump(records, file, indent=4, ensure_ascii=False)
+    return len(records)
+
+
+def export_bank_json(cuenta, json_path, database=None):
+    """Exporta la cuenta al formato JSON de los extractos importados."""
+    TicketStore.check_not_shadowed(json_path)
+    records = TransactionQueries(cuenta, database).records()
+    with open(json_path, 'w') as file:
+        json.dump(records, file, indent=4)
+    return len(records)
+
+
+class TicketQueries:
+    """
+    Tickets de una tienda servidos desde SQLite. Tiene los mismos cálculos que
+    AnalizadorDatos hace sobre la lista de tickets, resueltos con consultas indexadas.
+    """
+
+    def __init__(self, tienda='mercadona', database=None):
+        self.tienda = tienda
+        self.connection = connect(database, shared=True)
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM tickets WHERE tienda = ?", (self.tienda,)).fetchone()[0]
+
+    def records(self):
+        """Devuelve los tickets como registros JSON, en el orden de importación."""
+        records = []
+        current = None
+        for rowid, ticket_id, fecha_compra, precio_total, descripcion, cantidad, precio_unitario in self.connection.execute(
+                "SELECT t.rowid, t.id, t.fecha_compra, t.precio_total, i.descripcion, i.cantidad, i.precio_unitario "
+                "FROM tickets t LEFT JOIN items i ON i.ticket = t.rowid WHERE t.tienda = ? ORDER BY t.rowid, i.rowid",
+                (self.tienda,)):
+            if current is None or current[0] != rowid:
+                current = (rowid, {"id": ticket_id, "fecha_compra": fecha_compra, "items": [],
+                                   "precio_total": precio_total})
+                records.append(current[1])
+            if descripcion is not None:
+                current[1]["items"].append(
+                    {"descripcion": descripcion, "cantidad": cantidad, "precio_unitario": precio_unitario})
+        return records
+
+    def total_expense(self):
+        return self.connection.execute(
+            "SELECT TOTAL(precio_total) FROM tickets WHERE tienda = ?", (self.tienda,)).fetchone()[0]
+
+    def count_purchased_items(self):
+        # Mismo orden que Counter.most_common(): cantidad descendente y, a igualdad, primera aparición
+        return self.connection.execute(
+            "SELECT i.descripcion, SUM(i.cantidad) AS total FROM items i JOIN tickets t ON t.rowid = i.ticket "
+            "WHERE t.tienda = ? GROUP BY i.descripcion ORDER BY total DESC, MIN(i.rowid)",
+            (self.tienda,)).fetchall()
+
+    def top_purchased_items(self, k, offset=0):
+        return self.connection.execute(
+            "SELECT i.descripcion, SUM(i.cantidad) AS total FROM items i JOIN tickets t ON t.rowid = i.ticket "
+            "WHERE t.tienda = ? GROUP BY i.descripcion ORDER BY total DESC, MIN(i.rowid) LIMIT ? OFFSET ?",
+            (self.tienda, k, offset)).fetchall()
+
+    def unique_products(self):
+        return [row[0] for row in self.connection.execute(
+            "SELECT DISTINCT i.descripcion FROM items i JOIN tickets t ON t.rowid = i.ticket "
+            "WHERE t.tienda = ? ORDER BY i.descripcion", (self.tienda,))]
+
+    def expense_in_date_range(self, start_date, end_date):
+        end = (end_date + timedelta(days=1)).strftime('%Y-%m-%d')
+        return self.connection.execute(
+            "SELECT TOTAL(precio_total) FROM tickets WHERE tienda = ? AND fecha >= ? AND fecha < ?",
+            (self.tienda, start_date.strftime('%Y-%m-%d'), end)).fetchone()[0]
+
+    def product_purchases(self, selected_product):
+        rows = self.connection.execute(
+            "SELECT t.fecha_compra, i.cantidad FROM items i JOIN tickets t ON t.rowid = i.ticket "
+            "WHERE i.descripcion = ? AND t.tienda = ? ORDER BY i.rowid", (selected_product, self.tienda)).fetchall()
+        return [fecha for fecha, _ in rows], sum(cantidad for _, cantidad in rows)
+
+    def price_series(self, selected_product):
+        rows = self.connection.execute(
+            "SELECT t.fecha, i.precio_unitario FROM items i JOIN tickets t ON t.rowid = i.ticket "
+            "WHERE i.descripcion = ? AND t.tienda = ? AND t.fecha IS NOT NULL ORDER BY t.fecha, i.rowid",
+            (selected_product, self.tienda)).fetchall()
+        return [(datetime.strptime(fecha, '%Y-%m-%d %H:%M'), precio_unitario) for fecha, precio_unitario in rows]
+
+    def product_in_month(self, month, year, selected_product):
+        start, end = _month_range(month, year)
+        rows = self.connection.execute(
+            "SELECT t.fecha_compra, i.cantidad FROM items i JOIN tickets t ON t.rowid = i.ticket "
+            "WHERE i.descripcion = ? AND t.tienda = ? AND t.fecha >= ? AND t.fecha < ? ORDER BY i.rowid",
+            (selected_product, self.tienda, start, end)).fetchall()
+        return sum(cantidad for _, cantidad in rows), [fecha for fecha, _ in rows]
+
+    def monthly_ticket(self, month, year):
+        start, end = _month_range(month, year)
+        monthly_summary = {}
+        total_expense = 0
+        for descripcion, cantidad, precio_unitario in self.connection.execute(
+                "SELECT i.descripcion, i.cantidad, i.precio_unitario FROM tickets t JOIN items i ON i.ticket = t.rowid "
+                "WHERE t.tienda = ? AND t.fecha >= ? AND t.fecha < ? ORDER BY t.rowid, i.rowid",
+                (self.tienda, start, end)):
+            precio_unitario = abs(precio_unitario)
+            precio_total = cantidad * precio_unitario
+            summary = monthly_summary.setdefault(descripcion, {'cantidad': 0, 'precio_unitario': 0, 'precio_total': 0})
+            summary['cantidad'] += cantidad
+            summary['precio_unitario'] = precio_unitario
+            summary['precio_total'] += precio_total
+            total_expense += precio_total
+        return monthly_summary, total_expense
+
+
+class TransactionQueries:
+    """Transacciones de una cuenta servidas desde SQLite, con los cálculos de AnalizadorCB."""
+
+    COLUMNS = "id, fecha_oper, concepto, fecha_valor, importe, saldo"
+
+    def __init__(self, cuenta, database=None):
+        self.cuenta = cuenta
+        self.connection = connect(database, shared=True)
+
+    def __len__(self):
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM transactions WHERE cuenta = ?", (self.cuenta,)).fetchone()[0]
+
+    def _select(self, where, parameters):
+        cursor = self.connection.execute(
+            f"SELECT {self.COLUMNS} FROM transactions WHERE cuenta = ? {where} ORDER BY rowid",
+            (self.cuenta, *parameters))
+        return [
+            {"id": row[0], "fecha_oper": row[1], "concepto": row[2], "fecha_valor": row[3],
+             "importe": row[4], "saldo": row[5]}
+            for row in cursor
+        ]
+
+    def records(self):
+        return self._select("", ())
+
+    def _balance(self, transactions):
+        balance = sum(float(transaction['importe'].replace(',', '.')) for transaction in transactions)
+        saldo_final = transactions[0]['saldo'] if transactions else 'N/A'
+        saldo_inicial = transactions[-1]['saldo'] if transactions else 'N/A'
+        return transactions, balance, saldo_inicial, saldo_final
+
+    def monthly_balance(self, month, year):
+        return self._balance(self._select("AND fecha >= ? AND fecha < ?", _month_range(month, year)))
+
+    def annual_balance(self, year):
+        return self._balance(self._select("AND fecha >= ? AND fecha < ?", (f"{year:04d}-01-01", f"{year + 1:04d}-01-01")))
+
+    def transactions_by_concept(self, concept):
+        return self._select("AND instr(concepto_minusculas, ?) > 0", (concept.lower(),))
+
+
+def load_tickets(tienda='mercadona', path=None, database=None):
+    """Sincroniza el almacén de la tienda con la base de datos y devuelve sus consultas."""
+    sync_ticket_store(tienda, path, database)
+    return TicketQueries(tienda, database)
+
+
+def load_account(cuenta, path, database=None):
+    """Sincroniza el JSON de la cuenta con la base de datos y devuelve sus consultas."""
+    sync_bank_json(cuenta, path, database)
+    return TransactionQueries(cuenta, database)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa y exporta los almacenes JSON a la base de datos SQLite.")
+    parser.add_argument('--basedatos', default=None, help="ruta de la base de datos (por defecto, TICKET_DATABASE)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    importar = subparsers.add_parser('importar', help="importar los almacenes de tickets y los extractos indicados")
+    importar.add_argument('extractos', nargs='*', help="JSON de extractos bancarios; la cuenta es el nombre del archivo")
+    exportar = subparsers.add_parser('exportar', help="exportar la base de datos a JSON")
+    exportar.add_argument('directorio')
+    args = parser.parse_args(argv)
+
+    if args.command == 'importar':
+        for tienda, path in TICKET_STORES.items():
+            if TicketStore.store_exists(path):
+                print(f"{tienda}: {import_ticket_store(tienda, path, args.basedatos)} tickets")
+        for path in args.extractos:
+            cuenta = os.path.splitext(os.path.basename(path))[0]
+            print(f"{cuenta}: {import_bank_json(cuenta, path, args.basedatos)} transacciones")
+    else:
+        os.makedirs(args.directorio, exist_ok=True)
+        with open_database(args.basedatos) as connection:
+            cuentas = [row[0] for row in connection.execute("SELECT DISTINCT cuenta FROM transactions")]
+        for tienda, path in TICKET_STORES.items():
+            count = export_tickets(tienda, os.path.join(args.directorio, path), args.basedatos)
+            print(f"{tienda}: {count} tickets exportados")
+        for cuenta in cuentas:
+            count = export_bank_json(cuenta, os.path.join(args.directorio, cuenta + '.json'), args.basedatos)
+            print(f"{cuenta}: {count} transacciones exportadas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Modelo de las tablas de resultados de las interfaces (ResultTable.VirtualTable): guarda
+# las filas del resultado tal cual (diccionarios o tuplas) y el orden en que se muestran;
+# ordenar por una columna solo calcula una permutación de índices. No usa tkinter, así
+# que puede usarse y medirse sin pantalla (benchmarks/run.py).
+VISIBLE_ROWS = 20
+COLUMN_WIDTH = 110
+
+
+def date_key(value):
+    """Clave de orden de una fecha 'dd/mm/aaaa' (sin convertirla a datetime)."""
+    return value[6:10] + value[3:5] + value[0:2]
+
+
+def amount_key(value):
+    """Clave de orden de un importe con coma decimal ('-12,50'); lo no numérico va al final."""
+    try:
+        return float(str(value).replace(',', '.'))
+    except ValueError:
+        return float('inf')
+
+
+class Column:
+    """
+    Columna de la tabla: `field` es la clave (o el índice) del valor en cada fila, `key`
+    la clave de orden y `format` convierte el valor en el texto que se muestra. `anchor`
+    es la alineación de Tk ('w' a la izquierda, 'e' a la derecha).
+    """
+
+    __slots__ = ('title', 'field', 'key', 'format', 'width', 'anchor')
+
+    def __init__(self, title, field, key=None, format=str, width=COLUMN_WIDTH, anchor='w'):
+        self.title = title
+        self.field = field
+        self.key = key
+        self.format = format
+        self.width = width
+        self.anchor = anchor
+
+
+class TableModel:
+    """Filas de un resultado y el orden en que se muestran."""
+
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+        # Permutación de las filas (None: el orden del resultado)
+        self.order = None
+        self.sort_column = None
+        self.descending = False
+
+    def __len__(self):
+        return len(self.rows)
+
+    def sort(self, column):
+        """Ordena por la columna (índice); si ya estaba ordenada por ella, invierte el orden."""
+        self.descending = column == self.sort_column and not self.descending
+        self.sort_column = column
+        field = self.columns[column].field
+        key = self.columns[column].key
+        rows = self.rows
+        if key is None:
+            sort_key = lambda index: rows[index][field]
+        else:
+            sort_key = lambda index: key(rows[index][field])
+        # sorted es estable también con reverse=True: los empates conservan su orden
+        self.order = sorted(range(len(rows)), key=sort_key, reverse=self.descending)
+
+    def row(self, position):
+        """Fila que ocupa la posición dada en el orden actual."""
+        return self.rows[position if self.order is None else self.order[position]]
+
+    def window(self, offset, count):
+        """Textos de las `count` filas a partir de la posición `offset`."""
+        end = min(offset + count, len(self.rows))
+        return [
+            tuple(column.format(row[column.field]) for column in self.columns)
+            for row in map(self.row, range(offset, end))
+        ]
+
+
+def transaction_columns():
+    """Columnas de una lista de transacciones bancarias (AnalizadorCB)."""
+    return [
+        Column("Fecha", 'fecha_oper', key=date_key, width=90),
+        Column("Concepto", 'concepto', key=str.lower, width=220),
+        Column("Importe (€)", 'importe', key=amount_key, width=90, anchor='e'),
+        Column("Saldo (€)", 'saldo', key=amount_key, width=90, anchor='e'),
+    ]
@@ -0,0 +1,42 @@
+import threading
+import time
+
+# Avance y cancelación de las tareas de TaskRunner. Está aparte (sin tkinter) porque lo
+# usan también los cálculos que no dependen de la interfaz, como los índices de
+# TicketModel: las funciones que aceptan `task` llaman a task.progress(hechos, total)
+# cada PROGRESS_STEP elementos y ahí mismo se interrumpen si la tarea se ha cancelado.
+PROGRESS_STEP = 10000
+# Intervalo mínimo entre dos avisos de progreso de una misma tarea
+PROGRESS_INTERVAL = 0.1
+
+
+class Cancelled(Exception):
+    """La tarea se ha cancelado (la ha sustituido otra consulta del mismo tipo)."""
+
+
+class Task:
+    """Tarea en curso. La función que se ejecuta la recibe como argumento `task`."""
+
+    def __init__(self, key, events, on_done=None, on_error=None):
+        self.key = key
+        self.on_done = on_done
+        self.on_error = on_error
+        self._events = events
+        self._cancelled = threading.Event()
+        self._last_progress = 0.0
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def progress(self, done, total):
+        """Informa del avance. Lanza Cancelled si la tarea se ha cancelado."""
+        if self._cancelled.is_set():
+            raise Cancelled()
+        now = time.monotonic()
+        if now - self._last_progress >= PROGRESS_INTERVAL:
+            self._last_progress = now
+            self._events.put((self, 'progress', (done, total)))
@@ -0,0 +1,143 @@
+import queue
+import threading
+import tkinter as tk
+from tkinter import messagebox, ttk
+
+import TaskProgress
+
+# Ejecución de los cálculos pesados de las interfaces (AnalizadorDatos, AnalizadorCB)
+# en un hilo de trabajo, para que la ventana no se congele con archivos grandes:
+#
+# - submit() lanza la función en un hilo; el resultado vuelve al hilo de Tk por una cola
+#   que se revisa con after(), y allí se llama a on_done (que ya puede crear ventanas).
+# - Cada tarea tiene una clave (el tipo de consulta): una consulta nueva con la misma
+#   clave cancela la anterior, cuyo resultado se descarta al llegar.
+# - Las funciones que aceptan `task` informan del avance y se interrumpen si la tarea se
+#   ha cancelado (TaskProgress).
+#
+# Sin un runner instalado (install), submit() ejecuta la función en el momento, como antes.
+POLL_MS = 50
+
+
+class StatusBar:
+    """Etiqueta y barra de progreso para la parte inferior de una ventana."""
+
+    def __init__(self, parent):
+        self.frame = tk.Frame(parent)
+        self.label = tk.Label(self.frame, anchor=tk.W)
+        self.label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.bar = ttk.Progressbar(self.frame, mode='determinate', maximum=100, length=100)
+        self.bar.pack(side=tk.RIGHT)
+        self.frame.pack(side=tk.BOTTOM, fill=tk.X, padx=5, pady=5)
+
+    def show(self, text, fraction=None):
+        # La ventana de la barra puede haberse cerrado mientras terminaba la tarea
+        if not self.frame.winfo_exists():
+            return
+        self.label.config(text=text)
+        self.bar['value'] = 100 * fraction if fraction is not None else 0
+
+    def clear(self):
+        self.show("")
+
+
+class TaskRunner:
+    """Ejecuta tareas en hilos de trabajo y entrega sus resultados en el hilo de Tk."""
+
+    def __init__(self, widget, status=None, poll_ms=POLL_MS):
+        self.widget = widget
+        self.status = status
+        self.poll_ms = poll_ms
+        self.events = queue.Queue()
+        # Tarea vigente por clave
+        self.tasks = {}
+        self.polling = False
+
+    def submit(self, key, function, args=(), on_done=None, on_error=None, progress=False):
+        """
+        Ejecuta function(*args) en un hilo (con task=... si progress=True) y llama a
+        on_done(resultado) u on_error(excepción) en el hilo de Tk. Cancela la tarea
+        anterior con la misma clave.
+        """
+        previous = self.tasks.get(key)
+        if previous is not None:
+            previous.cancel()
+        task = TaskProgress.Task(key, self.events, on_done, on_error)
+        self.tasks[key] = task
+        kwargs = {'task': task} if progress else {}
+        threading.Thread(target=self._work, args=(task, function, args, kwargs), daemon=True).start()
+        if self.status is not None:
+            self.status.show(f"Procesando {key}...", 0.0)
+        if not self.polling:
+            self.polling = True
+            self.widget.after(self.poll_ms, self._poll)
+        return task
+
+    def _work(self, task, function, args, kwargs):
+        try:
+            result = function(*args, **kwargs)
+        except TaskProgress.Cancelled:
+            self.events.put((task, 'cancelled', None))
+        except Exception as e:
+            self.events.put((task, 'error', e))
+        else:
+            self.events.put((task, 'done', result))
+
+    def _poll(self):
+        while True:
+            try:
+                task, kind, value = self.events.get_nowait()
+            except queue.Empty:
+                break
+            # Resultados de tareas sustituidas por otra consulta: se descartan
+            if self.tasks.get(task.key) is not task:
+                continue
+            if kind == 'progress':
+                if self.status is not None:
+                    done, total = value
+                    self.status.show(f"Procesando {task.key}...", done / total if total else None)
+                continue
+            del self.tasks[task.key]
+            if kind == 'done' and task.on_done is not None:
+                task.on_done(value)
+            elif kind == 'error':
+                if task.on_error is not None:
+                    task.on_error(value)
+                else:
+                    messagebox.showerror("Error", f"No se pudo completar el cálculo ({task.key}):\n{value}")
+
+        if self.tasks:
+            self.widget.after(self.poll_ms, self._poll)
+        else:
+            self.polling = False
+            if self.status is not None:
+                self.status.clear()
+
+    def cancel_all(self):
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks.clear()
+
+
+# Runner de la ventana principal de la aplicación
+_runner = None
+
+
+def install(widget, status=None):
+    """Instala el runner que usará submit() para la ventana dada."""
+    global _runner
+    _runner = TaskRunner(widget, status)
+    return _runner
+
+
+def submit(key, function, args=(), on_done=None, on_error=None, progress=False):
+    """
+    Ejecuta la función con el runner instalado. Sin runner, la ejecuta en el momento y
+    llama a on_done con el resultado (las excepciones se propagan).
+    """
+    if _runner is None:
+        result = function(*args)
+        if on_done is not None:
+            on_done(result)
+        return None
+    return _runner.submit(key, function, args, on_done, on_error, progress)
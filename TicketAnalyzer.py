@@ -1,37 +1,204 @@
-import cv2
-import pytesseract
 import json
 import re
 import os
+import sys
+import time
+import glob
+import hashlib
+import functools
 import unicodedata
-import PyPDF2
-from PIL import Image
-from tkinter import Tk, filedialog, simpledialog, messagebox, Button, Frame
-
-def preprocess_image(image_path):
-    image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-    _, image = cv2.threshold(image, 150, 255, cv2.THRESH_BINARY)
+import multiprocessing
+import multiprocessing.util
+from collections import deque
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+import TicketStore
+import OCRCache
+import OCREngine
+import TicketParser
+import PipelineMetrics
+import MetricsStore
+
+# OpenCV, NumPy, PyPDF2 y pdfplumber se importan en las funciones que los usan, para que
+# los comandos que solo trabajan con los almacenes (TicketCLI reparse, dedup, compactar,
+# exportar, metricas) no los carguen.
+
+# Almacenes de datos
+SUMMARY_STORE = 'tickets.json'
+MERCADONA_STORE = 'mercadona_tickets.json'
+LIDL_STORE = 'lidl_tickets.json'
+
+# Texto extraído de cada documento importado, para poder reanalizarlo sin repetir el OCR
+RAW_TEXT_STORE = 'raw_texts.json'
+
+# Almacenes que mantiene la importación (los que compacta 'TicketCLI.py compactar')
+TICKET_STORES = (SUMMARY_STORE, MERCADONA_STORE, LIDL_STORE, RAW_TEXT_STORE)
+DOCUMENT_TICKET = TicketParser.DOCUMENT_TICKET
+DOCUMENT_RETURN = TicketParser.DOCUMENT_RETURN
+DOCUMENT_LIDL = TicketParser.DOCUMENT_LIDL
+
+# Almacén y descripción de los tickets de cada gramática
+GRAMMAR_STORES = {
+    TicketParser.GRAMMAR_MERCADONA: MERCADONA_STORE,
+    TicketParser.GRAMMAR_MERCADONA_RETURN: MERCADONA_STORE,
+    TicketParser.GRAMMAR_LIDL: LIDL_STORE,
+}
+GRAMMAR_NAMES = {
+    TicketParser.GRAMMAR_MERCADONA: "de Mercadona",
+    TicketParser.GRAMMAR_MERCADONA_RETURN: "de devolución de Mercadona",
+    TicketParser.GRAMMAR_LIDL: "de Lidl",
+}
+
+# Parámetros de preprocesado y OCR; forman parte de la clave de la caché de texto,
+# de modo que cambiarlos invalida automáticamente las entradas anteriores
+BINARY_THRESHOLD = 150
+TESSERACT_CONFIG = '--psm 6'
+IMAGE_TEXT_CONFIG = f"image|threshold={BINARY_THRESHOLD}|tesseract={TESSERACT_CONFIG}"
+PDF_OCR_RESOLUTION = 300
+PDF_TEXT_CONFIG = f"pdf|PyPDF2|ocr={PDF_OCR_RESOLUTION}dpi|threshold={BINARY_THRESHOLD}|tesseract={TESSERACT_CONFIG}"
+
+# Estado de la importación de cada documento
+STATUS_SAVED = 'guardado'
+STATUS_NO_ITEMS = 'sin_articulos'
+STATUS_DUPLICATE = 'duplicado'
+
+# Tiempos por página de cada PDF procesado (capa de texto u OCR)
+PDF_TIMINGS_STORE = 'pdf_page_timings.json'
+PAGE_TEXT_LAYER = 'texto'
+PAGE_OCR = 'ocr'
+
+def binarize_image(image):
+    import cv2
+    _, image = cv2.threshold(image, BINARY_THRESHOLD, 255, cv2.THRESH_BINARY)
     return image
 
-def extract_text_from_image(image_path):
+def preprocess_image(image_path):
+    import cv2
+    with PipelineMetrics.timed(PipelineMetrics.STAGE_PREPROCESS):
+        image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            raise ValueError(f"No se pudo leer la imagen {image_path}")
+        return binarize_image(image)
+
+def ocr_image(image_path):
+    """Preprocesa la imagen y devuelve el texto de tesseract sin corregir."""
     image = preprocess_image(image_path)
-    text = pytesseract.image_to_string(image, config='--psm 6')
-    text = correct_ocr_errors(text)
+    with PipelineMetrics.timed(PipelineMetrics.STAGE_OCR):
+        return OCREngine.get_engine(TESSERACT_CONFIG).image_to_string(image)
+
+def extract_text_from_image(image_path, use_cache=True):
+    with PipelineMetrics.timed(PipelineMetrics.STAGE_IMAGE_TEXT):
+        text = OCRCache.cached_text(image_path, IMAGE_TEXT_CONFIG, ocr_image, use_cache)
+        text = correct_ocr_errors(text)
     return text
 
-def extract_text_from_pdf(pdf_path):
-    """Extrae y printa texto de un archivo PDF usando PyPDF2."""
+def extract_texts_from_images(image_paths, use_cache=True):
+    """
+    Extrae el texto de varias imágenes con una sola llamada al motor de OCR
+    (images_to_strings); con el motor 'batch' es un único proceso de tesseract para
+    todas las que no están en la caché. Devuelve [(texto, error)] en el orden de entrada.
+    """
+    results = [None] * len(image_paths)
+    pending = []
+    with PipelineMetrics.timed(PipelineMetrics.STAGE_IMAGE_TEXT):
+        for index, image_path in enumerate(image_paths):
+            try:
+                key = None
+                if use_cache and OCRCache.ENABLED:
+                    key = OCRCache.cache_key(image_path, IMAGE_TEXT_CONFIG)
+                    text = OCRCache.get(key)
+                    if text is not None:
+                        PipelineMetrics.count(PipelineMetrics.COUNT_CACHE_HITS)
+                        results[index] = (correct_ocr_errors(text), None)
+                        continue
+                    PipelineMetrics.count(PipelineMetrics.COUNT_CACHE_MISSES)
+                pending.append((index, key, preprocess_image(image_path)))
+            except Exception as e:
+                results[index] = (None, str(e))
+        if not pending:
+            return results
+
+        engine = OCREngine.get_engine(TESSERACT_CONFIG)
+        images = [image for _, _, image in pending]
+        with PipelineMetrics.timed(PipelineMetrics.STAGE_OCR):
+            try:
+                texts = engine.images_to_strings(images)
+            except Exception:
+                # Si falla el lote, se repite imagen a imagen para saber qué archivo falla
+                texts = []
+                for image in images:
+                    try:
+                        texts.append(engine.image_to_string(image))
+                    except Exception as e:
+                        texts.append(e)
+        for (index, key, _), text in zip(pending, texts):
+            if isinstance(text, Exception):
+                results[index] = (None, str(text))
+                continue
+            if key is not None:
+                OCRCache.put(key, text)
+            results[index] = (correct_ocr_errors(text), None)
+    return results
+
+def extract_text_from_pdf(pdf_path, use_cache=True):
+    """Extrae el texto de un archivo PDF, usando la caché de texto si está disponible."""
+    with PipelineMetrics.timed(PipelineMetrics.STAGE_PDF_TEXT):
+        return OCRCache.cached_text(pdf_path, PDF_TEXT_CONFIG, read_pdf_text, use_cache)
+
+def is_pdf(file_path):
+    """Detecta un PDF por su contenido, independientemente de la extensión del archivo."""
+    with open(file_path, 'rb') as file:
+        return file.read(5) == b'%PDF-'
+
+def ocr_pdf_page(page):
+    """Rasteriza una página de pdfplumber y devuelve su texto por OCR, ya corregido."""
+    import numpy as np
+    with PipelineMetrics.timed(PipelineMetrics.STAGE_PREPROCESS):
+        page_image = page.to_image(resolution=PDF_OCR_RESOLUTION).original
+        image = binarize_image(np.array(page_image.convert('L')))
+    with PipelineMetrics.timed(PipelineMetrics.STAGE_OCR):
+        text = OCREngine.get_engine(TESSERACT_CONFIG).image_to_string(image)
+    return correct_ocr_errors(text)
+
+def read_pdf_text(pdf_path):
+    """
+    Extrae el texto de un archivo PDF página a página. Se usa la capa de texto de la
+    página cuando existe (PyPDF2) y solo se rasteriza y pasa por OCR las páginas que
+    no la tienen, como los tickets escaneados. El tiempo de cada página se registra.
+    """
+    import pdfplumber
+    import PyPDF2
     text = ""
-    
+    timings = []
+    # Documento de pdfplumber para rasterizar; se abre una sola vez, con la primera
+    # página que necesita OCR (los PDF con capa de texto no llegan a abrirlo)
+    rasterizer = None
+
     # Abre el archivo PDF en modo lectura binaria
-    with open(pdf_path, 'rb') as file:
+    with open(pdf_path, 'rb') as file, ExitStack() as stack:
         reader = PyPDF2.PdfReader(file)
         
         # Recorre todas las páginas del PDF y extrae el texto
-        for page in reader.pages:
-            text += page.extract_text()
+        for page_number, page in enumerate(reader.pages):
+            start = time.perf_counter()
+            page_text = page.extract_text() or ""
+            PipelineMetrics.add_time(PipelineMetrics.STAGE_PDF_TEXT_LAYER, time.perf_counter() - start)
+            method = PAGE_TEXT_LAYER
+            if not page_text.strip():
+                if rasterizer is None:
+                    rasterizer = stack.enter_context(pdfplumber.open(pdf_path))
+                page_text = ocr_pdf_page(rasterizer.pages[page_number])
+                method = PAGE_OCR
+            text += page_text
+            timings.append({
+                "source": os.path.abspath(pdf_path),
+                "page": page_number + 1,
+                "method": method,
+                "seconds": round(time.perf_counter() - start, 4),
+                "chars": len(page_text)
+            })
     
-    # Imprime el texto extraído
+    TicketStore.append_records(PDF_TIMINGS_STORE, timings)
     
     # Retorna el texto extraído
     return text
@@ -54,20 +221,10 @@ def correct_ocr_errors(text):
 
 
 def extract_total_amount(extracted_text):
-    total_pattern = re.compile(r'total\s*[:\s]*\n?\s*\€?\$?\d+[.,]?\d*', re.IGNORECASE)
-    match = total_pattern.search(extracted_text)
-    if match:
-        total_amount = re.search(r'\€?\$?\d+[.,]?\d*', match.group()).group()
-        return total_amount
-    else:
-        return "No encontrado"
+    return TicketParser.find_total_amount(extracted_text)
 
 def extract_store_name(extracted_text):
-    lines = extracted_text.split('\n')
-    for line in lines:
-        if re.match(r'[A-Z]{2,}', line):
-            return line.strip()
-    return "No encontrado"
+    return TicketParser.find_store_name(extracted_text.split('\n'))
 
 def clean_store_name(store_name):
     store_name = store_name.lower()
@@ -82,166 +239,283 @@ def clean_total_amount(total_amount):
     total_amount = re.sub(r'[^0-9.]', '', total_amount)
     return total_amount
 
-def process_ticket(file_path):
-    """Procesa el ticket dependiendo de si es una imagen o PDF."""
-    if file_path.lower().endswith('.pdf'):
-        extracted_text = extract_text_from_pdf(file_path)
-    else:
-        extracted_text = extract_text_from_image(file_path)
+def extract_text(file_path, use_cache=True):
+    """Extrae el texto del ticket dependiendo de si es una imagen o PDF."""
+    if is_pdf(file_path):
+        return extract_text_from_pdf(file_path, use_cache)
+    return extract_text_from_image(file_path, use_cache)
+
+def parse_ticket_text(extracted_text, kind=DOCUMENT_TICKET, grammar=None):
+    """Analiza el texto de un ticket (TicketParser.parse_ticket) y registra sus métricas."""
+    with PipelineMetrics.timed(PipelineMetrics.STAGE_PARSE):
+        ticket = TicketParser.parse_ticket(extracted_text, kind, grammar)
+    PipelineMetrics.count(PipelineMetrics.COUNT_MATCHED_LINES, len(ticket.items))
+    PipelineMetrics.count(PipelineMetrics.COUNT_UNMATCHED_LINES, ticket.unmatched_lines)
+    return ticket
+
+def process_ticket(file_path, use_cache=True):
+    """Procesa el ticket dependiendo de si es una imagen o PDF. Devuelve el estado de la importación."""
+    extracted_text = extract_text(file_path, use_cache)
+    if not save_raw_text(DOCUMENT_TICKET, file_path, extracted_text):
+        return STATUS_DUPLICATE
+    return process_extracted_text(extracted_text)
+
+def raw_text_keys(document):
+    """Huella de un documento importado: su tipo y el hash del archivo de origen."""
+    return [document["kind"] + ":" + document["sha256"]]
+
+def ticket_keys(store, record):
+    """
+    Huella de un ticket guardado: tienda, fecha, total y artículos (sin importar el orden).
+    Dos tickets con la misma huella son el mismo ticket importado dos veces.
+    """
+    items = sorted(
+        (item["descripcion"], item["cantidad"], item["precio_unitario"])
+        for item in record["items"]
+    )
+    fingerprint = json.dumps([store, record["fecha_compra"], record["precio_total"], items], ensure_ascii=False)
+    return [hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()]
 
-    store_name = extract_store_name(extracted_text)
-    total_amount = extract_total_amount(extracted_text)
+def store_record(store, record, assign_id=False, key_function=None, writer=None):
+    """
+    Guarda un registro en el lote de `writer` (TicketStore.StoreWriter) o, sin escritor,
+    directamente en el almacén. Devuelve False si key_function lo identifica como duplicado.
+    """
+    if writer is not None:
+        return writer.add(store, record, assign_id, key_function)
+    if key_function:
+        appended, _ = TicketStore.append_unique(store, [record], key_function, assign_ids=assign_id)
+        return bool(appended)
+    TicketStore.append_record(store, record, assign_id)
+    return True
+
+def save_raw_text(kind, file_path, extracted_text, writer=None):
+    """
+    Guarda el texto extraído de un documento junto con su origen y su hash.
+    Devuelve False si ese archivo ya se había importado con el mismo tipo.
+    """
+    appended = store_record(RAW_TEXT_STORE, {
+        "kind": kind,
+        "source": os.path.abspath(file_path),
+        "sha256": OCRCache.file_hash(file_path),
+        "text": extracted_text
+    }, key_function=raw_text_keys, writer=writer)
+    if not appended:
+        print(f"El archivo {file_path} ya estaba importado; se omite.")
+    return appended
 
-    print(f"Nombre de la tienda: {store_name}")
-    print(f"Monto total: {total_amount}")
+def process_extracted_text(extracted_text, writer=None):
+    """Analiza el texto ya extraído de un ticket y guarda sus datos. Devuelve el estado."""
+    ticket = parse_ticket_text(extracted_text)
 
-    save_to_json(store_name, total_amount)
+    print(f"Nombre de la tienda: {ticket.store_name}")
+    print(f"Monto total: {ticket.total_amount}")
 
-    if "mercadona" in store_name.lower():
-        process_mercadona_ticket(extracted_text)
+    status = save_parsed_ticket(ticket, writer) if ticket.grammar else STATUS_SAVED
+
+    # Un ticket repetido tampoco se vuelve a sumar al resumen
+    if status != STATUS_DUPLICATE:
+        save_to_json(ticket.store_name, ticket.total_amount, writer)
 
     # Imprimir el texto extraído al final del procesamiento
     print("\nTexto extraído completo:")
     print(extracted_text)
+    return status
+
+def save_parsed_ticket(ticket, writer=None):
+    """
+    Guarda los artículos de un ticket ya analizado en el almacén de su tienda, salvo
+    que ya estuviera guardado. Devuelve STATUS_SAVED, STATUS_NO_ITEMS o STATUS_DUPLICATE.
+    """
+    record = ticket.to_record()
+    name = GRAMMAR_NAMES[ticket.grammar]
+    if not record:
+        print(f"No se encontraron artículos en el ticket {name}.")
+        return STATUS_NO_ITEMS
+    store = GRAMMAR_STORES[ticket.grammar]
+    if not store_record(store, record, True, functools.partial(ticket_keys, store), writer):
+        print(f"El ticket {name} del {record['fecha_compra']} ya estaba guardado; se omite.")
+        return STATUS_DUPLICATE
+    print(f"Datos del ticket {name} guardados en {TicketStore.store_log_path(store)}")
+    return STATUS_SAVED
+
+def remove_duplicates():
+    """
+    Elimina los documentos y tickets repetidos de los almacenes (se conserva la primera
+    importación de cada uno). Devuelve el número de registros eliminados por almacén.
+    """
+    removed = {RAW_TEXT_STORE: TicketStore.dedupe_store(RAW_TEXT_STORE, raw_text_keys)}
+    for store in (MERCADONA_STORE, LIDL_STORE):
+        removed[store] = TicketStore.dedupe_store(store, functools.partial(ticket_keys, store))
+    for store, count in removed.items():
+        print(f"{store}: {count} duplicados eliminados")
+    return removed
+
+# Registros que se acumulan antes de escribir en los almacenes al importar por lotes
+STORE_BATCH_SIZE = 50
 
-    if "lidl" in store_name.lower():
-        process_lidl_ticket(extracted_text)
+# Extensiones que se consideran tickets al importar un directorio
+TICKET_EXTENSIONS = ('.pdf', '.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp')
+
+def collect_ticket_files(source):
+    """
+    Devuelve la lista ordenada de tickets a procesar a partir de un directorio
+    o de un patrón glob (por ejemplo, 'escaneos/*.jpg').
+    """
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        paths = glob.glob(source)
+    return sorted(
+        path for path in paths
+        if os.path.isfile(path) and path.lower().endswith(TICKET_EXTENSIONS)
+    )
+
+# Tickets que recibe cada proceso del pool de una vez; sus imágenes se pasan juntas al
+# motor de OCR (OCREngine.images_to_strings)
+OCR_BATCH_SIZE = 8
+
+def _init_ocr_worker():
+    """Limita cada proceso del pool a un hilo para que el OCR escale con los núcleos."""
+    import cv2
+    # La salida estándar es del proceso principal (por ejemplo, el resumen JSON de
+    # TicketCLI): los mensajes de los procesos del pool van a la salida de error
+    sys.stdout = sys.stderr
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+    cv2.setNumThreads(1)
+    # Descartar las métricas heredadas del proceso principal
+    PipelineMetrics.snapshot()
+    # Los procesos del pool no ejecutan atexit al terminar, pero sí los finalizadores de
+    # multiprocessing: así se liberan los motores (por ejemplo, la API de tesserocr)
+    multiprocessing.util.Finalize(None, OCREngine.close_engines, exitpriority=10)
+
+def _extract_text_worker(file_paths, use_cache=True):
+    """
+    Extrae el texto de un grupo de tickets dentro de un proceso del pool, capturando los
+    errores de cada archivo: los PDF uno a uno y las imágenes en un único lote de OCR.
+    Devuelve [(archivo, texto, error)] y las métricas del proceso, que se suman en el
+    proceso principal.
+    """
+    results = {}
+    image_paths = []
+    for file_path in file_paths:
+        try:
+            if not is_pdf(file_path):
+                image_paths.append(file_path)
+                continue
+            results[file_path] = (extract_text_from_pdf(file_path, use_cache), None)
+        except Exception as e:
+            results[file_path] = (None, str(e))
+    for file_path, result in zip(image_paths, extract_texts_from_images(image_paths, use_cache)):
+        results[file_path] = result
+    batch = [(file_path, *results[file_path]) for file_path in file_paths]
+    return batch, PipelineMetrics.snapshot()
+
+def process_ticket_batch(source, workers=None, use_cache=True):
+    """
+    Procesa todos los tickets de un directorio o patrón glob.
+    Devuelve una lista de tuplas (archivo, estado, error), con error None si fue bien.
+    """
+    file_paths = collect_ticket_files(source)
+    if not file_paths:
+        print(f"No se encontraron tickets en {source}")
+        return []
+    return process_ticket_files(file_paths, workers, use_cache)
+
+def process_ticket_files(file_paths, workers=None, use_cache=True):
+    """
+    Procesa una lista de tickets. El preprocesado y el OCR se reparten entre `workers`
+    procesos (por defecto, uno por núcleo), en grupos de hasta OCR_BATCH_SIZE tickets
+    cuyas imágenes pasan juntas por el motor de OCR, y un único escritor guarda los resultados
+    en el orden de la lista, en lotes de al menos STORE_BATCH_SIZE registros que nunca
+    separan los de un mismo ticket (una escritura y un fsync por almacén y lote).
+    Devuelve una lista de tuplas (archivo, estado, error).
+
+    Un ticket que el escritor descarta al confirmar el lote (por ejemplo, porque otra
+    importación lo guardó entretanto) se informa como duplicado, no como guardado.
+    """
+    results = []
+    workers = min(workers or os.cpu_count() or 1, len(file_paths))
+    # Grupos de hasta OCR_BATCH_SIZE tickets, sin dejar procesos sin trabajo
+    chunk_size = max(1, min(OCR_BATCH_SIZE, -(-len(file_paths) // workers)))
+    chunks = [file_paths[start:start + chunk_size] for start in range(0, len(file_paths), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_ocr_worker) as executor, \
+            TicketStore.StoreWriter(STORE_BATCH_SIZE) as writer:
+        # map devuelve los resultados en el orden de entrada aunque terminen desordenados
+        extract_worker = functools.partial(_extract_text_worker, use_cache=use_cache)
+        for batch, metrics in executor.map(extract_worker, chunks):
+            PipelineMetrics.merge(metrics)
+            for file_path, extracted_text, error in batch:
+                status = None
+                writer.begin_source(file_path)
+                if error is None:
+                    try:
+                        if save_raw_text(DOCUMENT_TICKET, file_path, extracted_text, writer):
+                            status = process_extracted_text(extracted_text, writer)
+                        else:
+                            status = STATUS_DUPLICATE
+                    except Exception as e:
+                        error = str(e)
+                results.append((file_path, status, error))
+
+    results = mark_rejected_duplicates(results, writer)
+    print(format_batch_report(results))
+    return results
+
+def mark_rejected_duplicates(results, writer):
+    """
+    Cambia a STATUS_DUPLICATE el estado de los archivos de `results` (archivo, estado,
+    error) con algún registro descartado por `writer` al escribir sus lotes.
+    """
+    rejected = writer.rejected_sources()
+    return [
+        (file_path, STATUS_DUPLICATE if error is None and file_path in rejected else status, error)
+        for file_path, status, error in results
+    ]
+
+def format_batch_report(results):
+    """Construye el resumen de una importación por lotes, archivo por archivo."""
+    failed = [path for path, _, error in results if error is not None]
+    duplicates = [path for path, status, _ in results if status == STATUS_DUPLICATE]
+    lines = [f"Tickets procesados: {len(results) - len(failed)} de {len(results)}"]
+    if duplicates:
+        lines.append(f"Duplicados omitidos: {len(duplicates)}")
+    for path, status, error in results:
+        if error is not None:
+            status = f"ERROR: {error}"
+        elif status == STATUS_DUPLICATE:
+            status = "DUPLICADO"
+        else:
+            status = "OK"
+        lines.append(f"{os.path.basename(path)}: {status}")
+    return "\n".join(lines)
 
 def parse_line_devolucion(line):
     """
     Analiza una línea del ticket y extrae la cantidad, descripción y precio unitario.
     Devuelve un diccionario con los detalles del artículo o None si no es una línea válida.
     """
-    # Modificar la línea para asegurar que haya un espacio entre la cantidad y la descripción
-    # Y que el precio esté al final. Incluye soporte para cantidades y precios negativos.
-    line = re.sub(r'^(-?\d+)\s*(.*)\s+(-?[\d,.]+)$', r'\1 \2 \3', line)
-
-    # Usar expresión regular para extraer la cantidad y el precio, incluyendo negativos
-    match = re.match(r'^(-?\d+)\s+(.*)\s+(-?[\d,.]+)$', line)
-    if match:
-        try:
-            # Extraer la cantidad (primer elemento) y asegurar que sea un número entero
-            cantidad = int(match.group(1))
-            
-            # Extraer la descripción (todo entre cantidad y precio)
-            descripcion = match.group(2).strip()
-            
-            # Extraer el precio (último elemento) y asegurar que sea un número flotante
-            precio_unitario = float(match.group(3).replace(',', '.'))
-            
-            # Crear un diccionario para el artículo
-            return {
-                "descripcion": descripcion,
-                "cantidad": cantidad,
-                "precio_unitario": precio_unitario
-            }
-        except ValueError as e:
-            print(f"Error al procesar la línea: {line}. Error: {e}")
-            return None
-    else:
-        print(f"No se pudo hacer match con la línea: {line}")
-        return None
+    return TicketParser.parse_return_line(line)
     
 def parse_line(line):
     """
     Analiza una línea del ticket y extrae la cantidad, descripción y precio unitario.
     Devuelve un diccionario con los detalles del artículo o None si no es una línea válida.
     """
-    # Modificar la línea para asegurar que haya un espacio entre la cantidad y la descripción
-    # Y que el precio esté al final
-    line = re.sub(r'^(\d)(\d*)\s*(.*)\s+([\d,.]+)$', r'\1 \2 \3 \4', line)
+    return TicketParser.parse_item_line(line)
 
-    # Usar expresión regular para extraer la cantidad y el precio
-    match = re.match(r'^(\d+)\s+(.*)\s+([\d,.]+)$', line)
-    print(line)
-    if match:
-        try:
-            # Extraer la cantidad (primer elemento)
-            cantidad = int(match.group(1))
-            
-            # Extraer la descripción (todo entre cantidad y precio)
-            descripcion = match.group(2).strip()
-            
-            # Extraer el precio (último elemento)
-            precio_unitario = float(match.group(3).replace(',', '.'))
-            precio_unitario = precio_unitario / cantidad
-            # Crear un diccionario para el artículo
-            return {
-                "descripcion": descripcion,
-                "cantidad": cantidad,
-                "precio_unitario": precio_unitario
-            }
-        except ValueError as e:
-            print(f"Error al procesar la línea: {line}. Error: {e}")
-            return None
-    else:
-        print(f"No se pudo hacer match con la línea: {line}")
-        return None
 
+def parse_mercadona_ticket(extracted_text):
+    """Analiza un ticket de Mercadona y devuelve sus datos, o None si no tiene artículos."""
+    return parse_ticket_text(extracted_text, grammar=TicketParser.GRAMMAR_MERCADONA).to_record()
 
 def process_mercadona_ticket(extracted_text):
     """Procesa un ticket de Mercadona y guarda los detalles en un archivo JSON."""
-    items = []
-    precio_total = 0.0
-
-    # Extraer la fecha de compra
-    date_pattern = re.compile(r'\d{2}/\d{2}/\d{4} \d{2}:\d{2}')
-    match = date_pattern.search(extracted_text)
-    fecha_compra = match.group() if match else "Fecha no encontrada"
-
-    lines = extracted_text.split('\n')
-    start_reading_items = False
-
-    for line in lines:
-        # Detectar la sección de ítems
-        if "Descripción P. Unit Importe" in line:
-            start_reading_items = True
-            continue
-        
-        if start_reading_items:
-            # Detectar el final de la sección de ítems
-            if line.startswith("TOTAL"):
-                break
-            
-            # Procesar la línea
-            item = parse_line(line)
-            if item:
-                # Calcular el precio total
-                precio_total += item["cantidad"] * item["precio_unitario"]
-                items.append(item)
-
-    # Verificar si hay items antes de guardar
-    if items:
-        # Crear el diccionario de datos del ticket de Mercadona
-        mercadona_data = {
-            "id": get_next_id(),  # ID único
-            "fecha_compra": fecha_compra,  # Añadir la fecha de compra al JSON
-            "items": items,
-            "precio_total": round(precio_total, 2)
-        }
-
-        # Guardar los datos de Mercadona en un archivo JSON
-        if os.path.exists('mercadona_tickets.json'):
-            with open('mercadona_tickets.json', 'r+', encoding='utf-8') as file:
-                file_data = json.load(file)
-                file_data.append(mercadona_data)
-                file.seek(0)
-                json.dump(file_data, file, indent=4, ensure_ascii=False)
-        else:
-            with open('mercadona_tickets.json', 'w', encoding='utf-8') as file:
-                json.dump([mercadona_data], file, indent=4, ensure_ascii=False)
-        print("Datos del ticket de Mercadona guardados en mercadona_tickets.json")
-    else:
-        print("No se encontraron artículos en el ticket de Mercadona.")
+    return save_parsed_ticket(parse_ticket_text(extracted_text, grammar=TicketParser.GRAMMAR_MERCADONA))
 
 def get_next_id():
     """Obtiene el próximo ID único para el ticket de Mercadona."""
-    if os.path.exists('mercadona_tickets.json'):
-        with open('mercadona_tickets.json', 'r', encoding='utf-8') as file:
-            file_data = json.load(file)
-            return len(file_data) + 1
-    else:
-        return 1
+    return TicketStore.read_meta(MERCADONA_STORE)["next_id"]
 
 def normalize_string(s):
     """Convierte una cadena a minúsculas y elimina tildes."""
@@ -251,68 +525,16 @@ def normalize_string(s):
         if unicodedata.category(c) != 'Mn'
     )
     return s
-def process_mercadona_return_ticket(extracted_text):
-    """Procesa un ticket de devolución de Mercadona y guarda los detalles en un archivo JSON."""
-    items = []
-    precio_total = 0.0
-
-    # Extraer la fecha de la devolución
-    date_pattern = re.compile(r'\d{2}/\d{2}/\d{4} \d{2}:\d{2}')
-    match = date_pattern.search(extracted_text)
-    fecha_compra = match.group() if match else "Fecha no encontrada"
-
-    lines = extracted_text.split('\n')
-    start_reading_items = False
+def parse_mercadona_return_ticket(extracted_text):
+    """Analiza un ticket de devolución de Mercadona y devuelve sus datos, o None si no tiene artículos."""
+    return parse_ticket_text(extracted_text, grammar=TicketParser.GRAMMAR_MERCADONA_RETURN).to_record()
 
-    for line in lines:
-        # Detectar la sección de ítems de devolución
-        if "Descripción P. Unit Importe" in line:
-            start_reading_items = True
-            continue
-        
-        if start_reading_items:
-            # Detectar el final de la sección de ítems de devolución
-            if line.startswith("TOTAL"):
-                break
-            
-            # Procesar la línea
-            item = parse_line_devolucion(line) 
-            if item:
-                # Convertir cantidad y precio a negativos
-                item["cantidad"] = -abs(item["cantidad"])
-                item["precio_unitario"] = -abs(item["precio_unitario"])
-
-                # Calcular el precio total en negativo
-                precio_total += item["cantidad"] * item["precio_unitario"]
-                precio_total = -abs(precio_total)
-                items.append(item)
-
-    # Verificar si hay items antes de guardar
-    if items:
-        # Crear el diccionario de datos del ticket de devolución de Mercadona
-        mercadona_return_data = {
-            "id": get_next_id(),  # ID único
-            "fecha_compra": fecha_compra,  # Añadir la fecha de devolución al JSON
-            "items": items,
-            "precio_total": round(precio_total, 2)
-        }
-
-        # Guardar los datos de devolución de Mercadona en el mismo archivo JSON
-        if os.path.exists('mercadona_tickets.json'):
-            with open('mercadona_tickets.json', 'r+', encoding='utf-8') as file:
-                file_data = json.load(file)
-                file_data.append(mercadona_return_data)
-                file.seek(0)
-                json.dump(file_data, file, indent=4, ensure_ascii=False)
-        else:
-            with open('mercadona_tickets.json', 'w', encoding='utf-8') as file:
-                json.dump([mercadona_return_data], file, indent=4, ensure_ascii=False)
-        print("Datos del ticket de devolución de Mercadona guardados en mercadona_tickets.json")
-    else:
-        print("No se encontraron artículos en el ticket de devolución de Mercadona.")
+def process_mercadona_return_ticket(extracted_text, writer=None):
+    """Procesa un ticket de devolución de Mercadona y guarda los detalles en un archivo JSON."""
+    return save_parsed_ticket(parse_ticket_text(extracted_text, grammar=TicketParser.GRAMMAR_MERCADONA_RETURN), writer)
 
-def save_to_json(merchant_name, total_amount):
-    """Guarda los datos normalizados en un archivo JSON."""
+def build_ticket_summary(merchant_name, total_amount):
+    """Devuelve el resumen normalizado (tienda y total) de un ticket."""
     # Normalizar nombre de la tienda
     merchant_name = normalize_string(merchant_name)
     
@@ -320,22 +542,20 @@ def save_to_json(merchant_name, total_amount):
     total_amount = total_amount.replace(',', '.')
     
     # Crear el diccionario de datos
-    data = {'merchant_name': merchant_name, 'total_amount': total_amount}
+    return {'merchant_name': merchant_name, 'total_amount': total_amount}
+
+def save_to_json(merchant_name, total_amount, writer=None):
+    """Guarda los datos normalizados en un archivo JSON."""
+    data = build_ticket_summary(merchant_name, total_amount)
     
-    # Guardar los datos en un archivo JSON
-    if os.path.exists('tickets.json'):
-        with open('tickets.json', 'r+', encoding='utf-8') as file:
-            file_data = json.load(file)
-            file_data.append(data)
-            file.seek(0)
-            json.dump(file_data, file, indent=4, ensure_ascii=False)
-    else:
-        with open('tickets.json', 'w', encoding='utf-8') as file:
-            json.dump([data], file, indent=4, ensure_ascii=False)
-    print("Datos guardados en tickets.json")
+    # Añadir los datos al almacén de tickets
+    store_record(SUMMARY_STORE, data, writer=writer)
+    print(f"Datos guardados en {TicketStore.store_log_path(SUMMARY_STORE)}")
 
 def manual_input():
     """Permite al usuario ingresar manualmente los datos del ticket."""
+    from tkinter import simpledialog, messagebox
+
     store_name = simpledialog.askstring("Input", "Introduce el nombre de la tienda:")
     total_amount = simpledialog.askstring("Input", "Introduce el monto total (por ejemplo, 10.10):")
     
@@ -349,71 +569,201 @@ def manual_input():
 
 
 def upload_file():
+    from tkinter import filedialog, messagebox
+
     file_path = filedialog.askopenfilename()
     if file_path:
-        process_ticket(file_path)
+        status = process_ticket(file_path)
+        MetricsStore.flush(DOCUMENT_TICKET)
+        if status == STATUS_DUPLICATE:
+            messagebox.showinfo("Ticket duplicado", "Este ticket ya estaba importado; no se ha vuelto a guardar.")
+
+def upload_folder():
+    """Permite al usuario seleccionar un directorio de tickets para procesarlos en lote."""
+    from tkinter import filedialog, messagebox
+
+    folder_path = filedialog.askdirectory(title="Seleccionar carpeta de tickets")
+    if folder_path:
+        results = process_ticket_batch(folder_path)
+        MetricsStore.flush(DOCUMENT_TICKET)
+        if results:
+            messagebox.showinfo("Importación por lotes", format_batch_report(results))
+        else:
+            messagebox.showwarning("Importación por lotes", "No se encontraron tickets en la carpeta.")
+
 
-import pdfplumber
+# Cabecera de la tabla de movimientos en los extractos bancarios
+BANK_STATEMENT_HEADER = "FECHA OPER CONCEPTO FECHA VALOR IMPORTE SALDO"
+FECHA_PATTERN = re.compile(r"\d{2}/\d{2}/\d{4}")  # Regex para encontrar fechas en formato dd/mm/yyyy
 
-def extraer_transacciones(pdf_path):
+# Campos que identifican un movimiento al fusionar extractos en la cuenta (el ID no,
+# porque depende del extracto). El saldo distingue dos movimientos iguales del mismo día.
+TRANSACTION_KEY_FIELDS = ('fecha_oper', 'fecha_valor', 'concepto', 'importe', 'saldo')
+# Movimientos por escritura al fusionar un extracto en la cuenta
+BANK_BATCH_SIZE = 500
+
+def parse_bank_page(texto):
+    """Extrae las transacciones (sin ID) del texto de una página del extracto."""
     transacciones = []
-    id_counter = 1
-    fecha_pattern = r"\d{2}/\d{2}/\d{4}"  # Regex para encontrar fechas en formato dd/mm/yyyy
+    if not texto or BANK_STATEMENT_HEADER not in texto:
+        return transacciones
 
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            texto = page.extract_text()
-            if "FECHA OPER CONCEPTO FECHA VALOR IMPORTE SALDO" in texto:
-                lines = texto.split('\n')
-                start_extraction = False
-                for line in lines:
-                    if "FECHA OPER CONCEPTO FECHA VALOR IMPORTE SALDO" in line:
-                        start_extraction = True
-                        continue
-                    if start_extraction and line.strip():  # Ignorar líneas vacías
-                        # Buscar las dos primeras fechas en la línea
-                        fechas = re.findall(fecha_pattern, line)
-                        if len(fechas) >= 2:
-                            fecha_oper = fechas[0]
-                            fecha_valor = fechas[1]
-                            
-                            # Extraer las partes de la línea basadas en las fechas encontradas
-                            partes = re.split(fecha_pattern, line)
-                            
-                            # El concepto está entre la primera fecha y la segunda fecha
-                            concepto = partes[1].strip() if len(partes) > 2 else ""
-                            
-                            # El resto es después de la segunda fecha
-                            resto = line.split(fecha_valor)[-1].strip()
-
-                            # Dividir el resto para obtener importe y saldo
-                            partes_resto = resto.split()
-                            if len(partes_resto) >= 2:
-                                importe = partes_resto[-2]  # Penúltimo valor
-                                saldo = partes_resto[-1]    # Último valor
-                                
-                                # Crear un diccionario para la transacción
-                                transaccion = {
-                                    "id": id_counter,
-                                    "fecha_oper": fecha_oper,
-                                    "concepto": concepto,
-                                    "fecha_valor": fecha_valor,
-                                    "importe": importe,
-                                    "saldo": saldo
-                                }
-                                
-                                # Incrementar el contador de ID
-                                id_counter += 1
-                                
-                                # Añadir la transacción a la lista
-                                transacciones.append(transaccion)
+    lines = texto.split('\n')
+    start_extraction = False
+    for line in lines:
+        if BANK_STATEMENT_HEADER in line:
+            start_extraction = True
+            continue
+        if start_extraction and line.strip():  # Ignorar líneas vacías
+            # Buscar las dos primeras fechas en la línea
+            fechas = FECHA_PATTERN.findall(line)
+            if len(fechas) >= 2:
+                fecha_oper = fechas[0]
+                fecha_valor = fechas[1]
+                
+                # Extraer las partes de la línea basadas en las fechas encontradas
+                partes = FECHA_PATTERN.split(line)
+                
+                # El concepto está entre la primera fecha y la segunda fecha
+                concepto = partes[1].strip() if len(partes) > 2 else ""
+                
+                # El resto es después de la segunda fecha
+                resto = line.split(fecha_valor)[-1].strip()
+
+                # Dividir el resto para obtener importe y saldo
+                partes_resto = resto.split()
+                if len(partes_resto) >= 2:
+                    importe = partes_resto[-2]  # Penúltimo valor
+                    saldo = partes_resto[-1]    # Último valor
+                    
+                    # Crear un diccionario para la transacción
+                    transacciones.append({
+                        "fecha_oper": fecha_oper,
+                        "concepto": concepto,
+                        "fecha_valor": fecha_valor,
+                        "importe": importe,
+                        "saldo": saldo
+                    })
+    return transacciones
 
+def is_bank_statement(pdf_path):
+    """Indica si el PDF es un extracto bancario: su primera página contiene la tabla de movimientos."""
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as pdf:
+        if not pdf.pages:
+            return False
+        texto = pdf.pages[0].extract_text() or ""
+    return BANK_STATEMENT_HEADER in texto
+
+# Documento abierto por cada proceso del pool, para no reabrir el PDF en cada página
+_worker_pdf = None
+
+def _init_bank_worker():
+    """Los mensajes de los procesos del pool van a la salida de error (ver _init_ocr_worker)."""
+    sys.stdout = sys.stderr
+
+def _bank_page_worker(pdf_path, page_number):
+    """Extrae las transacciones de una página dentro de un proceso del pool."""
+    global _worker_pdf
+    import pdfplumber
+    if _worker_pdf is None or _worker_pdf[0] != pdf_path:
+        if _worker_pdf is not None:
+            _worker_pdf[1].close()
+        _worker_pdf = (pdf_path, pdfplumber.open(pdf_path))
+    page = _worker_pdf[1].pages[page_number]
+    transacciones = parse_bank_page(page.extract_text())
+    page.close()  # Liberar la caché de la página
     return transacciones
+
+def iter_transacciones(pdf_path, workers=None):
+    """
+    Recorre las transacciones del extracto a medida que se procesan sus páginas.
+    Las páginas se reparten entre `workers` procesos, pero los resultados se entregan
+    en orden de página y línea, por lo que los IDs son los mismos que en una lectura
+    secuencial. Solo hay unas pocas páginas en vuelo a la vez, así que la memoria no
+    depende del tamaño del documento.
+    """
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+    workers = min(workers or os.cpu_count() or 1, page_count)
+    id_counter = 1
+
+    if workers <= 1:
+        with pdfplumber.open(pdf_path) as pdf:
+            for page in pdf.pages:
+                transacciones = parse_bank_page(page.extract_text())
+                page.close()
+                for transaccion in transacciones:
+                    yield {"id": id_counter, **transaccion}
+                    id_counter += 1
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_bank_worker) as executor:
+        pending = deque()
+        next_page = 0
+        while next_page < page_count or pending:
+            # Mantener como mucho dos páginas por proceso en vuelo
+            while next_page < page_count and len(pending) < workers * 2:
+                pending.append(executor.submit(_bank_page_worker, pdf_path, next_page))
+                next_page += 1
+            for transaccion in pending.popleft().result():
+                yield {"id": id_counter, **transaccion}
+                id_counter += 1
+
+def extraer_transacciones(pdf_path, workers=None):
+    return list(iter_transacciones(pdf_path, workers))
+
 def save_transactions_to_json(transactions, json_filename):
-    with open(json_filename, 'w') as json_file:
-        json.dump(transactions, json_file, indent=4)
+    """
+    Escribe las transacciones en un array JSON a medida que llegan, sin necesidad de
+    tenerlas todas en memoria. El resultado es idéntico a json.dump(..., indent=4).
+    Si ya hay un almacén de cuenta con ese nombre (ver merge_transactions), lanza
+    FileExistsError en lugar de escribir un JSON que no se leería.
+    """
+    TicketStore.check_not_shadowed(json_filename)
+    # Se escribe en un temporal que solo reemplaza al archivo cuando está completo
+    with TicketStore.atomic_file(json_filename) as json_file:
+        json_file.write('[')
+        count = 0
+        for transaction in transactions:
+            json_file.write(',\n    ' if count else '\n    ')
+            json_file.write(json.dumps(transaction, indent=4).replace('\n', '\n    '))
+            count += 1
+        json_file.write('\n]' if count else ']')
+    return count
+
+def transaction_keys(transaction):
+    """Huella de un movimiento bancario: hash de los campos de TRANSACTION_KEY_FIELDS."""
+    fields = json.dumps([transaction.get(name) for name in TRANSACTION_KEY_FIELDS], ensure_ascii=False)
+    return [hashlib.sha256(fields.encode('utf-8')).hexdigest()]
+
+def merge_transactions(transactions, account_path):
+    """
+    Añade al almacén de la cuenta los movimientos que todavía no tiene. Los que ya están
+    (periodos solapados entre extractos) se descartan con el índice de huellas, sin
+    releer el historial, y los nuevos reciben el siguiente ID de la cuenta.
+    Devuelve (añadidos, duplicados).
+    """
+    added = duplicates = 0
+    batch = []
+    for transaction in transactions:
+        batch.append(transaction)
+        if len(batch) >= BANK_BATCH_SIZE:
+            appended, skipped = TicketStore.append_unique(account_path, batch, transaction_keys, assign_ids=True)
+            added += len(appended)
+            duplicates += len(skipped)
+            batch = []
+    appended, skipped = TicketStore.append_unique(account_path, batch, transaction_keys, assign_ids=True)
+    return added + len(appended), duplicates + len(skipped)
+
+def merge_bank_statement(pdf_path, account_path, workers=None):
+    """Importa un extracto en PDF en el almacén de la cuenta (ver merge_transactions)."""
+    return merge_transactions(iter_transacciones(pdf_path, workers), account_path)
 
 def import_bank_statement():
+    from tkinter import filedialog, simpledialog
+
     json_filename = simpledialog.askstring("Guardar como", "Ingrese el nombre del archivo JSON:")
     
     if json_filename:
@@ -424,103 +774,113 @@ def import_bank_statement():
         )
         
         if pdf_path:
-            transactions = extraer_transacciones(pdf_path)
-            save_transactions_to_json(transactions, json_filename)
-            print(f"Transacciones guardadas en {json_filename}")
+            # Si la cuenta ya existe, el extracto se añade a su historial
+            added, duplicates = merge_bank_statement(pdf_path, json_filename)
+            print(f"{added} transacciones nuevas guardadas en {json_filename} ({duplicates} ya estaban)")
+
+def process_return_file(file_path, use_cache=True, writer=None):
+    """Procesa un ticket de devolución en PDF. Devuelve el estado de la importación."""
+    extracted_text = extract_text_from_pdf(file_path, use_cache)
+    if not save_raw_text(DOCUMENT_RETURN, file_path, extracted_text, writer):
+        return STATUS_DUPLICATE
+    return process_mercadona_return_ticket(extracted_text, writer)
 
 def upload_return_file():
     """Permite al usuario seleccionar un archivo de devolución para procesar."""
+    from tkinter import filedialog, messagebox
+
     file_path = filedialog.askopenfilename()
     if file_path:
-        extracted_text = extract_text_from_pdf(file_path)
-        process_mercadona_return_ticket(extracted_text)
-
-def process_lidl_ticket(extracted_text):
-    """Procesa un ticket de Lidl y guarda los detalles en un archivo JSON."""
-    items = []
-    precio_total = 0.0
-
-    # Extraer la fecha de compra
-    date_pattern = re.compile(r'\d{2}/\d{2}/\d{4} \d{2}:\d{2}')
-    match = date_pattern.search(extracted_text)
-    fecha_compra = match.group() if match else "Fecha no encontrada"
+        status = process_return_file(file_path)
+        MetricsStore.flush(DOCUMENT_RETURN)
+        if status == STATUS_DUPLICATE:
+            messagebox.showinfo("Ticket duplicado", "Este ticket ya estaba importado; no se ha vuelto a guardar.")
 
-    lines = extracted_text.split('\n')
-    start_reading_items = False
+def parse_lidl_ticket(extracted_text):
+    """Analiza un ticket de Lidl y devuelve sus datos, o None si no tiene artículos."""
+    return parse_ticket_text(extracted_text, grammar=TicketParser.GRAMMAR_LIDL).to_record()
 
-    for line in lines:
-        # Ignorar cualquier línea que contenga "Total" para evitar agregarla como un producto
-        if "Total" in line:
-            break
-
-        # Detectar la sección de ítems y extraer toda la descripción antes del precio
-        match = re.match(r'(.+?)\s+(\d+[.,]\d{2})', line)
-        if match:
-            try:
-                # Extraer la descripción completa (todo el texto antes del precio)
-                descripcion = match.group(1).strip()
-                precio_unitario = float(match.group(2).replace(',', '.'))
-
-                # Crear un diccionario para el artículo, asumiendo cantidad 1
-                item = {
-                    "descripcion": descripcion,
-                    "cantidad": 1,  # Asumimos cantidad 1 si no se especifica explícitamente
-                    "precio_unitario": precio_unitario
-                }
-                items.append(item)
-                precio_total += precio_unitario
-            except ValueError as e:
-                print(f"Error al procesar la línea: {line}. Error: {e}")
-                continue
-
-    # Verificar si hay items antes de guardar
-    if items:
-        # Crear el diccionario de datos del ticket de Lidl
-        lidl_data = {
-            "id": get_next_id_lidl(),  # ID único
-            "fecha_compra": fecha_compra,  # Añadir la fecha de compra al JSON
-            "items": items,
-            "precio_total": round(precio_total, 2)
-        }
-
-        # Guardar los datos del ticket de Lidl en un archivo JSON
-        if os.path.exists('lidl_tickets.json'):
-            with open('lidl_tickets.json', 'r+', encoding='utf-8') as file:
-                file_data = json.load(file)
-                file_data.append(lidl_data)
-                file.seek(0)
-                json.dump(file_data, file, indent=4, ensure_ascii=False)
-        else:
-            with open('lidl_tickets.json', 'w', encoding='utf-8') as file:
-                json.dump([lidl_data], file, indent=4, ensure_ascii=False)
-        print("Datos del ticket de Lidl guardados en lidl_tickets.json")
-    else:
-        print("No se encontraron artículos en el ticket de Lidl.")
+def process_lidl_ticket(extracted_text, writer=None):
+    """Procesa un ticket de Lidl y guarda los detalles en un archivo JSON."""
+    return save_parsed_ticket(parse_ticket_text(extracted_text, grammar=TicketParser.GRAMMAR_LIDL), writer)
 
 
 
 def get_next_id_lidl():
     """Obtiene el próximo ID único para el ticket de Lidl."""
-    if os.path.exists('lidl_tickets.json'):
-        with open('lidl_tickets.json', 'r', encoding='utf-8') as file:
-            file_data = json.load(file)
-            return len(file_data) + 1
-    else:
-        return 1
+    return TicketStore.read_meta(LIDL_STORE)["next_id"]
+
+def process_lidl_file(file_path, use_cache=True, writer=None):
+    """Procesa un ticket de Lidl en PDF. Devuelve el estado de la importación."""
+    extracted_text = extract_text_from_pdf(file_path, use_cache)
+    if not save_raw_text(DOCUMENT_LIDL, file_path, extracted_text, writer):
+        return STATUS_DUPLICATE
+    return process_lidl_ticket(extracted_text, writer)
 
 def upload_lidl_file():
     """Permite al usuario seleccionar un archivo de ticket de Lidl para procesar."""
+    from tkinter import filedialog, messagebox
+
     file_path = filedialog.askopenfilename()
     if file_path:
-        extracted_text = extract_text_from_pdf(file_path)
-        process_lidl_ticket(extracted_text)
+        status = process_lidl_file(file_path)
+        MetricsStore.flush(DOCUMENT_LIDL)
+        if status == STATUS_DUPLICATE:
+            messagebox.showinfo("Ticket duplicado", "Este ticket ya estaba importado; no se ha vuelto a guardar.")
 
 
+def parse_document(kind, extracted_text):
+    """
+    Aplica los analizadores al texto de un documento y devuelve la lista de
+    (almacén, datos) que genera, sin guardar nada.
+    """
+    ticket = parse_ticket_text(extracted_text, kind)
+    parsed = []
+    record = ticket.to_record()
+    if record:
+        parsed.append((GRAMMAR_STORES[ticket.grammar], record))
+    if kind == DOCUMENT_TICKET:
+        parsed.append((SUMMARY_STORE, build_ticket_summary(ticket.store_name, ticket.total_amount)))
+    return parsed
+
+def reparse_stored_texts():
+    """
+    Vuelve a analizar todos los textos guardados con los analizadores actuales y
+    reconstruye los almacenes de tickets con una única escritura por almacén.
+    No repite el OCR. Devuelve el número de registros de cada almacén.
+    """
+    stores = {SUMMARY_STORE: [], MERCADONA_STORE: [], LIDL_STORE: []}
+    seen = set()
+    for document in TicketStore.iter_records(RAW_TEXT_STORE):
+        # Los documentos y tickets repetidos se omiten, igual que al importar
+        keys = raw_text_keys(document)
+        parsed = parse_document(document["kind"], document["text"])
+        if parsed and parsed[0][0] != SUMMARY_STORE:
+            keys += ticket_keys(*parsed[0])
+        if any(key in seen for key in keys):
+            continue
+        seen.update(keys)
+        for store, data in parsed:
+            stores[store].append(data)
+
+    for store, records in stores.items():
+        # Los IDs se reasignan en el orden original de importación
+        for new_id, data in enumerate(records, start=1):
+            if "id" in data:
+                data["id"] = new_id
+        TicketStore.rewrite_store(store, records)
+        print(f"{store}: {len(records)} registros reconstruidos")
+    return {store: len(records) for store, records in stores.items()}
+
 def create_button(parent, text, command):
+    from tkinter import Button
+
     button = Button(parent, text=text, command=command)
     button.pack(fill='x', padx=10, pady=5)
 
 def main():
+    from tkinter import Tk, Frame
+
     root = Tk()
     root.title("Ticket Analyzer")
     
@@ -528,10 +888,17 @@ def main():
     button_frame.pack(padx=20, pady=20)
 
     create_button(button_frame, "Importar Ticket automaticamente", upload_file)
+    create_button(button_frame, "Importar Carpeta de Tickets", upload_folder)
     create_button(button_frame, "Importar Cuenta Bancaria", import_bank_statement)
     create_button(button_frame, "Importar Devolución", upload_return_file)
 
     root.mainloop()
 
 if __name__ == "__main__":
+    # Necesario para el pool de procesos cuando se empaqueta como ejecutable en Windows
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1:
+        # Con argumentos se ejecuta la línea de comandos, sin interfaz gráfica
+        import TicketCLI
+        sys.exit(TicketCLI.main(sys.argv[1:]))
     main()
@@ -0,0 +1,271 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+
+import InboxWatcher
+import MetricsStore
+import TicketAnalyzer
+import TicketStore
+
+# Línea de comandos de TicketAnalyzer, para importar tickets y extractos sin interfaz
+# gráfica (por ejemplo, desde cron). No importa tkinter.
+#
+#   python TicketCLI.py ticket escaneos/ recibo.jpg --workers 4
+#   python TicketCLI.py devolucion devolucion.pdf
+#   python TicketCLI.py lidl lidl_*.pdf
+#   python TicketCLI.py banco extracto.pdf --salida cuenta.json
+#   python TicketCLI.py banco extracto_marzo.pdf --cuenta cuenta.json
+#   python TicketCLI.py reparse
+#   python TicketCLI.py dedup
+#   python TicketCLI.py compactar
+#   python TicketCLI.py exportar mercadona_tickets.json --salida mercadona_array.json
+#   python TicketCLI.py watch bandeja/ --banco-dir cuentas/
+#   python TicketCLI.py watch bandeja/ --cuenta cuenta.json
+#   python TicketCLI.py metricas --comando ticket
+#
+# El resumen se escribe en la salida estándar como JSON (o NDJSON, una línea por
+# archivo, con --formato ndjson); los mensajes de progreso van a la salida de error.
+# Los tiempos por etapa y contadores de cada ejecución se añaden al almacén de métricas
+# (MetricsStore.METRICS_STORE).
+
+EXIT_OK = 0
+EXIT_FAILURES = 1
+EXIT_NO_INPUT = 3
+
+STATUS_OK = 'ok'
+STATUS_NO_ITEMS = 'sin_articulos'
+STATUS_DUPLICATE = 'duplicado'
+STATUS_ERROR = 'error'
+
+# Estado de la importación en TicketAnalyzer -> estado en el resumen
+IMPORT_STATUS = {
+    TicketAnalyzer.STATUS_SAVED: STATUS_OK,
+    TicketAnalyzer.STATUS_NO_ITEMS: STATUS_NO_ITEMS,
+    TicketAnalyzer.STATUS_DUPLICATE: STATUS_DUPLICATE,
+}
+
+
+def expand_sources(sources):
+    """Convierte los argumentos (archivos, directorios o patrones glob) en una lista de archivos."""
+    file_paths = []
+    for source in sources:
+        if os.path.isfile(source):
+            file_paths.append(source)
+        else:
+            file_paths.extend(TicketAnalyzer.collect_ticket_files(source))
+    return file_paths
+
+
+def result(file_path, status, error=None, **extra):
+    entry = {"archivo": file_path, "estado": status}
+    if error is not None:
+        entry["error"] = error
+    entry.update(extra)
+    return entry
+
+
+def run_tickets(args):
+    file_paths = expand_sources(args.sources)
+    batch = TicketAnalyzer.process_ticket_files(file_paths, args.workers, not args.no_cache) if file_paths else []
+    return [
+        result(file_path, IMPORT_STATUS[status] if error is None else STATUS_ERROR, error)
+        for file_path, status, error in batch
+    ]
+
+
+def run_single_pdfs(args, process_file):
+    batch = []
+    # Los registros se guardan en lotes, con una escritura por almacén y lote
+    with TicketStore.StoreWriter(TicketAnalyzer.STORE_BATCH_SIZE) as writer:
+        for file_path in expand_sources(args.sources):
+            writer.begin_source(file_path)
+            try:
+                batch.append((file_path, process_file(file_path, not args.no_cache, writer), None))
+            except Exception as e:
+                batch.append((file_path, None, str(e)))
+    return [
+        result(file_path, IMPORT_STATUS[status] if error is None else STATUS_ERROR, error)
+        for file_path, status, error in TicketAnalyzer.mark_rejected_duplicates(batch, writer)
+    ]
+
+
+def run_returns(args):
+    return run_single_pdfs(args, TicketAnalyzer.process_return_file)
+
+
+def run_lidl(args):
+    return run_single_pdfs(args, TicketAnalyzer.process_lidl_file)
+
+
+def run_bank(args):
+    if args.cuenta:
+        try:
+            added, duplicates = TicketAnalyzer.merge_bank_statement(args.pdf, args.cuenta, args.workers)
+        except Exception as e:
+            return [result(args.pdf, STATUS_ERROR, str(e))]
+        print(f"{added} transacciones nuevas guardadas en {args.cuenta}")
+        return [result(args.pdf, STATUS_OK, transacciones=added, duplicados=duplicates, cuenta=args.cuenta)]
+
+    output = args.salida or os.path.splitext(os.path.basename(args.pdf))[0] + '.json'
+    try:
+        transactions = TicketAnalyzer.iter_transacciones(args.pdf, args.workers)
+        count = TicketAnalyzer.save_transactions_to_json(transactions, output)
+    except Exception as e:
+        return [result(args.pdf, STATUS_ERROR, str(e))]
+    print(f"Transacciones guardadas en {output}")
+    return [result(args.pdf, STATUS_OK, transacciones=count, salida=output)]
+
+
+def run_reparse(args):
+    counts = TicketAnalyzer.reparse_stored_texts()
+    return [result(store, STATUS_OK, registros=count) for store, count in counts.items()]
+
+
+def run_dedup(args):
+    removed = TicketAnalyzer.remove_duplicates()
+    return [result(store, STATUS_OK, eliminados=count) for store, count in removed.items()]
+
+
+def run_compact(args):
+    stores = args.almacenes or TicketAnalyzer.TICKET_STORES
+    return [
+        result(store, STATUS_OK, registros=TicketStore.compact_store(store))
+        for store in stores if TicketStore.store_exists(store)
+    ]
+
+
+def run_export(args):
+    if not TicketStore.store_exists(args.almacen):
+        return [result(args.almacen, STATUS_ERROR, "el almacén no existe")]
+    try:
+        count = TicketStore.export_json(args.almacen, args.salida)
+    except FileExistsError as e:
+        return [result(args.almacen, STATUS_ERROR, str(e))]
+    return [result(args.almacen, STATUS_OK, registros=count, salida=args.salida)]
+
+
+def run_metrics(args):
+    totals = MetricsStore.aggregate(args.archivo, args.comando)
+    return [result(args.archivo or MetricsStore.METRICS_STORE, STATUS_OK, **totals)]
+
+
+def run_watch(args):
+    watcher = InboxWatcher.InboxWatcher(
+        args.inbox,
+        bank_output_dir=args.banco_dir,
+        bank_account=args.cuenta,
+        poll_seconds=args.intervalo,
+        settle_seconds=args.espera,
+        workers=args.workers
+    )
+    return [
+        result(file_path, STATUS_OK if error is None else STATUS_ERROR, error, tipo=kind)
+        for file_path, kind, error in watcher.run(once=args.una_vez)
+    ]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='TicketAnalyzer',
+        description="Importación de tickets y extractos bancarios sin interfaz gráfica."
+    )
+    parser.add_argument('--formato', choices=('json', 'ndjson'), default='json',
+                        help="formato del resumen en la salida estándar")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ticket = subparsers.add_parser('ticket', help="importar tickets (imágenes o PDF)")
+    ticket.add_argument('sources', nargs='+', help="archivos, directorios o patrones glob")
+    ticket.add_argument('--workers', type=int, default=None, help="procesos de OCR (por defecto, uno por núcleo)")
+    ticket.add_argument('--no-cache', action='store_true', help="no usar la caché de texto extraído")
+    ticket.set_defaults(run=run_tickets)
+
+    devolucion = subparsers.add_parser('devolucion', help="importar tickets de devolución de Mercadona (PDF)")
+    devolucion.add_argument('sources', nargs='+')
+    devolucion.add_argument('--no-cache', action='store_true')
+    devolucion.set_defaults(run=run_returns)
+
+    lidl = subparsers.add_parser('lidl', help="importar tickets de Lidl (PDF)")
+    lidl.add_argument('sources', nargs='+')
+    lidl.add_argument('--no-cache', action='store_true')
+    lidl.set_defaults(run=run_lidl)
+
+    banco = subparsers.add_parser('banco', help="importar un extracto bancario (PDF)")
+    banco.add_argument('pdf')
+    destino = banco.add_mutually_exclusive_group()
+    destino.add_argument('--salida', help="archivo JSON de destino (por defecto, el nombre del PDF)")
+    destino.add_argument('--cuenta', help="almacén de la cuenta al que añadir el extracto (sin repetir movimientos)")
+    banco.add_argument('--workers', type=int, default=None, help="procesos para extraer las páginas")
+    banco.set_defaults(run=run_bank)
+
+    reparse = subparsers.add_parser('reparse', help="reanalizar los textos guardados y reconstruir los almacenes")
+    reparse.set_defaults(run=run_reparse)
+
+    dedup = subparsers.add_parser('dedup', help="eliminar los documentos y tickets importados más de una vez")
+    dedup.set_defaults(run=run_dedup)
+
+    compactar = subparsers.add_parser('compactar', help="reescribir los almacenes sin líneas incompletas")
+    compactar.add_argument('almacenes', nargs='*', help="almacenes a compactar (por defecto, los de tickets)")
+    compactar.set_defaults(run=run_compact)
+
+    exportar = subparsers.add_parser('exportar', help="exportar un almacén al antiguo formato de array JSON")
+    exportar.add_argument('almacen')
+    exportar.add_argument('--salida', required=True, help="archivo JSON de destino")
+    exportar.set_defaults(run=run_export)
+
+    metricas = subparsers.add_parser('metricas', help="sumar las métricas guardadas de las importaciones")
+    metricas.add_argument('--comando', help="solo las ejecuciones de este comando")
+    metricas.add_argument('--archivo', help="almacén de métricas (por defecto, el configurado)")
+    metricas.set_defaults(run=run_metrics)
+
+    watch = subparsers.add_parser('watch', help="vigilar una carpeta e importar los archivos que lleguen")
+    watch.add_argument('inbox', help="carpeta de entrada")
+    watch.add_argument('--banco-dir', help="carpeta donde guardar los extractos bancarios importados")
+    watch.add_argument('--cuenta', help="almacén de la cuenta al que añadir los extractos (en lugar de --banco-dir)")
+    watch.add_argument('--intervalo', type=float, default=InboxWatcher.POLL_SECONDS, help="segundos entre revisiones")
+    watch.add_argument('--espera', type=float, default=InboxWatcher.SETTLE_SECONDS,
+                       help="segundos sin cambios antes de procesar un archivo")
+    watch.add_argument('--workers', type=int, default=None)
+    watch.add_argument('--una-vez', action='store_true', help="procesar lo que haya en la carpeta y terminar")
+    watch.set_defaults(run=run_watch)
+    return parser
+
+
+def write_summary(command, results, output_format, stream):
+    if output_format == 'ndjson':
+        for entry in results:
+            stream.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        return
+    failed = sum(1 for entry in results if entry["estado"] == STATUS_ERROR)
+    duplicates = sum(1 for entry in results if entry["estado"] == STATUS_DUPLICATE)
+    summary = {
+        "comando": command,
+        "total": len(results),
+        "correctos": len(results) - failed,
+        "duplicados": duplicates,
+        "errores": failed,
+        "resultados": results,
+    }
+    stream.write(json.dumps(summary, ensure_ascii=False, indent=4) + '\n')
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    stdout = sys.stdout
+    # Los mensajes de los procesos de importación no deben mezclarse con el resumen
+    with contextlib.redirect_stdout(sys.stderr):
+        results = args.run(args)
+        MetricsStore.flush(args.command)
+    write_summary(args.command, results, args.formato, stdout)
+
+    if not results and args.command not in ('reparse', 'dedup', 'watch', 'compactar'):
+        return EXIT_NO_INPUT
+    if any(entry["estado"] == STATUS_ERROR for entry in results):
+        return EXIT_FAILURES
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    TicketAnalyzer.multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,507 @@
+import importlib.util
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import datetime
+from heapq import merge
+
+import TaskProgress
+import TicketStore
+
+# Modelo en memoria de los tickets para los análisis de AnalizadorDatos. Los registros
+# JSON se convierten una sola vez, al cargarlos, en objetos Ticket/Item con __slots__:
+# la fecha de compra se interpreta en ese momento (y no en cada consulta) y los nombres
+# de producto se internan en un diccionario de productos: cada producto tiene un ID
+# entero y todas sus compras comparten la misma cadena. Las fechas que no se pueden
+# interpretar se avisan una vez al cargar y esos tickets quedan fuera de las consultas
+# por fecha.
+#
+# Para las consultas por rango de fechas se construye (la primera vez que se pide) un
+# índice con los tickets ordenados por fecha y las sumas acumuladas de precio_total:
+# el gasto de cualquier rango son dos búsquedas binarias y una resta. Los informes por
+# mes (ticket mensual, producto en un mes) y el de productos más comprados salen de un
+# cubo de agregados por (año, mes, producto), y el historial de un producto, de un
+# índice invertido con la lista de sus compras. Todos se mantienen al añadir tickets.
+#
+# Opcionalmente (TICKET_COLUMNAR=1, si NumPy está instalado) los artículos se guardan
+# también en columnas de NumPy y el gasto total, los productos más comprados y el ticket
+# mensual se calculan con reducciones vectorizadas en lugar del cubo de agregados.
+DATE_FORMAT = '%d/%m/%Y %H:%M'
+
+COLUMNAR = os.environ.get('TICKET_COLUMNAR', '0') == '1' and importlib.util.find_spec('numpy') is not None
+
+# Valores de las columnas para los artículos de tickets sin fecha válida
+EPOCH = datetime(1970, 1, 1)
+MISSING_EPOCH = -2 ** 63
+MISSING_MONTH = -1
+
+# Los índices avisan del avance de su construcción cada TaskProgress.PROGRESS_STEP tickets
+# a la tarea que los pide (TaskProgress.Task), que puede cancelarla
+
+
+def _report(task, done, total):
+    if task is not None and done % TaskProgress.PROGRESS_STEP == 0:
+        task.progress(done, total)
+
+
+class Item:
+    # producto es el ID del producto en el diccionario de la colección (Tickets.products)
+    __slots__ = ('producto', 'descripcion', 'cantidad', 'precio_unitario')
+
+    def __init__(self, producto, descripcion, cantidad, precio_unitario):
+        self.producto = producto
+        self.descripcion = descripcion
+        self.cantidad = cantidad
+        self.precio_unitario = precio_unitario
+
+
+class Ticket:
+    # fecha_compra es el texto original; fecha, el datetime (None si no es válida)
+    __slots__ = ('id', 'fecha_compra', 'fecha', 'precio_total', 'items')
+
+    def __init__(self, id, fecha_compra, fecha, precio_total, items):
+        self.id = id
+        self.fecha_compra = fecha_compra
+        self.fecha = fecha
+        self.precio_total = precio_total
+        self.items = items
+
+    def to_record(self):
+        """Devuelve el ticket como registro JSON de los almacenes."""
+        return {
+            "id": self.id,
+            "fecha_compra": self.fecha_compra,
+            "items": [
+                {"descripcion": item.descripcion, "cantidad": item.cantidad, "precio_unitario": item.precio_unitario}
+                for item in self.items
+            ],
+            "precio_total": self.precio_total
+        }
+
+
+def parse_date(text):
+    """Convierte 'dd/mm/aaaa hh:mm' en datetime. Lanza ValueError si no es una fecha válida."""
+    # Camino rápido para el formato fijo que generan los analizadores de tickets;
+    # cualquier otra variante (día o mes de una cifra...) pasa por strptime
+    if (len(text) == 16 and text[2] == '/' and text[5] == '/' and text[10] == ' ' and text[13] == ':'
+            and (text[0:2] + text[3:5] + text[6:10] + text[11:13] + text[14:16]).isdigit()):
+        return datetime(int(text[6:10]), int(text[3:5]), int(text[0:2]), int(text[11:13]), int(text[14:16]))
+    return datetime.strptime(text, DATE_FORMAT)
+
+
+class DateIndex:
+    """
+    Tickets con fecha válida ordenados por fecha (los de la misma fecha, en el orden del
+    almacén). prefix[k] es la suma de precio_total de los k primeros, de modo que el
+    gasto de las posiciones lo..hi-1 es prefix[hi] - prefix[lo].
+    """
+
+    def __init__(self, tickets, task=None):
+        self.tickets = tickets
+        self.dates = []
+        self.positions = []
+        self.prefix = [0.0]
+        self.add(0, task)
+
+    def add(self, start, task=None):
+        """Incorpora los tickets de la colección a partir de la posición start."""
+        tickets = self.tickets
+        new = sorted((position for position in range(start, len(tickets)) if tickets[position].fecha is not None),
+                     key=lambda position: tickets[position].fecha)
+        if not new:
+            return
+        # Lo habitual es añadir tickets más recientes que todos los indexados: basta con
+        # añadirlos al final. Si no, se mezclan desde el primer punto de inserción.
+        first = bisect_right(self.dates, tickets[new[0]].fecha)
+        if first < len(self.dates):
+            new = list(merge(self.positions[first:], new, key=lambda position: tickets[position].fecha))
+            del self.dates[first:], self.positions[first:], self.prefix[first + 1:]
+        total = self.prefix[-1]
+        for done, position in enumerate(new):
+            _report(task, done, len(new))
+            ticket = tickets[position]
+            total += ticket.precio_total
+            self.dates.append(ticket.fecha)
+            self.positions.append(position)
+            self.prefix.append(total)
+
+    def bounds(self, start, end):
+        """Posiciones [lo, hi) de los tickets con start <= fecha < end (datetimes)."""
+        return bisect_left(self.dates, start), bisect_left(self.dates, end)
+
+    def expense(self, start, end):
+        """Gasto de los tickets con start <= fecha < end."""
+        lo, hi = self.bounds(start, end)
+        return self.prefix[hi] - self.prefix[lo] if hi > lo else 0.0
+
+    def between(self, start, end):
+        """Tickets con start <= fecha < end, en orden de fecha."""
+        lo, hi = self.bounds(start, end)
+        return [self.tickets[position] for position in self.positions[lo:hi]]
+
+
+class ProductMonth:
+    """Compras de un producto en un mes: cantidad, gasto, último precio unitario y fechas."""
+    __slots__ = ('cantidad', 'gasto', 'precio_unitario', 'fechas')
+
+    def __init__(self):
+        self.cantidad = 0
+        self.gasto = 0
+        self.precio_unitario = 0
+        self.fechas = []
+
+
+class MonthlyCube:
+    """
+    Agregados de los artículos por (año, mes, producto), acumulados en el orden del
+    almacén para que coincidan con los cálculos sobre la lista de tickets:
+
+    - months[(año, mes)]: {producto: ProductMonth}, con los productos por orden de
+      primera compra en el mes; month_totals[(año, mes)]: gasto del mes.
+    - product_totals: cantidad comprada de cada producto (también de los tickets sin
+      fecha válida), un Counter para sacar los más comprados.
+
+    El gasto de un artículo es cantidad * |precio_unitario|, como en el ticket mensual.
+    """
+
+    def __init__(self, tickets, task=None):
+        self.tickets = tickets
+        self.months = {}
+        self.month_totals = {}
+        self.product_totals = Counter()
+        self.add(0, task)
+
+    def add(self, start, task=None):
+        """Acumula los tickets de la colección a partir de la posición start."""
+        product_totals = self.product_totals
+        for position in range(start, len(self.tickets)):
+            _report(task, position - start, len(self.tickets) - start)
+            ticket = self.tickets[position]
+            for item in ticket.items:
+                product_totals[item.descripcion] += item.cantidad
+            if ticket.fecha is None:
+                continue
+            key = (ticket.fecha.year, ticket.fecha.month)
+            products = self.months.setdefault(key, {})
+            total = self.month_totals.get(key, 0)
+            for item in ticket.items:
+                cell = products.get(item.descripcion)
+                if cell is None:
+                    cell = products[item.descripcion] = ProductMonth()
+                precio_unitario = abs(item.precio_unitario)
+                gasto = item.cantidad * precio_unitario
+                cell.cantidad += item.cantidad
+                cell.gasto += gasto
+                cell.precio_unitario = precio_unitario
+                cell.fechas.append(ticket.fecha_compra)
+                total += gasto
+            self.month_totals[key] = total
+
+    def month(self, year, month):
+        """{producto: ProductMonth} de un mes (vacío si no hay compras)."""
+        return self.months.get((year, month), {})
+
+    def cell(self, year, month, product):
+        """Compras del producto en el mes, o None."""
+        return self.months.get((year, month), {}).get(product)
+
+
+class ProductIndex:
+    """
+    Índice invertido: para cada ID de producto, la lista de sus compras como tuplas
+    (posición del ticket, fecha, cantidad, precio unitario), en el orden del almacén.
+    Las consultas de un producto cuestan lo que su lista, no lo que todo el almacén.
+    """
+
+    def __init__(self, tickets, task=None):
+        self.tickets = tickets
+        self.postings = []
+        self.add(0, task)
+
+    def add(self, start, task=None):
+        """Añade las compras de los tickets de la colección a partir de la posición start."""
+        postings = self.postings
+        for position in range(start, len(self.tickets)):
+            _report(task, position - start, len(self.tickets) - start)
+            ticket = self.tickets[position]
+            for item in ticket.items:
+                while item.producto >= len(postings):
+                    postings.append([])
+                postings[item.producto].append((position, ticket.fecha, item.cantidad, item.precio_unitario))
+
+    def purchases(self, product_id):
+        """Lista de compras del producto (vacía si el ID no tiene ninguna)."""
+        return self.postings[product_id] if product_id is not None and product_id < len(self.postings) else []
+
+    def price_series(self, product_id):
+        """[(fecha, precio unitario)] de las compras con fecha válida, ordenadas por fecha."""
+        series = [(fecha, precio_unitario) for _, fecha, _, precio_unitario in self.purchases(product_id)
+                  if fecha is not None]
+        series.sort(key=lambda point: point[0])
+        return series
+
+
+class ItemColumns:
+    """
+    Tabla columnar de los artículos (un elemento por artículo, en el orden del almacén):
+
+    - product: ID del producto (int32, el del diccionario de la colección)
+    - quantity: cantidad (int64, o float64 si alguna no es entera)
+    - unit_price: |precio unitario| (float64)
+    - amount: gasto del artículo, cantidad * |precio unitario| (float64). Los precios de
+      Mercadona son importe / cantidad y no son céntimos exactos, así que se guarda el
+      importe de cada línea en lugar de redondear el precio.
+    - epoch: fecha de compra en segundos desde 1970 (int64, MISSING_EPOCH sin fecha)
+    - month: año * 12 + mes - 1 (int32, MISSING_MONTH sin fecha)
+    - ticket: posición del ticket en la colección (int32)
+
+    y ticket_totals, el precio_total de cada ticket (float64). Al añadir tickets se
+    concatenan las columnas nuevas.
+    """
+
+    def __init__(self, tickets, products, task=None):
+        import numpy
+        self.np = numpy
+        self.tickets = tickets
+        self.products = products
+        self.length = 0
+        self.product = numpy.zeros(0, dtype=numpy.int32)
+        self.quantity = numpy.zeros(0, dtype=numpy.int64)
+        self.unit_price = numpy.zeros(0, dtype=numpy.float64)
+        self.amount = numpy.zeros(0, dtype=numpy.float64)
+        self.epoch = numpy.zeros(0, dtype=numpy.int64)
+        self.month = numpy.zeros(0, dtype=numpy.int32)
+        self.ticket = numpy.zeros(0, dtype=numpy.int32)
+        self.ticket_totals = numpy.zeros(0, dtype=numpy.float64)
+        self.add(0, task)
+
+    def add(self, start, task=None):
+        """Añade las filas de los tickets de la colección a partir de la posición start."""
+        np = self.np
+        product, quantity, unit_price, amount, epoch, month, ticket, totals = [], [], [], [], [], [], [], []
+        for position in range(start, len(self.tickets)):
+            _report(task, position - start, len(self.tickets) - start)
+            current = self.tickets[position]
+            totals.append(current.precio_total)
+            if current.fecha is None:
+                ticket_epoch, ticket_month = MISSING_EPOCH, MISSING_MONTH
+            else:
+                ticket_epoch = int((current.fecha - EPOCH).total_seconds())
+                ticket_month = current.fecha.year * 12 + current.fecha.month - 1
+            for item in current.items:
+                product.append(item.producto)
+                quantity.append(item.cantidad)
+                precio_unitario = abs(item.precio_unitario)
+                unit_price.append(precio_unitario)
+                amount.append(item.cantidad * precio_unitario)
+                epoch.append(ticket_epoch)
+                month.append(ticket_month)
+                ticket.append(position)
+        if not totals:
+            return
+        integral = self.quantity.dtype.kind == 'i' and all(isinstance(value, int) for value in quantity)
+        self.product = np.concatenate((self.product, np.array(product, dtype=np.int32)))
+        self.quantity = np.concatenate((self.quantity, np.array(quantity, dtype=np.int64 if integral else np.float64)))
+        self.unit_price = np.concatenate((self.unit_price, np.array(unit_price, dtype=np.float64)))
+        self.amount = np.concatenate((self.amount, np.array(amount, dtype=np.float64)))
+        self.epoch = np.concatenate((self.epoch, np.array(epoch, dtype=np.int64)))
+        self.month = np.concatenate((self.month, np.array(month, dtype=np.int32)))
+        self.ticket = np.concatenate((self.ticket, np.array(ticket, dtype=np.int32)))
+        self.ticket_totals = np.concatenate((self.ticket_totals, np.array(totals, dtype=np.float64)))
+        self.length = len(self.product)
+
+    def _quantities(self, values):
+        # bincount devuelve float64; las cantidades enteras se devuelven como int
+        if self.quantity.dtype.kind == 'i':
+            return [int(value) for value in values]
+        return [float(value) for value in values]
+
+    def total_expense(self):
+        # Suma acumulada (en orden, como sum() sobre la lista) en lugar de sum(), que suma
+        # por parejas y puede diferir en los últimos bits
+        return float(self.np.cumsum(self.ticket_totals)[-1]) if len(self.ticket_totals) else 0.0
+
+    def product_totals(self):
+        """[(producto, cantidad)] de más a menos comprado; a igualdad, por primera aparición."""
+        totals = self.np.bincount(self.product, weights=self.quantity, minlength=len(self.products))
+        # Los IDs de producto siguen el orden de primera aparición, así que una ordenación
+        # estable por cantidad deja los empates como Counter.most_common()
+        order = self.np.argsort(-totals, kind='stable')
+        return list(zip([self.products[index] for index in order], self._quantities(totals[order])))
+
+    def top_products(self, k, offset=0):
+        """
+        Posiciones offset..offset+k-1 de product_totals() sin ordenar todo el catálogo:
+        argpartition separa los offset+k primeros y solo se ordenan esos.
+        """
+        np = self.np
+        totals = np.bincount(self.product, weights=self.quantity, minlength=len(self.products))
+        wanted = offset + k
+        if wanted <= 0:
+            return []
+        if wanted >= len(totals):
+            candidates = np.arange(len(totals))
+        else:
+            # Todos los que llegan al valor del puesto wanted (puede haber empates en el corte)
+            threshold = np.partition(totals, len(totals) - wanted)[len(totals) - wanted]
+            candidates = np.flatnonzero(totals >= threshold)
+        order = candidates[np.lexsort((candidates, -totals[candidates]))][offset:wanted]
+        return list(zip([self.products[index] for index in order], self._quantities(totals[order])))
+
+    def monthly(self, year, month):
+        """
+        Resumen del mes como el de AnalizadorDatos.monthly_ticket: {producto: {cantidad,
+        precio_unitario (último), precio_total}} por orden de primera compra, y el gasto.
+        """
+        np = self.np
+        if month is None:
+            return {}, 0
+        rows = np.flatnonzero(self.month == year * 12 + month - 1)
+        if not len(rows):
+            return {}, 0
+        codes = self.product[rows]
+        quantity = self.quantity[rows]
+        prices = self.unit_price[rows]
+        amounts = self.amount[rows]
+        products, first, inverse = np.unique(codes, return_index=True, return_inverse=True)
+        _, last_reversed = np.unique(codes[::-1], return_index=True)
+        last = len(codes) - 1 - last_reversed
+        quantities = self._quantities(np.bincount(inverse, weights=quantity))
+        # bincount suma en el orden de las filas, como el cubo, y da los mismos importes
+        spent = np.bincount(inverse, weights=amounts)
+        summary = {}
+        for index in np.argsort(first):
+            summary[self.products[products[index]]] = {
+                'cantidad': quantities[index],
+                'precio_unitario': float(prices[last[index]]),
+                'precio_total': float(spent[index]),
+            }
+        # Suma acumulada (secuencial, no por parejas como sum) para el mismo total que el cubo
+        return summary, float(np.cumsum(amounts)[-1])
+
+
+class Tickets:
+    """Colección de tickets del modelo, en el orden del almacén."""
+
+    def __init__(self, records=()):
+        self.tickets = []
+        # Diccionario de productos: nombre -> ID y, por ID, el nombre
+        self.product_ids = {}
+        self.products = []
+        # fecha_compra de los tickets cuya fecha no se pudo interpretar
+        self.bad_dates = []
+        self._date_index = None
+        self._cube = None
+        self._product_index = None
+        self._columns = None
+        # Los cálculos llegan desde hilos de TaskRunner: dos consultas a la vez no deben
+        # construir dos veces el mismo índice ni añadir tickets mientras se construye
+        self._lock = threading.Lock()
+        self.extend(records)
+
+    def __len__(self):
+        return len(self.tickets)
+
+    def __iter__(self):
+        return iter(self.tickets)
+
+    def __getitem__(self, index):
+        return self.tickets[index]
+
+    def product_id(self, name):
+        """ID del producto, o None si no aparece en ningún ticket."""
+        return self.product_ids.get(name)
+
+    def _intern(self, name):
+        product_id = self.product_ids.get(name)
+        if product_id is None:
+            product_id = self.product_ids[name] = len(self.products)
+            self.products.append(name)
+        return product_id
+
+    def _convert(self, record, bad_dates):
+        fecha_compra = record.get('fecha_compra')
+        fecha = None
+        if fecha_compra:
+            try:
+                fecha = parse_date(fecha_compra)
+            except ValueError:
+                bad_dates.append(fecha_compra)
+        items = []
+        for item in record['items']:
+            product_id = self._intern(item['descripcion'])
+            items.append(Item(product_id, self.products[product_id], item['cantidad'], item['precio_unitario']))
+        return Ticket(record.get('id'), fecha_compra, fecha, record['precio_total'], items)
+
+    def extend(self, records):
+        """Convierte y añade los registros. Devuelve el número de tickets añadidos."""
+        bad_dates = []
+        with self._lock:
+            added = [self._convert(record, bad_dates) for record in records]
+            start = len(self.tickets)
+            self.tickets.extend(added)
+            if self._date_index is not None:
+                self._date_index.add(start)
+            if self._cube is not None:
+                self._cube.add(start)
+            if self._product_index is not None:
+                self._product_index.add(start)
+            if self._columns is not None:
+                self._columns.add(start)
+        if bad_dates:
+            self.bad_dates.extend(bad_dates)
+            print(f"{len(bad_dates)} tickets con fecha no válida (por ejemplo, '{bad_dates[0]}'); "
+                  "no aparecerán en las consultas por fecha.")
+        return len(added)
+
+    def append(self, record):
+        self.extend([record])
+
+    # Las estructuras se asignan cuando están completas: si la construcción se cancela
+    # (TaskProgress.Cancelled desde `task`), queda sin hacer y se repite en la siguiente
+    # consulta. La construcción se hace con el cerrojo tomado; una consulta que llega
+    # mientras tanto espera y usa la estructura ya construida.
+    def date_index(self, task=None):
+        """Índice por fecha (DateIndex); se construye la primera vez y luego se mantiene al añadir."""
+        if self._date_index is None:
+            with self._lock:
+                if self._date_index is None:
+                    self._date_index = DateIndex(self.tickets, task)
+        return self._date_index
+
+    def cube(self, task=None):
+        """Cubo de agregados por mes y producto (MonthlyCube); se construye la primera vez."""
+        if self._cube is None:
+            with self._lock:
+                if self._cube is None:
+                    self._cube = MonthlyCube(self.tickets, task)
+        return self._cube
+
+    def product_index(self, task=None):
+        """Índice invertido de productos (ProductIndex); se construye la primera vez."""
+        if self._product_index is None:
+            with self._lock:
+                if self._product_index is None:
+                    self._product_index = ProductIndex(self.tickets, task)
+        return self._product_index
+
+    def columns(self, task=None):
+        """Tabla columnar de los artículos (ItemColumns, necesita NumPy); se construye la primera vez."""
+        if self._columns is None:
+            with self._lock:
+                if self._columns is None:
+                    self._columns = ItemColumns(self.tickets, self.products, task)
+        return self._columns
+
+
+def as_tickets(tickets_data):
+    """Devuelve tickets_data como Tickets, convirtiéndolo si es una lista de registros JSON."""
+    if isinstance(tickets_data, Tickets):
+        return tickets_data
+    return Tickets(tickets_data)
+
+
+def load(path):
+    """Carga el almacén de tickets en el modelo, leyendo los registros uno a uno."""
+    return Tickets(TicketStore.iter_records(path))
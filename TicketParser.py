@@ -0,0 +1,250 @@
+import re
+
+# Analizador de tickets en una sola pasada. El texto se divide en líneas una única vez y
+# se reparte a la gramática de la tienda correspondiente; todas las expresiones regulares
+# están precompiladas. El resultado es un único objeto ParsedTicket con todos los datos.
+
+# Tipos de documento que se importan
+DOCUMENT_TICKET = 'ticket'
+DOCUMENT_RETURN = 'devolucion'
+DOCUMENT_LIDL = 'lidl'
+
+# Gramáticas disponibles
+GRAMMAR_MERCADONA = 'mercadona'
+GRAMMAR_MERCADONA_RETURN = 'mercadona_devolucion'
+GRAMMAR_LIDL = 'lidl'
+
+NOT_FOUND = "No encontrado"
+DATE_NOT_FOUND = "Fecha no encontrada"
+
+STORE_NAME_PATTERN = re.compile(r'[A-Z]{2,}')
+TOTAL_PATTERN = re.compile(r'total\s*[:\s]*\n?\s*\€?\$?\d+[.,]?\d*', re.IGNORECASE)
+AMOUNT_PATTERN = re.compile(r'\€?\$?\d+[.,]?\d*')
+DATE_PATTERN = re.compile(r'\d{2}/\d{2}/\d{4} \d{2}:\d{2}')
+
+MERCADONA_ITEMS_HEADER = "Descripción P. Unit Importe"
+MERCADONA_ITEMS_END = "TOTAL"
+LIDL_ITEMS_END = "Total"
+
+# Mercadona: se separa el primer dígito de la cantidad, que el OCR suele pegar a la
+# descripción, y después se lee cantidad, descripción e importe de la línea
+ITEM_SPACING_PATTERN = re.compile(r'^(\d)(\d*)\s*(.*)\s+([\d,.]+)$')
+ITEM_PATTERN = re.compile(r'^(\d+)\s+(.*)\s+([\d,.]+)$')
+RETURN_SPACING_PATTERN = re.compile(r'^(-?\d+)\s*(.*)\s+(-?[\d,.]+)$')
+RETURN_ITEM_PATTERN = re.compile(r'^(-?\d+)\s+(.*)\s+(-?[\d,.]+)$')
+LIDL_ITEM_PATTERN = re.compile(r'(.+?)\s+(\d+[.,]\d{2})')
+
+
+class ParsedTicket:
+    """Resultado del análisis de un ticket."""
+    __slots__ = ('grammar', 'store_name', 'total_amount', 'fecha_compra', 'items', 'precio_total',
+                 'line_count', 'item_lines')
+
+    def __init__(self, grammar, store_name, total_amount, fecha_compra, items, precio_total, line_count,
+                 item_lines=0):
+        self.grammar = grammar
+        self.store_name = store_name
+        self.total_amount = total_amount
+        self.fecha_compra = fecha_compra
+        self.items = items
+        self.precio_total = precio_total
+        self.line_count = line_count
+        # Líneas de la zona de artículos examinadas; las que no son artículos no se reconocieron
+        self.item_lines = item_lines
+
+    @property
+    def unmatched_lines(self):
+        return self.item_lines - len(self.items)
+
+    def to_record(self):
+        """Devuelve el registro que se guarda en el almacén, o None si no hay artículos."""
+        if not self.items:
+            return None
+        return {
+            "id": None,  # ID único, se asigna al guardar
+            "fecha_compra": self.fecha_compra,
+            "items": self.items,
+            "precio_total": round(self.precio_total, 2)
+        }
+
+
+def find_store_name(lines):
+    """Primera línea que empieza con al menos dos mayúsculas."""
+    for line in lines:
+        if STORE_NAME_PATTERN.match(line):
+            return line.strip()
+    return NOT_FOUND
+
+
+def find_total_amount(extracted_text):
+    match = TOTAL_PATTERN.search(extracted_text)
+    if match:
+        return AMOUNT_PATTERN.search(match.group()).group()
+    return NOT_FOUND
+
+
+def find_purchase_date(extracted_text):
+    match = DATE_PATTERN.search(extracted_text)
+    return match.group() if match else DATE_NOT_FOUND
+
+
+def detect_grammar(store_name):
+    """Elige la gramática según el nombre de la tienda, o None si no se reconoce."""
+    store_name = store_name.lower()
+    if "mercadona" in store_name:
+        return GRAMMAR_MERCADONA
+    if "lidl" in store_name:
+        return GRAMMAR_LIDL
+    return None
+
+
+def parse_item_line(line):
+    """
+    Analiza una línea de un ticket de Mercadona y devuelve el artículo con la cantidad,
+    la descripción y el precio unitario, o None si no es una línea válida.
+    """
+    match = ITEM_SPACING_PATTERN.match(line)
+    if not match:
+        return None
+    line = '%s %s %s %s' % match.groups()
+    match = ITEM_PATTERN.match(line)
+    if not match:
+        return None
+    try:
+        cantidad = int(match.group(1))
+        descripcion = match.group(2).strip()
+        precio_unitario = float(match.group(3).replace(',', '.'))
+        precio_unitario = precio_unitario / cantidad
+    except (ValueError, ZeroDivisionError) as e:
+        print(f"Error al procesar la línea: {line}. Error: {e}")
+        return None
+    return {
+        "descripcion": descripcion,
+        "cantidad": cantidad,
+        "precio_unitario": precio_unitario
+    }
+
+
+def parse_return_line(line):
+    """
+    Analiza una línea de un ticket de devolución (admite cantidades y precios negativos)
+    y devuelve el artículo, o None si no es una línea válida.
+    """
+    match = RETURN_SPACING_PATTERN.match(line)
+    if not match:
+        return None
+    line = '%s %s %s' % match.groups()
+    match = RETURN_ITEM_PATTERN.match(line)
+    if not match:
+        return None
+    try:
+        cantidad = int(match.group(1))
+        descripcion = match.group(2).strip()
+        precio_unitario = float(match.group(3).replace(',', '.'))
+    except ValueError as e:
+        print(f"Error al procesar la línea: {line}. Error: {e}")
+        return None
+    return {
+        "descripcion": descripcion,
+        "cantidad": cantidad,
+        "precio_unitario": precio_unitario
+    }
+
+
+def _mercadona_items(lines, parse_line):
+    """
+    Devuelve los artículos entre la cabecera de la tabla y la línea del TOTAL,
+    y el número de líneas examinadas.
+    """
+    items = []
+    scanned = 0
+    start_reading_items = False
+    for line in lines:
+        if MERCADONA_ITEMS_HEADER in line:
+            start_reading_items = True
+            continue
+        if start_reading_items:
+            if line.startswith(MERCADONA_ITEMS_END):
+                break
+            scanned += 1
+            item = parse_line(line)
+            if item:
+                items.append(item)
+    return items, scanned
+
+
+def _parse_mercadona(lines):
+    items, scanned = _mercadona_items(lines, parse_item_line)
+    precio_total = 0.0
+    for item in items:
+        precio_total += item["cantidad"] * item["precio_unitario"]
+    return items, precio_total, scanned
+
+
+def _parse_mercadona_return(lines):
+    items, scanned = _mercadona_items(lines, parse_return_line)
+    precio_total = 0.0
+    for item in items:
+        # Las devoluciones se guardan con cantidad y precio en negativo
+        item["cantidad"] = -abs(item["cantidad"])
+        item["precio_unitario"] = -abs(item["precio_unitario"])
+        precio_total += item["cantidad"] * item["precio_unitario"]
+        precio_total = -abs(precio_total)
+    return items, precio_total, scanned
+
+
+def _parse_lidl(lines):
+    items = []
+    precio_total = 0.0
+    scanned = 0
+    for line in lines:
+        # La línea del total marca el final de los artículos
+        if LIDL_ITEMS_END in line:
+            break
+        scanned += 1
+        match = LIDL_ITEM_PATTERN.match(line)
+        if match:
+            precio_unitario = float(match.group(2).replace(',', '.'))
+            items.append({
+                "descripcion": match.group(1).strip(),
+                "cantidad": 1,  # Lidl no indica la cantidad si es 1
+                "precio_unitario": precio_unitario
+            })
+            precio_total += precio_unitario
+    return items, precio_total, scanned
+
+
+GRAMMARS = {
+    GRAMMAR_MERCADONA: _parse_mercadona,
+    GRAMMAR_MERCADONA_RETURN: _parse_mercadona_return,
+    GRAMMAR_LIDL: _parse_lidl,
+}
+
+DOCUMENT_GRAMMARS = {
+    DOCUMENT_RETURN: GRAMMAR_MERCADONA_RETURN,
+    DOCUMENT_LIDL: GRAMMAR_LIDL,
+}
+
+
+def parse_ticket(extracted_text, kind=DOCUMENT_TICKET, grammar=None):
+    """
+    Analiza el texto completo de un ticket en una sola pasada y devuelve un ParsedTicket.
+    Si no se indica la gramática, se deduce del tipo de documento o, para los tickets
+    normales, del nombre de la tienda.
+    """
+    lines = extracted_text.split('\n')
+    store_name = find_store_name(lines)
+    if grammar is None:
+        grammar = DOCUMENT_GRAMMARS.get(kind) or detect_grammar(store_name)
+
+    items, precio_total, item_lines = GRAMMARS[grammar](lines) if grammar else ([], 0.0, 0)
+    return ParsedTicket(
+        grammar=grammar,
+        store_name=store_name,
+        total_amount=find_total_amount(extracted_text),
+        fecha_compra=find_purchase_date(extracted_text),
+        items=items,
+        precio_total=precio_total,
+        line_count=len(lines),
+        item_lines=item_lines
+    )
@@ -0,0 +1,581 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+import PipelineMetrics
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Los almacenes de tickets se guardan como un registro JSON Lines (un ticket por línea)
+# junto al antiguo archivo JSON. Añadir un ticket solo escribe una línea al final del
+# archivo, en lugar de leer y reescribir todo el historial en cada importación.
+LOG_EXTENSION = '.jsonl'
+BACKUP_EXTENSION = '.bak'
+
+# Cada almacén tiene un pequeño archivo de metadatos con el próximo ID, el número de
+# registros y una versión de datos que aumenta con cada escritura. Así asignar un ID
+# no obliga a leer el historial entero.
+META_EXTENSION = '.meta.json'
+LOCK_EXTENSION = '.lock'
+META_FORMAT = 1
+
+# Índice de huellas para detectar duplicados: un archivo con una clave por línea
+# ('x.fingerprints'). Es válido mientras su versión coincida con la versión de datos
+# del almacén; si no, se reconstruye una vez recorriendo los registros.
+FINGERPRINT_EXTENSION = '.fingerprints'
+
+# Cada escritura del registro (o lote de registros) se lleva al disco con fsync antes de
+# actualizar los metadatos, y los archivos completos se escriben en un temporal que se
+# renombra, de modo que un corte nunca deja un almacén a medias. TICKET_STORE_FSYNC=0
+# desactiva el fsync (más rápido, pero un corte de luz puede perder el último lote).
+FSYNC = os.environ.get('TICKET_STORE_FSYNC', '1') != '0'
+
+# Compactación: el registro solo crece al final, así que las únicas líneas inservibles son
+# las que deja una escritura cortada. Si al añadir se encuentra el final incompleto, se
+# compacta el registro (se reescribe sin esa línea) antes de seguir. compact_store() y
+# 'TicketCLI.py compactar' lo hacen a petición.
+
+# Claves ya leídas del índice en este proceso: {ruta: (base, bytes leídos, conjunto de claves)}
+_fingerprint_cache = {}
+
+
+def store_log_path(path):
+    """Devuelve la ruta del registro JSON Lines asociado a un almacén ('x.json' -> 'x.jsonl')."""
+    root, _ = os.path.splitext(path)
+    return root + LOG_EXTENSION
+
+
+def store_meta_path(path):
+    """Devuelve la ruta del archivo de metadatos del almacén ('x.json' -> 'x.meta.json')."""
+    root, _ = os.path.splitext(path)
+    return root + META_EXTENSION
+
+
+@contextmanager
+def store_lock(path):
+    """
+    Bloqueo consultivo del almacén entre procesos, para que varias importaciones
+    simultáneas no se pisen al asignar IDs ni al escribir.
+    """
+    root, _ = os.path.splitext(path)
+    with open(root + LOCK_EXTENSION, 'a+b') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def store_index_path(path):
+    """Devuelve la ruta del índice de huellas del almacén ('x.json' -> 'x.fingerprints')."""
+    root, _ = os.path.splitext(path)
+    return root + FINGERPRINT_EXTENSION
+
+
+def store_exists(path):
+    """Indica si el almacén existe, ya sea en formato JSON Lines o en el antiguo array JSON."""
+    return os.path.exists(store_log_path(path)) or os.path.exists(path)
+
+
+def iter_records(path):
+    """
+    Recorre los registros del almacén sin cargar el archivo completo en memoria.
+    Si todavía no se ha migrado, lee el antiguo array JSON.
+    """
+    log_path = store_log_path(path)
+    if os.path.exists(log_path):
+        with open(log_path, 'r', encoding='utf-8') as file:
+            for line_number, line in enumerate(file, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Una línea incompleta (por ejemplo, tras un corte) no invalida el resto
+                    print(f"Línea {line_number} ilegible en {log_path}, se ignora.")
+    elif os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as file:
+            yield from json.load(file)
+
+
+def read_records(path):
+    """Devuelve la lista completa de registros del almacén."""
+    return list(iter_records(path))
+
+
+def _encode_records(records):
+    return ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records).encode('utf-8')
+
+
+def _ends_with_newline(file):
+    """Comprueba en O(1) si el archivo termina en salto de línea (o está vacío)."""
+    file.seek(0, os.SEEK_END)
+    if file.tell() == 0:
+        return True
+    file.seek(-1, os.SEEK_END)
+    return file.read(1) == b'\n'
+
+
+def _log_ends_cleanly(log_path):
+    """Indica si el registro no existe o termina en un salto de línea (no quedó a medias)."""
+    if not os.path.exists(log_path):
+        return True
+    with open(log_path, 'rb') as file:
+        return _ends_with_newline(file)
+
+
+def _log_size(path):
+    log_path = store_log_path(path)
+    return os.path.getsize(log_path) if os.path.exists(log_path) else 0
+
+
+def _sync(file):
+    file.flush()
+    if FSYNC:
+        os.fsync(file.fileno())
+
+
+def _sync_directory(path):
+    """Lleva al disco la entrada del directorio tras un renombrado (solo en POSIX)."""
+    if FSYNC and hasattr(os, 'O_DIRECTORY'):
+        descriptor = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+
+@contextmanager
+def atomic_file(path, mode='w', encoding=None, sync=True):
+    """
+    Abre un temporal junto a path para escribir el archivo completo. Al salir sin error
+    se lleva al disco y se renombra sobre path; si hay un error, path no cambia.
+    """
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    if encoding is None and 'b' not in mode:
+        encoding = 'utf-8'
+    try:
+        with open(temp_path, mode, encoding=encoding) as file:
+            yield file
+            if sync:
+                _sync(file)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if sync:
+        _sync_directory(path)
+
+
+def _write_meta(path, meta):
+    # Los metadatos se pueden reconstruir desde el registro (ver _load_meta), así que
+    # basta con reemplazarlos de forma atómica, sin fsync
+    with atomic_file(store_meta_path(path), sync=False) as file:
+        json.dump(meta, file)
+
+
+def _rebuild_meta(path, data_version=0):
+    """Recalcula los metadatos recorriendo el almacén (solo si faltan o están desfasados)."""
+    count = 0
+    max_id = 0
+    for record in iter_records(path):
+        count += 1
+        if isinstance(record.get('id'), int):
+            max_id = max(max_id, record['id'])
+    meta = {
+        "format": META_FORMAT,
+        "next_id": max(max_id, count) + 1,
+        "count": count,
+        "data_version": data_version,
+        "log_size": _log_size(path),
+    }
+    _write_meta(path, meta)
+    return meta
+
+
+def _load_meta(path):
+    """
+    Lee los metadatos del almacén. Si no existen, o el registro ha cambiado de tamaño
+    sin pasar por este módulo, se reconstruyen.
+    """
+    meta_path = store_meta_path(path)
+    meta = None
+    if os.path.exists(meta_path):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+        except ValueError:
+            meta = None
+    if meta is None or meta.get("format") != META_FORMAT or meta.get("log_size") != _log_size(path):
+        previous_version = meta.get("data_version", 0) if meta else 0
+        meta = _rebuild_meta(path, previous_version + 1)
+    return meta
+
+
+def read_meta(path):
+    """Devuelve los metadatos del almacén: next_id, count y data_version."""
+    with store_lock(path):
+        if not os.path.exists(store_log_path(path)) and os.path.exists(path):
+            _migrate_store(path)
+        return _load_meta(path)
+
+
+def _load_fingerprints(path, meta, key_function):
+    """
+    Devuelve el conjunto de claves del índice. Solo lee las líneas añadidas desde la
+    última vez; si el índice no está al día con el almacén, lo reconstruye.
+    """
+    index_path = store_index_path(path)
+    cache_key = os.path.abspath(path)
+    if meta.get("index_version") != meta["data_version"] or not os.path.exists(index_path):
+        keys = set()
+        for record in iter_records(path):
+            keys.update(key_function(record))
+        with atomic_file(index_path) as file:
+            file.write(''.join(key + '\n' for key in keys))
+        # La base identifica cada reconstrucción, para no mezclar índices en la caché
+        meta["index_version"] = meta["index_base"] = meta["data_version"]
+        _fingerprint_cache[cache_key] = (meta["index_base"], os.path.getsize(index_path), keys)
+        return keys
+
+    base, offset, keys = _fingerprint_cache.get(cache_key, (None, 0, None))
+    if base != meta.get("index_base"):
+        offset, keys = 0, set()
+    size = os.path.getsize(index_path)
+    if size > offset:
+        with open(index_path, 'rb') as file:
+            file.seek(offset)
+            keys.update(line.decode('utf-8') for line in file.read().splitlines() if line)
+    _fingerprint_cache[cache_key] = (meta.get("index_base"), size, keys)
+    return keys
+
+
+def _append(path, records, assign_ids, key_function):
+    """
+    Añade los registros bajo el bloqueo del almacén. Con key_function se omiten los
+    registros que tengan alguna clave ya indexada. Devuelve (bytes escritos, añadidos, omitidos).
+    """
+    log_path = store_log_path(path)
+    start = time.perf_counter()
+    with store_lock(path):
+        if not os.path.exists(log_path) and os.path.exists(path):
+            _migrate_store(path)
+        elif not _log_ends_cleanly(log_path):
+            print(f"{log_path} tiene una escritura incompleta; se compacta.")
+            _compact(path)
+
+        meta = _load_meta(path)
+        duplicates = []
+        new_keys = []
+        if key_function:
+            known_keys = _load_fingerprints(path, meta, key_function)
+            unique = []
+            for record in records:
+                record_keys = key_function(record)
+                if any(key in known_keys for key in record_keys):
+                    duplicates.append(record)
+                    continue
+                known_keys.update(record_keys)
+                new_keys.extend(record_keys)
+                unique.append(record)
+            records = unique
+
+        if not records:
+            _write_meta(path, meta)
+            return 0, records, duplicates
+
+        if assign_ids:
+            for record in records:
+                record["id"] = meta["next_id"]
+                meta["next_id"] += 1
+        else:
+            for record in records:
+                if isinstance(record.get("id"), int):
+                    meta["next_id"] = max(meta["next_id"], record["id"] + 1)
+
+        data = _encode_records(records)
+        with open(log_path, 'ab') as file:
+            file.write(data)
+            _sync(file)
+
+        meta["count"] += len(records)
+        meta["data_version"] += 1
+        meta["log_size"] = _log_size(path)
+        if key_function:
+            with open(store_index_path(path), 'a', encoding='utf-8') as file:
+                file.write(''.join(key + '\n' for key in new_keys))
+                _sync(file)
+            meta["index_version"] = meta["data_version"]
+        _write_meta(path, meta)
+    PipelineMetrics.add_time(PipelineMetrics.STAGE_STORE_WRITE, time.perf_counter() - start)
+    PipelineMetrics.count(PipelineMetrics.COUNT_BYTES_WRITTEN, len(data))
+    return len(data), records, duplicates
+
+
+def append_records(path, records, assign_ids=False):
+    """
+    Añade registros al final del almacén en una sola escritura y devuelve los bytes escritos.
+    El coste no depende del tamaño del historial. Con assign_ids=True se asigna a cada
+    registro el próximo ID dentro del mismo bloqueo. Si el almacén está en el antiguo
+    formato se migra primero (una única vez).
+    """
+    if not records:
+        return 0
+    written, _, _ = _append(path, records, assign_ids, None)
+    return written
+
+
+def append_record(path, record, assign_id=False):
+    """Añade un único registro al almacén."""
+    return append_records(path, [record], assign_ids=assign_id)
+
+
+def append_unique(path, records, key_function, assign_ids=False):
+    """
+    Añade solo los registros que no estén ya en el almacén. key_function(registro)
+    devuelve las claves que identifican al registro; si alguna ya está en el índice
+    de huellas, el registro se considera duplicado. La comprobación es O(1) por registro.
+    Devuelve (añadidos, duplicados).
+    """
+    if not records:
+        return [], []
+    _, appended, duplicates = _append(path, records, assign_ids, key_function)
+    return appended, duplicates
+
+
+def fingerprints(path, key_function):
+    """Devuelve el conjunto de claves ya indexadas del almacén (ver append_unique)."""
+    if not store_exists(path):
+        return set()
+    with store_lock(path):
+        meta = _load_meta(path)
+        index_version = meta.get("index_version")
+        keys = _load_fingerprints(path, meta, key_function)
+        if meta.get("index_version") != index_version:
+            _write_meta(path, meta)
+    return keys
+
+
+class StoreWriter:
+    """
+    Escritor con confirmación por lotes para los almacenes: acumula los registros que se
+    le añaden y los escribe con una única escritura y un único fsync por almacén en cada
+    lote, bajo el bloqueo del almacén. Se vacía al llamar a flush(), al salir del bloque
+    with y cuando el lote llega a batch_size registros. Si los registros se agrupan por
+    origen (begin_source, por ejemplo el archivo que se está importando), el lote lleno
+    solo se escribe al empezar el origen siguiente, para que todos los registros de un
+    origen (su texto y sus tickets) se confirmen juntos.
+
+    Con key_function, add() descarta en el momento los registros ya guardados o ya
+    pendientes en el lote (devuelve False); al escribir se vuelve a comprobar bajo el
+    bloqueo por si otro proceso los guardó entretanto. Esos descartes se acumulan en
+    `rejected` como (origen, almacén, registro), con el origen en el que se añadió el
+    registro.
+    """
+
+    def __init__(self, batch_size=100):
+        self.batch_size = batch_size
+        self.pending = {}
+        self.pending_count = 0
+        self.known_keys = {}
+        self.source = None
+        self.rejected = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def begin_source(self, source):
+        """Empieza los registros de otro origen; antes escribe el lote si ya está lleno."""
+        if self.pending_count >= self.batch_size:
+            self.flush()
+        self.source = source
+
+    def add(self, path, record, assign_id=False, key_function=None):
+        """Añade un registro al lote. Devuelve False si es un duplicado y se descarta."""
+        batch = self.pending.get(path)
+        if batch is None:
+            batch = self.pending[path] = {"records": [], "sources": [], "assign_ids": assign_id,
+                                          "key_function": key_function}
+        if key_function:
+            if path not in self.known_keys:
+                self.known_keys[path] = set(fingerprints(path, key_function))
+            record_keys = key_function(record)
+            if any(key in self.known_keys[path] for key in record_keys):
+                return False
+            self.known_keys[path].update(record_keys)
+        batch["records"].append(record)
+        batch["sources"].append(self.source)
+        self.pending_count += 1
+        if self.source is None and self.pending_count >= self.batch_size:
+            self.flush()
+        return True
+
+    def flush(self):
+        """Escribe los lotes pendientes. Devuelve {almacén: registros descartados al escribir}."""
+        pending, self.pending, self.pending_count = self.pending, {}, 0
+        duplicates = {}
+        # Orden inverso al del primer registro de cada almacén: el almacén que se rellena
+        # primero (por ejemplo, el de textos de origen, que marca el documento como
+        # importado) se confirma el último, así un corte nunca lo deja por delante del resto
+        for path in reversed(list(pending)):
+            batch = pending[path]
+            if batch["records"]:
+                _, _, duplicates[path] = _append(path, batch["records"], batch["assign_ids"], batch["key_function"])
+                if duplicates[path]:
+                    sources = {id(record): source for record, source in zip(batch["records"], batch["sources"])}
+                    self.rejected.extend((sources[id(record)], path, record) for record in duplicates[path])
+        return duplicates
+
+    def rejected_sources(self):
+        """Orígenes con algún registro descartado como duplicado al escribir."""
+        return {source for source, _, _ in self.rejected}
+
+
+def dedupe_store(path, key_function):
+    """
+    Elimina del almacén los registros duplicados (se conserva la primera aparición)
+    y reconstruye el índice de huellas. Devuelve el número de registros eliminados.
+    """
+    if not store_exists(path):
+        return 0
+    with store_lock(path):
+        data_version = _load_meta(path)["data_version"]
+        keys = set()
+        unique = []
+        removed = 0
+        for record in iter_records(path):
+            record_keys = key_function(record)
+            if any(key in keys for key in record_keys):
+                removed += 1
+                continue
+            keys.update(record_keys)
+            unique.append(record)
+        if removed:
+            _write_log(store_log_path(path), unique)
+            meta = _rebuild_meta(path, data_version + 1)
+            _load_fingerprints(path, meta, key_function)
+            _write_meta(path, meta)
+    return removed
+
+
+def _write_log(log_path, records):
+    """Reescribe el registro completo de forma que un corte no deje el archivo a medias."""
+    with PipelineMetrics.timed(PipelineMetrics.STAGE_STORE_WRITE):
+        data = _encode_records(records)
+        with atomic_file(log_path, 'wb') as file:
+            file.write(data)
+    PipelineMetrics.count(PipelineMetrics.COUNT_BYTES_WRITTEN, len(data))
+
+
+def compact_store(path):
+    """
+    Compacta el registro: lo reescribe sin líneas vacías ni líneas incompletas.
+    Devuelve el número de registros que quedan.
+    """
+    with store_lock(path):
+        return _compact(path)
+
+
+def _compact(path):
+    data_version = _load_meta(path)["data_version"]
+    records = read_records(path)
+    _write_log(store_log_path(path), records)
+    _rebuild_meta(path, data_version + 1)
+    return len(records)
+
+
+def rewrite_store(path, records):
+    """Sustituye todo el contenido del almacén por records en una única escritura."""
+    with store_lock(path):
+        data_version = _load_meta(path)["data_version"]
+        if os.path.exists(path):
+            os.replace(path, path + BACKUP_EXTENSION)
+        _write_log(store_log_path(path), records)
+        _rebuild_meta(path, data_version + 1)
+    return len(records)
+
+
+def migrate_store(path):
+    """
+    Migración única del antiguo array JSON ('x.json') al registro JSON Lines ('x.jsonl').
+    El archivo original se conserva como copia de seguridad ('x.json.bak').
+    Devuelve el número de registros migrados.
+    """
+    with store_lock(path):
+        return _migrate_store(path)
+
+
+def _migrate_store(path):
+    log_path = store_log_path(path)
+    if os.path.exists(log_path) or not os.path.exists(path):
+        return 0
+    with open(path, 'r', encoding='utf-8') as file:
+        records = json.load(file)
+    _write_log(log_path, records)
+    os.replace(path, path + BACKUP_EXTENSION)
+    print(f"{path} migrado a {log_path} ({len(records)} registros)")
+    return len(records)
+
+
+def check_not_shadowed(json_path):
+    """
+    Lanza FileExistsError si ya hay un registro JSON Lines con el mismo nombre que el
+    array JSON que se va a escribir: los almacenes leen primero el registro, así que el
+    array quedaría oculto ('x.json' no se leería mientras exista 'x.jsonl').
+    """
+    log_path = store_log_path(json_path)
+    if os.path.exists(log_path):
+        raise FileExistsError(f"{log_path} ya existe y ocultaría {json_path}; elige otro nombre.")
+
+
+def read_sorted_records(path, key, reverse=False):
+    """
+    Devuelve los registros del almacén. Si es un registro JSON Lines (al que se añaden
+    lotes en cualquier orden, como los extractos de una cuenta) se ordenan con `key`,
+    de forma estable; un antiguo array JSON se devuelve en el orden en que se escribió.
+    """
+    records = read_records(path)
+    if os.path.exists(store_log_path(path)):
+        records.sort(key=key, reverse=reverse)
+    return records
+
+
+def export_json(path, json_path):
+    """
+    Exporta el almacén al antiguo formato de array JSON, por compatibilidad. json_path
+    no puede tener el nombre de un almacén (ver check_not_shadowed).
+    """
+    check_not_shadowed(json_path)
+    records = read_records(path)
+    with atomic_file(json_path) as file:
+        json.dump(records, file, indent=4, ensure_ascii=False)
+    return len(records)
+
+
+if __name__ == "__main__":
+    # Migración única de los almacenes existentes
+    for store in ('mercadona_tickets.json', 'lidl_tickets.json', 'tickets.json'):
+        migrate_store(store)
@@ -0,0 +1,7 @@
+"""
+Benchmarks de TicketAnalyzer. Los scripts bench_*.py miden una pieza concreta; run.py
+ejecuta todos los puntos de entrada sobre datos sintéticos (synthetic.py) y escribe los
+resultados en JSON para poder compararlos entre versiones:
+
+    python -m benchmarks.run --escala 100k --salida resultados.json
+"""
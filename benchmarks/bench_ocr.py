@@ -0,0 +1,55 @@
+"""
+Mide el rendimiento (tickets por segundo) de cada motor de OCR sobre un lote de
+tickets sintéticos ya preprocesados. Los motores que no estén disponibles en la
+máquina (por ejemplo, tesserocr sin instalar) se omiten.
+
+Uso: python benchmarks/bench_ocr.py [número de tickets]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import OCREngine
+from benchmarks.synthetic import render_receipt
+
+TESSERACT_CONFIG = '--psm 6'
+
+RECEIPT_LINES = [
+    "MERCADONA, S.A. A-46103834",
+    "14/03/2024 18:35 OP: 123456",
+    "Descripción P. Unit Importe",
+    "1 LECHE ENTERA 0,95",
+    "2 PAN BARRA 1,20",
+    "1 TOMATE PERA 1,85",
+    "3 YOGUR NATURAL 1,35",
+    "TOTAL (€) 5,35",
+]
+
+
+def receipt_lines(index):
+    return [line.replace("123456", f"{index:06d}") for line in RECEIPT_LINES]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    images = [render_receipt(receipt_lines(index)) for index in range(count)]
+
+    print(f"{'motor':>12} {'tickets/s':>10} {'total (s)':>10}")
+    for name in OCREngine.ENGINES:
+        try:
+            engine = OCREngine.create_engine(name, TESSERACT_CONFIG)
+            engine.image_to_string(images[0])  # calentamiento
+        except Exception as e:
+            print(f"{name:>12} {'no disponible':>10} ({e})")
+            continue
+        start = time.perf_counter()
+        engine.images_to_strings(images)
+        elapsed = time.perf_counter() - start
+        engine.close()
+        print(f"{name:>12} {count / elapsed:>10.2f} {elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Microbenchmark del análisis de tickets: líneas por segundo del analizador original
+(varias pasadas, expresiones sin precompilar y un print por línea) frente al
+analizador de una sola pasada de TicketParser, sobre un corpus de textos de tickets.
+
+Uso: python benchmarks/bench_parser.py [número de tickets]
+"""
+import contextlib
+import io
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import TicketParser
+from benchmarks.synthetic import build_corpus
+
+# --- Analizador original, tal como estaba en TicketAnalyzer antes del analizador único ---
+
+def legacy_extract_total_amount(extracted_text):
+    total_pattern = re.compile(r'total\s*[:\s]*\n?\s*\€?\$?\d+[.,]?\d*', re.IGNORECASE)
+    match = total_pattern.search(extracted_text)
+    if match:
+        return re.search(r'\€?\$?\d+[.,]?\d*', match.group()).group()
+    return "No encontrado"
+
+
+def legacy_extract_store_name(extracted_text):
+    for line in extracted_text.split('\n'):
+        if re.match(r'[A-Z]{2,}', line):
+            return line.strip()
+    return "No encontrado"
+
+
+def legacy_parse_line(line):
+    line = re.sub(r'^(\d)(\d*)\s*(.*)\s+([\d,.]+)$', r'\1 \2 \3 \4', line)
+    match = re.match(r'^(\d+)\s+(.*)\s+([\d,.]+)$', line)
+    print(line)
+    if match:
+        try:
+            cantidad = int(match.group(1))
+            descripcion = match.group(2).strip()
+            precio_unitario = float(match.group(3).replace(',', '.')) / cantidad
+            return {"descripcion": descripcion, "cantidad": cantidad, "precio_unitario": precio_unitario}
+        except ValueError as e:
+            print(f"Error al procesar la línea: {line}. Error: {e}")
+            return None
+    print(f"No se pudo hacer match con la línea: {line}")
+    return None
+
+
+def legacy_mercadona(extracted_text):
+    items = []
+    precio_total = 0.0
+    match = re.compile(r'\d{2}/\d{2}/\d{4} \d{2}:\d{2}').search(extracted_text)
+    fecha_compra = match.group() if match else "Fecha no encontrada"
+    start_reading_items = False
+    for line in extracted_text.split('\n'):
+        if "Descripción P. Unit Importe" in line:
+            start_reading_items = True
+            continue
+        if start_reading_items:
+            if line.startswith("TOTAL"):
+                break
+            item = legacy_parse_line(line)
+            if item:
+                precio_total += item["cantidad"] * item["precio_unitario"]
+                items.append(item)
+    return fecha_compra, items, round(precio_total, 2)
+
+
+def legacy_lidl(extracted_text):
+    items = []
+    precio_total = 0.0
+    match = re.compile(r'\d{2}/\d{2}/\d{4} \d{2}:\d{2}').search(extracted_text)
+    fecha_compra = match.group() if match else "Fecha no encontrada"
+    for line in extracted_text.split('\n'):
+        if "Total" in line:
+            break
+        match = re.match(r'(.+?)\s+(\d+[.,]\d{2})', line)
+        if match:
+            precio_unitario = float(match.group(2).replace(',', '.'))
+            items.append({"descripcion": match.group(1).strip(), "cantidad": 1, "precio_unitario": precio_unitario})
+            precio_total += precio_unitario
+    return fecha_compra, items, round(precio_total, 2)
+
+
+def legacy_parse(extracted_text):
+    store_name = legacy_extract_store_name(extracted_text)
+    total_amount = legacy_extract_total_amount(extracted_text)
+    result = None
+    if "mercadona" in store_name.lower():
+        result = legacy_mercadona(extracted_text)
+    if "lidl" in store_name.lower():
+        result = legacy_lidl(extracted_text)
+    return store_name, total_amount, result
+
+
+def single_pass_parse(extracted_text):
+    ticket = TicketParser.parse_ticket(extracted_text)
+    result = None
+    if ticket.grammar:
+        result = (ticket.fecha_compra, ticket.items, round(ticket.precio_total, 2))
+    return ticket.store_name, ticket.total_amount, result
+
+
+def time_parser(parse, corpus):
+    # La salida por consola forma parte del coste del analizador original
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        results = [parse(text) for text in corpus]
+        elapsed = time.perf_counter() - start
+    return elapsed, results
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    corpus = build_corpus(count)
+    line_count = sum(text.count('\n') + 1 for text in corpus)
+
+    legacy_seconds, legacy_results = time_parser(legacy_parse, corpus)
+    new_seconds, new_results = time_parser(single_pass_parse, corpus)
+    assert legacy_results == new_results, "Los dos analizadores no producen el mismo resultado"
+
+    print(f"{count} tickets, {line_count} líneas")
+    print(f"{'analizador':>14} {'líneas/s':>12} {'total (s)':>10}")
+    print(f"{'original':>14} {line_count / legacy_seconds:>12.0f} {legacy_seconds:>10.3f}")
+    print(f"{'una pasada':>14} {line_count / new_seconds:>12.0f} {new_seconds:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compara el coste de añadir un ticket según el tamaño del historial:
+el antiguo patrón leer-modificar-reescribir del array JSON frente al
+registro JSON Lines de TicketStore, ticket a ticket (un fsync por ticket)
+y por lotes con StoreWriter (un fsync por lote).
+
+Uso: python benchmarks/bench_store.py
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import TicketStore
+
+HISTORY_SIZES = (100, 1000, 10000, 50000)
+APPENDS = 20
+BATCH_SIZE = 10
+
+
+def make_ticket(ticket_id):
+    return {
+        "id": ticket_id,
+        "fecha_compra": "01/03/2024 18:30",
+        "items": [
+            {"descripcion": "LECHE ENTERA", "cantidad": 2, "precio_unitario": 0.95},
+            {"descripcion": "PAN BARRA", "cantidad": 1, "precio_unitario": 0.6},
+            {"descripcion": "TOMATE PERA", "cantidad": 1, "precio_unitario": 1.85},
+        ],
+        "precio_total": 4.35,
+    }
+
+
+def legacy_append(path, record):
+    """Réplica del antiguo guardado: carga todo el array, añade y lo vuelca entero."""
+    if os.path.exists(path):
+        with open(path, 'r+', encoding='utf-8') as file:
+            file_data = json.load(file)
+            file_data.append(record)
+            file.seek(0)
+            json.dump(file_data, file, indent=4, ensure_ascii=False)
+    else:
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump([record], file, indent=4, ensure_ascii=False)
+
+
+def time_appends(append, path, history_size):
+    start = time.perf_counter()
+    for offset in range(APPENDS):
+        append(path, make_ticket(history_size + offset + 1))
+    return (time.perf_counter() - start) / APPENDS * 1000
+
+
+WRITERS = {}
+
+
+def batched_append(path, record):
+    """Añade a través de un StoreWriter compartido por ruta (se vacía cada BATCH_SIZE registros)."""
+    writer = WRITERS.setdefault(path, TicketStore.StoreWriter(BATCH_SIZE))
+    writer.add(path, record)
+
+
+def main():
+    print(f"{'historial':>10} {'array JSON (ms)':>16} {'JSON Lines (ms)':>16} {'por lotes (ms)':>16}")
+    for history_size in HISTORY_SIZES:
+        history = [make_ticket(i + 1) for i in range(history_size)]
+        with tempfile.TemporaryDirectory() as tmp:
+            legacy_path = os.path.join(tmp, 'legacy.json')
+            with open(legacy_path, 'w', encoding='utf-8') as file:
+                json.dump(history, file, indent=4, ensure_ascii=False)
+            legacy_ms = time_appends(legacy_append, legacy_path, history_size)
+
+            store_path = os.path.join(tmp, 'store.json')
+            TicketStore.append_records(store_path, history)
+            log_ms = time_appends(TicketStore.append_record, store_path, history_size)
+            batch_ms = time_appends(batched_append, store_path, history_size)
+        print(f"{history_size:>10} {legacy_ms:>16.3f} {log_ms:>16.3f} {batch_ms:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,705 @@
+"""
+Ejecuta los benchmarks de importación y de análisis sobre datos sintéticos, sin
+interfaz gráfica ni red, y escribe los resultados en JSON.
+
+Cada caso mide un punto de entrada existente (parse_line, process_mercadona_ticket,
+extraer_transacciones, most_purchased_items, calculate_monthly_balance...) con la
+escala de datos elegida y guarda el mejor tiempo de varias repeticiones. Los casos que
+no pueden ejecutarse en la máquina (por ejemplo, el OCR sin tesseract) se anotan con
+su error y no detienen el resto.
+
+Uso: python -m benchmarks.run [--escala 1k|100k|1m|N] [--casos a,b] [--repeticiones 3]
+                              [--salida resultados.json]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import synthetic
+
+# Límites para los casos cuyo coste por elemento es mucho mayor que el del resto
+BANK_PDF_MAX_TRANSACTIONS = 20000
+OCR_MAX_IMAGES = 20
+# Movimientos del extracto que se fusiona con la cuenta (la mitad ya están en ella)
+MERGE_STATEMENT_SIZE = 1000
+# Consultas por rango de fechas y tickets nuevos de los casos del índice por fecha
+DATE_RANGE_QUERIES = 1000
+DATE_INDEX_APPEND = 1000
+# Filas de los casos de la tabla virtualizada (independiente de la escala)
+TABLE_ROWS = 100000
+
+CASES = {}
+
+
+def case(name):
+    """Registra un caso. La función recibe el contexto y devuelve (preparar, medir)."""
+    def register(function):
+        CASES[name] = function
+        return function
+    return register
+
+
+class Context:
+    """Datos sintéticos compartidos por los casos; se generan la primera vez que se piden."""
+
+    def __init__(self, scale, seed, directory):
+        self.scale = scale
+        self.seed = seed
+        self.directory = directory
+        self._cache = {}
+
+    def get(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def ticket_store(self):
+        def build():
+            path = self.path('bench_mercadona_tickets.json')
+            synthetic.write_ticket_store(path, self.scale, self.seed)
+            return path
+        return self.get('ticket_store', build)
+
+    def tickets(self):
+        import AnalizadorDatos
+        return self.get('tickets', lambda: AnalizadorDatos.load_tickets_data(self.ticket_store()))
+
+    def bank_json(self):
+        def build():
+            path = self.path('bench_cuenta.json')
+            synthetic.write_bank_json(path, self.scale, self.seed)
+            return path
+        return self.get('bank_json', build)
+
+    def bank_data(self):
+        import AnalizadorCB
+        return self.get('bank_data', lambda: AnalizadorCB.read_bank_data(self.bank_json()))
+
+    def ticket_queries(self):
+        import SQLiteStore
+        return self.get('ticket_queries', lambda: SQLiteStore.load_tickets(
+            'mercadona', self.ticket_store(), self.path('bench.db')))
+
+    def dated_tickets(self):
+        # Para el índice por fecha la escala es el número de tickets (de un artículo cada uno)
+        import TicketModel
+        return self.get('dated_tickets', lambda: TicketModel.Tickets(
+            synthetic.iter_ticket_records(self.scale, self.seed, items_per_ticket=1)))
+
+    def table_rows(self):
+        return self.get('table_rows', lambda: synthetic.bank_transactions(TABLE_ROWS, self.seed))
+
+    def tk_root(self):
+        # Necesita pantalla: sin ella, los casos que la usan se anotan con el error de Tcl
+        def build():
+            import tkinter as tk
+            root = tk.Tk()
+            root.withdraw()
+            return root
+        return self.get('tk_root', build)
+
+    def bank_queries(self):
+        import SQLiteStore
+        return self.get('bank_queries', lambda: SQLiteStore.load_account(
+            'cuenta', self.bank_json(), self.path('bench.db')))
+
+
+def _first_ticket_month(tickets):
+    return tickets[0].fecha.month, tickets[0].fecha.year
+
+
+# --- Importación ---
+
+@case('parse_line')
+def bench_parse_line(context):
+    import TicketAnalyzer
+    lines = context.get('item_lines', lambda: synthetic.item_lines(context.scale, context.seed))
+
+    def run():
+        for line in lines:
+            TicketAnalyzer.parse_line(line)
+        return len(lines)
+    return None, run
+
+
+@case('parse_ticket')
+def bench_parse_ticket(context):
+    import TicketParser
+    texts = context.get('mercadona_texts', lambda: synthetic.mercadona_corpus(context.scale, context.seed))
+
+    def run():
+        for text in texts:
+            TicketParser.parse_ticket(text)
+        return len(texts)
+    return None, run
+
+
+@case('process_mercadona_ticket')
+def bench_process_mercadona_ticket(context):
+    import TicketAnalyzer
+    texts = context.get('mercadona_texts', lambda: synthetic.mercadona_corpus(context.scale, context.seed))
+    runs = []
+
+    def prepare():
+        # Cada repetición escribe en un almacén nuevo, para no medir duplicados
+        runs.append(None)
+        directory = context.path(f'process_{len(runs)}')
+        os.makedirs(directory)
+        os.chdir(directory)
+
+    def run():
+        for text in texts:
+            TicketAnalyzer.process_mercadona_ticket(text)
+        os.chdir(context.directory)
+        return len(texts)
+    return prepare, run
+
+
+@case('extraer_transacciones')
+def bench_extraer_transacciones(context):
+    import TicketAnalyzer
+    count = min(context.scale, BANK_PDF_MAX_TRANSACTIONS)
+
+    def build():
+        path = context.path('bench_extracto.pdf')
+        synthetic.write_bank_statement_pdf(path, count, context.seed)
+        return path
+    pdf_path = context.get('bank_pdf', build)
+
+    def run():
+        return len(TicketAnalyzer.extraer_transacciones(pdf_path))
+    return None, run
+
+
+@case('fusionar_extracto')
+def bench_merge_statement(context):
+    import TicketAnalyzer
+    import TicketStore
+    transactions = synthetic.bank_transactions(context.scale + MERGE_STATEMENT_SIZE // 2, context.seed)
+    statement = transactions[context.scale - MERGE_STATEMENT_SIZE // 2:]
+
+    def build():
+        path = context.path('bench_cuenta_historial.json')
+        TicketAnalyzer.merge_transactions(transactions[:context.scale], path)
+        return path
+    account = context.get('bank_account', build)
+    target = {"runs": 0}
+
+    def prepare():
+        # Cada repetición fusiona sobre una copia nueva del historial (con su índice),
+        # como lo haría un proceso recién arrancado
+        target["runs"] += 1
+        target["path"] = context.path(f"bench_cuenta_{target['runs']}.json")
+        for path_function in (TicketStore.store_log_path, TicketStore.store_meta_path, TicketStore.store_index_path):
+            shutil.copyfile(path_function(account), path_function(target["path"]))
+
+    def run():
+        TicketAnalyzer.merge_transactions([dict(transaction) for transaction in statement], target["path"])
+        return len(statement)
+    return prepare, run
+
+
+@case('extract_text_from_image')
+def bench_extract_text_from_image(context):
+    import TicketAnalyzer
+    count = min(context.scale, OCR_MAX_IMAGES)
+    paths = context.get('receipt_images', lambda: synthetic.write_receipt_images(
+        context.path('imagenes'), count, context.seed))
+
+    def run():
+        for path in paths:
+            TicketAnalyzer.extract_text_from_image(path, use_cache=False)
+        return len(paths)
+    return None, run
+
+
+# --- Análisis de tickets (AnalizadorDatos) ---
+
+@case('load_tickets_data')
+def bench_load_tickets_data(context):
+    import AnalizadorDatos
+    path = context.ticket_store()
+    return None, lambda: len(AnalizadorDatos.load_tickets_data(path))
+
+
+@case('calculate_total_expense')
+def bench_total_expense(context):
+    import AnalizadorDatos
+    tickets = context.tickets()
+
+    def run():
+        AnalizadorDatos.total_expense(tickets)
+        return len(tickets)
+    return None, run
+
+
+@case('most_purchased_items')
+def bench_most_purchased_items(context):
+    import AnalizadorDatos
+    tickets = context.tickets()
+
+    def run():
+        AnalizadorDatos.count_purchased_items(tickets)
+        return len(tickets)
+    return None, run
+
+
+@case('top_purchased_items')
+def bench_top_purchased_items(context):
+    """Primera página (100 productos) del ranking de más comprados."""
+    import AnalizadorDatos
+    tickets = context.tickets()
+
+    def run():
+        AnalizadorDatos.top_purchased_items(tickets, AnalizadorDatos.MOST_PURCHASED_PAGE_SIZE)
+        return len(tickets)
+    return None, run
+
+
+@case('get_unique_products')
+def bench_get_unique_products(context):
+    import AnalizadorDatos
+    tickets = context.tickets()
+
+    def run():
+        AnalizadorDatos.get_unique_products(tickets)
+        return len(tickets)
+    return None, run
+
+
+@case('calculate_expense_in_date_range')
+def bench_expense_in_date_range(context):
+    import AnalizadorDatos
+    tickets = context.tickets()
+
+    def run():
+        AnalizadorDatos.expense_in_date_range(tickets, date(2023, 1, 1), date(2023, 6, 30))
+        return len(tickets)
+    return None, run
+
+
+@case('date_index_build')
+def bench_date_index_build(context):
+    """Construcción del índice por fecha; n es el número de tickets (la escala)."""
+    import TicketModel
+    tickets = context.dated_tickets()
+    return None, lambda: len(TicketModel.DateIndex(tickets.tickets).dates)
+
+
+@case('date_index_query')
+def bench_date_index_query(context):
+    """Gasto de DATE_RANGE_QUERIES rangos de fechas aleatorios sobre el índice ya construido."""
+    import random
+    index = context.dated_tickets().date_index()
+    rng = random.Random(context.seed)
+    ranges = []
+    for _ in range(DATE_RANGE_QUERIES):
+        start = datetime(rng.choice((2022, 2023, 2024)), rng.randint(1, 12), rng.randint(1, 28))
+        ranges.append((start, start + timedelta(days=rng.randint(1, 365))))
+
+    def run():
+        for start, end in ranges:
+            index.expense(start, end)
+        return len(ranges)
+    return None, run
+
+
+@case('date_index_append')
+def bench_date_index_append(context):
+    """Añadir DATE_INDEX_APPEND tickets más recientes que los indexados al índice por fecha."""
+    import TicketModel
+    base = context.dated_tickets()
+    new = TicketModel.Tickets(
+        dict(record, fecha_compra=f"{1 + day % 28:02d}/01/2025 10:00")
+        for day, record in enumerate(synthetic.iter_ticket_records(DATE_INDEX_APPEND, context.seed + 1, items_per_ticket=1))
+    )
+    state = {}
+
+    def prepare():
+        state["tickets"] = list(base.tickets)
+        state["index"] = TicketModel.DateIndex(state["tickets"])
+
+    def run():
+        start = len(state["tickets"])
+        state["tickets"].extend(new.tickets)
+        state["index"].add(start)
+        return len(new)
+    return prepare, run
+
+
+@case('monthly_cube_build')
+def bench_monthly_cube_build(context):
+    """Construcción del cubo por (año, mes, producto) sobre los tickets ya cargados."""
+    import TicketModel
+    tickets = context.tickets()
+
+    def run():
+        TicketModel.MonthlyCube(tickets.tickets)
+        return len(tickets)
+    return None, run
+
+
+@case('product_index_build')
+def bench_product_index_build(context):
+    """Construcción del índice invertido de productos sobre los tickets ya cargados."""
+    import TicketModel
+    tickets = context.tickets()
+
+    def run():
+        TicketModel.ProductIndex(tickets.tickets)
+        return len(tickets)
+    return None, run
+
+
+@case('columnar_build')
+def bench_columnar_build(context):
+    """Construcción de la tabla columnar de NumPy (TicketModel.ItemColumns)."""
+    import TicketModel
+    tickets = context.tickets()
+
+    def run():
+        TicketModel.ItemColumns(tickets.tickets, tickets.products)
+        return len(tickets)
+    return None, run
+
+
+@case('columnar_total_expense')
+def bench_columnar_total_expense(context):
+    columns = context.tickets().columns()
+
+    def run():
+        columns.total_expense()
+        return columns.length
+    return None, run
+
+
+@case('columnar_most_purchased_items')
+def bench_columnar_most_purchased_items(context):
+    columns = context.tickets().columns()
+
+    def run():
+        columns.product_totals()
+        return columns.length
+    return None, run
+
+
+@case('columnar_monthly_ticket')
+def bench_columnar_monthly_ticket(context):
+    columns = context.tickets().columns()
+    month, year = _first_ticket_month(context.tickets())
+
+    def run():
+        columns.monthly(year, month)
+        return columns.length
+    return None, run
+
+
+@case('find_product_purchases')
+def bench_product_purchases(context):
+    import AnalizadorDatos
+    tickets = context.tickets()
+    product = tickets[0].items[0].descripcion
+
+    def run():
+        AnalizadorDatos.product_purchases(tickets, product)
+        return len(tickets)
+    return None, run
+
+
+@case('calculate_product_in_month')
+def bench_product_in_month(context):
+    import AnalizadorDatos
+    tickets = context.tickets()
+    month, year = _first_ticket_month(tickets)
+    product = tickets[0].items[0].descripcion
+
+    def run():
+        AnalizadorDatos.product_in_month(tickets, month, year, product)
+        return len(tickets)
+    return None, run
+
+
+@case('calculate_monthly_ticket')
+def bench_monthly_ticket(context):
+    import AnalizadorDatos
+    tickets = context.tickets()
+    month, year = _first_ticket_month(tickets)
+
+    def run():
+        AnalizadorDatos.monthly_ticket(tickets, month, year)
+        return len(tickets)
+    return None, run
+
+
+# --- Análisis de cuentas (AnalizadorCB) ---
+
+@case('load_bank_data')
+def bench_load_bank_data(context):
+    import AnalizadorCB
+    path = context.bank_json()
+    return None, lambda: len(AnalizadorCB.read_bank_data(path))
+
+
+@case('calculate_monthly_balance')
+def bench_monthly_balance(context):
+    import AnalizadorCB
+    transactions = context.bank_data()
+
+    def run():
+        AnalizadorCB.monthly_balance(transactions, 3, 2023)
+        return len(transactions)
+    return None, run
+
+
+@case('calculate_annual_balance')
+def bench_annual_balance(context):
+    import AnalizadorCB
+    transactions = context.bank_data()
+
+    def run():
+        AnalizadorCB.annual_balance(transactions, 2023)
+        return len(transactions)
+    return None, run
+
+
+@case('filter_transactions_by_concept')
+def bench_transactions_by_concept(context):
+    import AnalizadorCB
+    transactions = context.bank_data()
+
+    def run():
+        AnalizadorCB.transactions_by_concept(transactions, 'mercadona')
+        return len(transactions)
+    return None, run
+
+
+# --- Vistas de resultados (ResultTable/TableModel), con TABLE_ROWS transacciones ---
+# Tiempo hasta el primer pintado: sin pantalla se mide el modelo de la tabla y el texto de
+# las filas visibles; con pantalla, la ventana completa hasta que Tk la dibuja, frente a la
+# vista anterior (cuatro inserciones en un ScrolledText por transacción).
+
+@case('tabla_virtual_primer_pintado')
+def bench_virtual_table_first_paint(context):
+    import TableModel
+    rows = context.table_rows()
+
+    def run():
+        model = TableModel.TableModel(TableModel.transaction_columns(), rows)
+        model.window(0, TableModel.VISIBLE_ROWS)
+        return len(rows)
+    return None, run
+
+
+@case('tabla_virtual_ordenar')
+def bench_virtual_table_sort(context):
+    import TableModel
+    model = TableModel.TableModel(TableModel.transaction_columns(), context.table_rows())
+
+    def run():
+        # Importe (clave numérica) y fecha
+        model.sort(2)
+        model.sort(0)
+        model.window(0, TableModel.VISIBLE_ROWS)
+        return len(model)
+    return None, run
+
+
+def _window_case(context, build):
+    import tkinter as tk
+    root = context.tk_root()
+    windows = []
+
+    def prepare():
+        while windows:
+            windows.pop().destroy()
+
+    def run():
+        window = tk.Toplevel(root)
+        windows.append(window)
+        build(window)
+        window.update()
+        return TABLE_ROWS
+    return prepare, run
+
+
+@case('tabla_virtual_tk')
+def bench_virtual_table_tk(context):
+    import tkinter as tk
+    import ResultTable
+    import TableModel
+    rows = context.table_rows()
+
+    def build(window):
+        ResultTable.VirtualTable(window, TableModel.transaction_columns(), rows).pack(fill=tk.BOTH, expand=True)
+    return _window_case(context, build)
+
+
+@case('scrolledtext_tk')
+def bench_scrolledtext_tk(context):
+    import tkinter as tk
+    from tkinter.scrolledtext import ScrolledText
+    rows = context.table_rows()
+
+    def build(window):
+        scrolled_text = ScrolledText(window, wrap=tk.WORD, width=60, height=20)
+        scrolled_text.pack()
+        for item in rows:
+            scrolled_text.insert(tk.END, f"Fecha: {item['fecha_oper']}\n")
+            scrolled_text.insert(tk.END, f"Concepto: {item['concepto']}\n")
+            scrolled_text.insert(tk.END, f"Importe: {item['importe']} €\n")
+            scrolled_text.insert(tk.END, f"Saldo: {item['saldo']} €\n\n")
+        scrolled_text.config(state=tk.DISABLED)
+    return _window_case(context, build)
+
+
+# --- Mismas consultas servidas desde SQLite (SQLiteStore) ---
+
+@case('sqlite_import_tickets')
+def bench_sqlite_import(context):
+    import SQLiteStore
+    path = context.ticket_store()
+    database = context.path('bench_import.db')
+    return None, lambda: SQLiteStore.import_ticket_store('mercadona', path, database)
+
+
+@case('sqlite_calculate_expense_in_date_range')
+def bench_sqlite_expense_in_date_range(context):
+    import AnalizadorDatos
+    tickets = context.ticket_queries()
+
+    def run():
+        AnalizadorDatos.expense_in_date_range(tickets, date(2023, 1, 1), date(2023, 6, 30))
+        return len(tickets)
+    return None, run
+
+
+@case('sqlite_find_product_purchases')
+def bench_sqlite_product_purchases(context):
+    import AnalizadorDatos
+    tickets = context.ticket_queries()
+    product = context.tickets()[0].items[0].descripcion
+
+    def run():
+        AnalizadorDatos.product_purchases(tickets, product)
+        return len(tickets)
+    return None, run
+
+
+@case('sqlite_calculate_monthly_ticket')
+def bench_sqlite_monthly_ticket(context):
+    import AnalizadorDatos
+    tickets = context.ticket_queries()
+    month, year = _first_ticket_month(context.tickets())
+
+    def run():
+        AnalizadorDatos.monthly_ticket(tickets, month, year)
+        return len(tickets)
+    return None, run
+
+
+@case('sqlite_calculate_monthly_balance')
+def bench_sqlite_monthly_balance(context):
+    import AnalizadorCB
+    transactions = context.bank_queries()
+
+    def run():
+        AnalizadorCB.monthly_balance(transactions, 3, 2023)
+        return len(transactions)
+    return None, run
+
+
+def measure(name, context, repetitions):
+    """Ejecuta un caso `repetitions` veces y devuelve su resultado (mejor tiempo)."""
+    try:
+        prepare, run = CASES[name](context)
+        best = None
+        for _ in range(repetitions):
+            if prepare:
+                prepare()
+            start = time.perf_counter()
+            count = run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    except Exception as e:
+        os.chdir(context.directory)
+        return {"caso": name, "error": f"{type(e).__name__}: {e}"}
+    return {
+        "caso": name,
+        "n": count,
+        "segundos": round(best, 6),
+        "por_segundo": round(count / best, 1) if best else None,
+        "repeticiones": repetitions,
+    }
+
+
+def parse_scale(value):
+    return synthetic.SCALES[value.lower()] if value.lower() in synthetic.SCALES else int(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de TicketAnalyzer sobre datos sintéticos.")
+    parser.add_argument('--escala', default='1k', help="1k, 100k, 1m o un número de artículos")
+    parser.add_argument('--casos', help="casos separados por comas (por defecto, todos)")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--semilla', type=int, default=1234)
+    parser.add_argument('--salida', help="archivo JSON de resultados (por defecto, la salida estándar)")
+    args = parser.parse_args(argv)
+
+    names = args.casos.split(',') if args.casos else list(CASES)
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        parser.error(f"casos desconocidos: {', '.join(unknown)}")
+    output = os.path.abspath(args.salida) if args.salida else None
+    scale = parse_scale(args.escala)
+
+    results = []
+    original_directory = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='ticket_bench_') as directory:
+        # Los almacenes, la caché de OCR y las métricas se crean en el directorio temporal
+        os.chdir(directory)
+        try:
+            context = Context(scale, args.semilla, directory)
+            for name in names:
+                print(f"{name}...", file=sys.stderr)
+                stdout = sys.stdout
+                # Los mensajes de los puntos de entrada no forman parte de los resultados
+                sys.stdout = open(os.devnull, 'w')
+                try:
+                    results.append(measure(name, context, args.repeticiones))
+                finally:
+                    sys.stdout.close()
+                    sys.stdout = stdout
+        finally:
+            os.chdir(original_directory)
+
+    report = {
+        "fecha": datetime.now().isoformat(timespec='seconds'),
+        "escala": args.escala,
+        "elementos": scale,
+        "semilla": args.semilla,
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "resultados": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=4)
+    if output:
+        with open(output, 'w', encoding='utf-8') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
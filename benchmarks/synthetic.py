@@ -0,0 +1,250 @@
+"""
+Generadores de datos sintéticos para los benchmarks: textos de tickets de Mercadona y
+Lidl, imágenes de tickets, extractos bancarios en PDF y almacenes de tickets y de
+transacciones con el número de artículos que se pida. Todo es determinista a partir
+de la semilla y no necesita red ni interfaz gráfica.
+"""
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import TicketStore
+
+# Escalas predefinidas (número de artículos de tickets o de transacciones)
+SCALES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+
+PRODUCTS = [
+    "LECHE ENTERA", "PAN BARRA", "TOMATE PERA", "YOGUR NATURAL", "ACEITE OLIVA",
+    "HUEVOS L", "PLATANO", "MANZANA GOLDEN", "ARROZ REDONDO", "CAFE MOLIDO",
+    "QUESO LONCHAS", "JAMON COCIDO", "AGUA MINERAL", "PAPEL HIGIENICO", "DETERGENTE",
+]
+
+# Variantes para tener un catálogo de productos de tamaño realista en los almacenes
+VARIANTS = ["", " HACENDADO", " BIO", " PACK 6", " 1L", " 500G", " FAMILIAR", " SIN LACTOSA"]
+
+CONCEPTS = [
+    "COMPRA TARJETA MERCADONA", "COMPRA TARJETA LIDL", "NOMINA", "RECIBO LUZ",
+    "RECIBO AGUA", "TRANSFERENCIA RECIBIDA", "BIZUM ENVIADO", "CAJERO RETIRADA",
+    "RECIBO TELEFONO", "SUSCRIPCION STREAMING",
+]
+
+BANK_STATEMENT_HEADER = "FECHA OPER CONCEPTO FECHA VALOR IMPORTE SALDO"
+BANK_LINES_PER_PAGE = 50
+
+
+def random_date(rng, years=(2022, 2023, 2024)):
+    return f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.choice(years)}"
+
+
+def random_datetime(rng):
+    return f"{random_date(rng)} {rng.randint(9, 21):02d}:{rng.randint(0, 59):02d}"
+
+
+def mercadona_text(rng, item_count=None):
+    lines = [
+        "MERCADONA, S.A. A-46103834",
+        "AVDA. DE LA CONSTITUCION 12",
+        "46001 VALENCIA",
+        f"{random_datetime(rng)} OP: {rng.randint(100000, 999999)}",
+        "FACTURA SIMPLIFICADA: 2831-017-123456",
+        "Descripción P. Unit Importe",
+    ]
+    total = 0.0
+    for _ in range(item_count or rng.randint(5, 30)):
+        quantity = rng.randint(1, 4)
+        amount = round(rng.uniform(0.5, 9.0) * quantity, 2)
+        total += amount
+        lines.append(f"{quantity} {rng.choice(PRODUCTS)} {amount:.2f}".replace('.', ','))
+    lines += [f"TOTAL (€) {total:.2f}".replace('.', ','), "TARJETA BANCARIA", "IVA BASE IMPONIBLE (€) CUOTA (€)"]
+    return "\n".join(lines)
+
+
+def lidl_text(rng, item_count=None):
+    lines = [
+        "LIDL SUPERMERCADOS S.A.U.",
+        "C/ MAYOR 45",
+        random_datetime(rng),
+        "EUR",
+    ]
+    total = 0.0
+    for _ in range(item_count or rng.randint(5, 30)):
+        price = round(rng.uniform(0.5, 9.0), 2)
+        total += price
+        lines.append(f"{rng.choice(PRODUCTS)} {price:.2f} A".replace('.', ','))
+    lines += [f"Total {total:.2f}".replace('.', ','), "Tarjeta"]
+    return "\n".join(lines)
+
+
+def build_corpus(count, seed=1234):
+    """Lista de textos de tickets, alternando Mercadona y Lidl."""
+    rng = random.Random(seed)
+    return [mercadona_text(rng) if index % 2 == 0 else lidl_text(rng) for index in range(count)]
+
+
+def mercadona_corpus(item_count, seed=1234):
+    """Textos de tickets de Mercadona que suman en total item_count artículos."""
+    rng = random.Random(seed)
+    texts = []
+    remaining = item_count
+    while remaining > 0:
+        count = min(remaining, rng.randint(5, 30))
+        texts.append(mercadona_text(rng, count))
+        remaining -= count
+    return texts
+
+
+def item_lines(count, seed=1234):
+    """Líneas de artículos de Mercadona tal como llegan del OCR (cantidad pegada a la descripción)."""
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        quantity = rng.randint(1, 4)
+        amount = round(rng.uniform(0.5, 9.0) * quantity, 2)
+        lines.append(f"{quantity}{rng.choice(PRODUCTS)} {amount:.2f}".replace('.', ','))
+    return lines
+
+
+def render_receipt(lines, scale=2, threshold=150):
+    """Dibuja un ticket en blanco y negro, como el que deja preprocess_image (array de numpy)."""
+    import numpy as np
+    from PIL import Image, ImageDraw
+
+    image = Image.new('L', (600, 30 * len(lines) + 40), 255)
+    draw = ImageDraw.Draw(image)
+    for line_number, line in enumerate(lines):
+        draw.text((20, 20 + 30 * line_number), line, fill=0)
+    image = image.resize((image.width * scale, image.height * scale))
+    return np.array(image.point(lambda value: 255 if value > threshold else 0))
+
+
+def write_receipt_images(directory, count, seed=1234):
+    """Guarda count tickets de Mercadona como imágenes PNG y devuelve sus rutas."""
+    from PIL import Image
+
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for index in range(count):
+        path = os.path.join(directory, f"ticket_{index:06d}.png")
+        Image.fromarray(render_receipt(mercadona_text(rng).split('\n'))).save(path)
+        paths.append(path)
+    return paths
+
+
+def iter_ticket_records(item_count, seed=1234, items_per_ticket=None):
+    """
+    Genera registros de tickets (como los de mercadona_tickets.json) con item_count
+    artículos en total: entre 5 y 30 por ticket, o items_per_ticket si se indica.
+    """
+    rng = random.Random(seed)
+    catalogue = [product + variant for product in PRODUCTS for variant in VARIANTS]
+    ticket_id = 0
+    remaining = item_count
+    while remaining > 0:
+        items = []
+        for _ in range(min(remaining, items_per_ticket or rng.randint(5, 30))):
+            items.append({
+                "descripcion": rng.choice(catalogue),
+                "cantidad": rng.randint(1, 4),
+                "precio_unitario": round(rng.uniform(0.5, 9.0), 2)
+            })
+        remaining -= len(items)
+        ticket_id += 1
+        yield {
+            "id": ticket_id,
+            "fecha_compra": random_datetime(rng),
+            "items": items,
+            "precio_total": round(sum(item["cantidad"] * item["precio_unitario"] for item in items), 2)
+        }
+
+
+def ticket_records(item_count, seed=1234):
+    """Lista de registros de tickets con item_count artículos en total (ver iter_ticket_records)."""
+    return list(iter_ticket_records(item_count, seed))
+
+
+def write_ticket_store(path, item_count, seed=1234):
+    """Crea un almacén de tickets con item_count artículos. Devuelve el número de tickets."""
+    records = ticket_records(item_count, seed)
+    TicketStore.rewrite_store(path, records)
+    return len(records)
+
+
+def bank_transactions(count, seed=1234):
+    """Transacciones de un extracto, de la más reciente a la más antigua, con su saldo."""
+    rng = random.Random(seed)
+    transactions = []
+    saldo = 2500.0
+    for index in range(count):
+        importe = round(rng.uniform(-150.0, 60.0), 2)
+        saldo = round(saldo + importe, 2)
+        fecha = random_date(rng)
+        transactions.append({
+            "id": index + 1,
+            "fecha_oper": fecha,
+            "concepto": rng.choice(CONCEPTS),
+            "fecha_valor": fecha,
+            "importe": f"{importe:.2f}".replace('.', ','),
+            "saldo": f"{saldo:.2f}".replace('.', ',')
+        })
+    return transactions
+
+
+def write_bank_json(path, count, seed=1234):
+    """Guarda count transacciones en un JSON como el que genera la importación del extracto."""
+    with open(path, 'w') as file:
+        json.dump(bank_transactions(count, seed), file, indent=4)
+    return count
+
+
+def _pdf_string(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def write_pdf(path, pages):
+    """
+    Escribe un PDF mínimo con una capa de texto (Helvetica, una línea por elemento)
+    por cada página de `pages`, que es una lista de listas de líneas.
+    """
+    objects = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    pages_id = 2 * len(pages) + 2
+    page_ids = []
+    for lines in pages:
+        content = ("BT /F1 9 Tf 13 TL 30 810 Td "
+                   + " ".join(f"({_pdf_string(line)}) '" for line in lines) + " ET").encode('latin-1', 'replace')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 1 0 R >> >> /Contents %d 0 R >>" % (pages_id, len(objects)))
+        page_ids.append(len(objects))
+    objects.append(b"<< /Type /Pages /Kids [%s] /Count %d >>"
+                   % (b" ".join(b"%d 0 R" % page_id for page_id in page_ids), len(page_ids)))
+    objects.append(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    with open(path, 'wb') as file:
+        file.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(file.tell())
+            file.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref = file.tell()
+        file.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        file.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+        file.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                   % (len(objects) + 1, len(objects), xref))
+
+
+def write_bank_statement_pdf(path, count, seed=1234):
+    """Crea un extracto bancario en PDF con count movimientos. Devuelve las transacciones."""
+    transactions = bank_transactions(count, seed)
+    pages = []
+    for start in range(0, len(transactions), BANK_LINES_PER_PAGE):
+        lines = ["EXTRACTO DE CUENTA", BANK_STATEMENT_HEADER]
+        for transaction in transactions[start:start + BANK_LINES_PER_PAGE]:
+            lines.append(f"{transaction['fecha_oper']} {transaction['concepto']} {transaction['fecha_valor']} "
+                         f"{transaction['importe']} {transaction['saldo']}")
+        pages.append(lines)
+    write_pdf(path, pages or [["EXTRACTO DE CUENTA", BANK_STATEMENT_HEADER]])
+    return transactions
@@ -0,0 +1,94 @@
+"""
+Cálculos de referencia: los de AnalizadorDatos antes del modelo en memoria, recorriendo
+la lista de registros JSON en cada consulta y sin tkinter. Las pruebas comparan con
+ellos los resultados del modelo, los índices y la tabla columnar.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime
+
+
+def _dated(tickets_data):
+    for ticket in tickets_data:
+        date_str = ticket.get('fecha_compra', None)
+        if date_str:
+            try:
+                yield ticket, datetime.strptime(date_str, '%d/%m/%Y %H:%M')
+            except ValueError:
+                pass
+
+
+def total_expense(tickets_data):
+    return sum(ticket['precio_total'] for ticket in tickets_data)
+
+
+def count_purchased_items(tickets_data):
+    item_counter = Counter()
+    for ticket in tickets_data:
+        for item in ticket['items']:
+            item_counter[item['descripcion']] += item['cantidad']
+    return item_counter.most_common()
+
+
+def expense_in_date_range(tickets_data, start_date, end_date):
+    expenses_in_range = 0.0
+    for ticket, ticket_datetime in _dated(tickets_data):
+        if start_date <= ticket_datetime.date() <= end_date:
+            expenses_in_range += ticket['precio_total']
+    return expenses_in_range
+
+
+def get_unique_products(tickets_data):
+    product_set = set()
+    for ticket in tickets_data:
+        for item in ticket['items']:
+            product_set.add(item['descripcion'])
+    return sorted(list(product_set))
+
+
+def product_purchases(tickets_data, selected_product):
+    purchases = []
+    total_quantity = 0
+    for ticket in tickets_data:
+        for item in ticket['items']:
+            if item['descripcion'] == selected_product:
+                purchases.append(ticket['fecha_compra'])
+                total_quantity += item['cantidad']
+    return purchases, total_quantity
+
+
+def product_price_series(tickets_data, selected_product):
+    series = []
+    for ticket, ticket_datetime in _dated(tickets_data):
+        for item in ticket['items']:
+            if item['descripcion'] == selected_product:
+                series.append((ticket_datetime, item['precio_unitario']))
+    return sorted(series, key=lambda point: point[0])
+
+
+def product_in_month(tickets_data, month, year, selected_product):
+    total_quantity = 0
+    relevant_dates = []
+    for ticket, ticket_datetime in _dated(tickets_data):
+        if ticket_datetime.month == month and ticket_datetime.year == year:
+            for item in ticket['items']:
+                if item['descripcion'] == selected_product:
+                    total_quantity += item['cantidad']
+                    relevant_dates.append(ticket['fecha_compra'])
+    return total_quantity, relevant_dates
+
+
+def monthly_ticket(tickets_data, month, year):
+    monthly_summary = defaultdict(lambda: {'cantidad': 0, 'precio_unitario': 0, 'precio_total': 0})
+    total_expense = 0
+    for ticket, ticket_datetime in _dated(tickets_data):
+        if ticket_datetime.month == month and ticket_datetime.year == year:
+            for item in ticket['items']:
+                descripcion = item['descripcion']
+                cantidad = item['cantidad']
+                precio_unitario = abs(item['precio_unitario'])
+                precio_total = cantidad * abs(precio_unitario)
+                monthly_summary[descripcion]['cantidad'] += cantidad
+                monthly_summary[descripcion]['precio_unitario'] = precio_unitario
+                monthly_summary[descripcion]['precio_total'] += precio_total
+                total_expense += precio_total
+    return dict(monthly_summary), total_expense
@@ -0,0 +1,67 @@
+import datetime
+import os
+import random
+import sys
+
+import pytest
+
+# Los módulos del proyecto están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Directorio temporal de trabajo: los almacenes usan rutas relativas."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+PRODUCTS = ["LECHE ENTERA", "PAN BARRA", "TOMATE PERA", "YOGUR NATURAL", "ACEITE OLIVA",
+            "HUEVOS L", "PLATANO", "ARROZ REDONDO", "CAFE MOLIDO", "AGUA MINERAL"]
+
+
+def make_ticket_records(count, seed=0, years=(2023, 2024)):
+    """Registros de tickets como los del almacén, deterministas a partir de la semilla."""
+    rng = random.Random(seed)
+    records = []
+    for number in range(count):
+        items = []
+        for _ in range(rng.randint(1, 6)):
+            items.append({"descripcion": rng.choice(PRODUCTS), "cantidad": rng.randint(1, 4),
+                          "precio_unitario": round(rng.uniform(0.5, 9.0), 2)})
+        fecha_compra = (f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.choice(years)} "
+                        f"{rng.randint(9, 21):02d}:{rng.randint(0, 59):02d}")
+        records.append({"id": number + 1, "fecha_compra": fecha_compra, "items": items,
+                        "precio_total": round(sum(item["cantidad"] * item["precio_unitario"] for item in items), 2)})
+    return records
+
+
+@pytest.fixture
+def ticket_records():
+    """Tickets de 2023 y 2024 con productos repetidos, una devolución y una fecha no válida."""
+    records = make_ticket_records(200)
+    records[10]["items"].append({"descripcion": "PAN BARRA", "cantidad": 1, "precio_unitario": -1.25})
+    records[10]["precio_total"] = round(records[10]["precio_total"] - 1.25, 2)
+    records[20]["fecha_compra"] = "31/02/2024 10:00"
+    return records
+
+
+def make_bank_records(count, seed=0, year=2024):
+    """Transacciones de un extracto, de la más reciente a la más antigua, con su saldo."""
+    rng = random.Random(seed)
+    dates = sorted((datetime.date(year, rng.randint(1, 12), rng.randint(1, 28)) for _ in range(count)), reverse=True)
+    saldo = 1000.0
+    records = []
+    for index, date in enumerate(dates):
+        importe = round(rng.uniform(-80, 40), 2)
+        records.append({"id": index + 1, "fecha_oper": date.strftime('%d/%m/%Y'),
+                        "concepto": rng.choice(["COMPRA TARJETA MERCADONA", "NOMINA", "RECIBO LUZ", "Bizum enviado"]),
+                        "fecha_valor": date.strftime('%d/%m/%Y'),
+                        "importe": f"{importe:.2f}".replace('.', ','), "saldo": f"{saldo:.2f}".replace('.', ',')})
+        saldo -= importe
+    return records
+
+
+@pytest.fixture
+def bank_records():
+    return make_bank_records(120)
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+import SQLiteStore
+import TicketAnalyzer
+import TicketStore
+
+pytest.importorskip('tkinter')
+import AnalizadorCB  # noqa: E402
+
+
+def write_json(path, records):
+    with open(path, 'w') as file:
+        json.dump(records, file)
+
+
+def copies(records):
+    return [dict(record) for record in records]
+
+
+def without_ids(records):
+    return [{name: value for name, value in record.items() if name != 'id'} for record in records]
+
+
+def test_overlapping_statements_are_merged_once(workdir, bank_records):
+    statements = without_ids(bank_records)
+    # Dos extractos que comparten un periodo
+    assert TicketAnalyzer.merge_transactions(copies(statements[:80]), 'cuenta.json') == (80, 0)
+    assert TicketAnalyzer.merge_transactions(copies(statements[60:]), 'cuenta.json') == (40, 20)
+
+    records = TicketStore.read_records('cuenta.json')
+    assert [record['id'] for record in records] == list(range(1, 121))
+    assert without_ids(records) == statements
+
+
+def test_merged_account_is_read_newest_first(workdir, bank_records):
+    statements = without_ids(bank_records)
+    # Dos extractos que no comparten ningún día; el más reciente se importa el último
+    split = next(index for index in range(60, len(statements))
+                 if statements[index]['fecha_oper'] != statements[index - 1]['fecha_oper'])
+    TicketAnalyzer.merge_transactions(copies(statements[split:]), 'cuenta.json')
+    TicketAnalyzer.merge_transactions(copies(statements[:split]), 'cuenta.json')
+    TicketAnalyzer.merge_transactions(copies(reversed(statements)), 'cuenta.json')
+
+    bank_data = AnalizadorCB.read_bank_data('cuenta.json')
+    assert without_ids(bank_data) == statements
+    assert without_ids(SQLiteStore.load_account('cuenta', 'cuenta.json', 'db.sqlite').records()) == statements
+
+
+def test_legacy_statement_keeps_its_order(workdir):
+    # Un JSON de extracto antiguo, de la más antigua a la más reciente
+    legacy = [
+        {"id": 1, "fecha_oper": "01/03/2024", "concepto": "A", "fecha_valor": "01/03/2024",
+         "importe": "-2,00", "saldo": "98,00"},
+        {"id": 2, "fecha_oper": "15/03/2024", "concepto": "B", "fecha_valor": "15/03/2024",
+         "importe": "1,00", "saldo": "99,00"},
+    ]
+    write_json('antiguo.json', legacy)
+
+    bank_data = AnalizadorCB.read_bank_data('antiguo.json')
+    assert bank_data == legacy
+    _, balance, saldo_inicial, saldo_final = AnalizadorCB.monthly_balance(bank_data, 3, 2024)
+    assert (balance, saldo_inicial, saldo_final) == (-1.0, '99,00', '98,00')
+
+    queries = SQLiteStore.load_account('antiguo', 'antiguo.json', 'db.sqlite')
+    assert queries.records() == legacy
+    assert queries.monthly_balance(3, 2024)[1:] == (-1.0, '99,00', '98,00')
+
+
+def test_json_shadowed_by_account_store_is_refused(workdir, bank_records):
+    TicketAnalyzer.merge_transactions(bank_records, 'cuenta.json')
+
+    with pytest.raises(FileExistsError):
+        TicketAnalyzer.save_transactions_to_json(bank_records, 'cuenta.json')
+    with pytest.raises(FileExistsError):
+        TicketStore.export_json('cuenta.json', 'cuenta.json')
+    SQLiteStore.load_account('cuenta', 'cuenta.json', 'db.sqlite')
+    with pytest.raises(FileExistsError):
+        SQLiteStore.export_bank_json('cuenta', 'cuenta.json', 'db.sqlite')
+    assert TicketStore.read_records('cuenta.json')[0]['id'] == 1
+
+    assert TicketStore.export_json('cuenta.json', 'copia.json') == len(bank_records)
+
+
+def test_saved_statement_is_a_json_array(workdir, bank_records):
+    assert TicketAnalyzer.save_transactions_to_json(iter(bank_records), 'extracto.json') == len(bank_records)
+    with open('extracto.json') as file:
+        assert file.read() == json.dumps(bank_records, indent=4)
@@ -0,0 +1,64 @@
+import datetime
+
+import pytest
+
+import TicketModel
+
+import baseline
+from conftest import make_ticket_records
+
+pytest.importorskip('tkinter')
+pytest.importorskip('tkcalendar')
+import AnalizadorDatos  # noqa: E402
+
+RANGES = [
+    ((2023, 1, 1), (2024, 12, 31)),
+    ((2023, 6, 1), (2023, 6, 30)),
+    ((2024, 2, 29), (2024, 3, 1)),
+    ((2022, 1, 1), (2022, 12, 31)),
+    ((2025, 1, 1), (2025, 1, 31)),
+]
+
+
+def dates(start, end):
+    return datetime.date(*start), datetime.date(*end)
+
+
+@pytest.mark.parametrize('start, end', RANGES)
+def test_expense_in_date_range_matches_baseline(ticket_records, start, end):
+    tickets = TicketModel.Tickets(ticket_records)
+    start, end = dates(start, end)
+    assert AnalizadorDatos.expense_in_date_range(tickets, start, end) == pytest.approx(
+        baseline.expense_in_date_range(ticket_records, start, end))
+
+
+def test_range_limits_are_whole_days(ticket_records):
+    tickets = TicketModel.Tickets(ticket_records)
+    # Los dos extremos incluyen los tickets de todo el día, sea cual sea su hora
+    for record in ticket_records[:30]:
+        if record['fecha_compra'] == "31/02/2024 10:00":
+            continue
+        day = datetime.datetime.strptime(record['fecha_compra'], '%d/%m/%Y %H:%M').date()
+        assert AnalizadorDatos.expense_in_date_range(tickets, day, day) == pytest.approx(
+            baseline.expense_in_date_range(ticket_records, day, day))
+        assert AnalizadorDatos.expense_in_date_range(tickets, day, day) >= record['precio_total'] - 1e-9
+
+
+@pytest.mark.parametrize('start, end', RANGES)
+def test_index_is_kept_when_older_tickets_are_added(ticket_records, start, end):
+    tickets = TicketModel.Tickets(ticket_records)
+    tickets.date_index()
+    older = make_ticket_records(50, seed=1, years=(2022, 2023))
+    tickets.extend(older)
+    start, end = dates(start, end)
+    assert AnalizadorDatos.expense_in_date_range(tickets, start, end) == pytest.approx(
+        baseline.expense_in_date_range(ticket_records + older, start, end))
+
+
+def test_index_is_ordered_by_date(ticket_records):
+    tickets = TicketModel.Tickets(ticket_records)
+    index = tickets.date_index()
+    tickets.extend(make_ticket_records(50, seed=1, years=(2022, 2023)))
+    assert index.dates == sorted(index.dates)
+    assert len(index.positions) == len(tickets) - 1  # el de la fecha no válida no está
+    assert index.prefix[-1] == pytest.approx(sum(tickets[position].precio_total for position in index.positions))
@@ -0,0 +1,71 @@
+import functools
+import os
+
+import TicketAnalyzer
+import TicketParser
+import TicketStore
+
+MERCADONA_TEXT = "\n".join([
+    "MERCADONA, S.A. A-46103834",
+    "12/03/2024 18:45 OP: 123456",
+    "Descripción P. Unit Importe",
+    "2 LECHE ENTERA 1,70",
+    "1 PAN DE MOLDE 1,25",
+    "TOTAL (€) 2,95",
+])
+
+
+def key(record):
+    return [str(record["n"])]
+
+
+def test_append_unique_skips_duplicates(workdir):
+    appended, duplicates = TicketStore.append_unique(
+        'a.json', [{"n": 1}, {"n": 2}, {"n": 1}], key, assign_ids=True)
+    assert [record["n"] for record in appended] == [1, 2]
+    assert duplicates == [{"n": 1}]
+
+    appended, duplicates = TicketStore.append_unique('a.json', [{"n": 2}, {"n": 3}], key, assign_ids=True)
+    assert appended == [{"n": 3, "id": 3}]
+    assert duplicates == [{"n": 2}]
+    assert [record["n"] for record in TicketStore.read_records('a.json')] == [1, 2, 3]
+
+
+def test_append_unique_rebuilds_stale_index(workdir):
+    TicketStore.append_unique('a.json', [{"n": 1}], key)
+    os.remove(TicketStore.store_index_path('a.json'))
+    appended, duplicates = TicketStore.append_unique('a.json', [{"n": 1}], key)
+    assert appended == []
+    assert duplicates == [{"n": 1}]
+
+
+def test_ticket_keys_ignore_item_order():
+    record = TicketParser.parse_ticket(MERCADONA_TEXT).to_record()
+    reordered = dict(record, items=list(reversed(record["items"])))
+    store = TicketAnalyzer.MERCADONA_STORE
+    assert TicketAnalyzer.ticket_keys(store, record) == TicketAnalyzer.ticket_keys(store, reordered)
+    assert TicketAnalyzer.ticket_keys(store, record) != TicketAnalyzer.ticket_keys(TicketAnalyzer.LIDL_STORE, record)
+
+
+def test_same_ticket_is_saved_once(workdir):
+    ticket = TicketParser.parse_ticket(MERCADONA_TEXT)
+    assert TicketAnalyzer.save_parsed_ticket(ticket) == TicketAnalyzer.STATUS_SAVED
+    assert TicketAnalyzer.save_parsed_ticket(ticket) == TicketAnalyzer.STATUS_DUPLICATE
+    assert len(TicketStore.read_records(TicketAnalyzer.MERCADONA_STORE)) == 1
+
+
+def test_same_file_is_imported_once(workdir):
+    (workdir / 'ticket.jpg').write_bytes(b'imagen')
+    assert TicketAnalyzer.save_raw_text(TicketAnalyzer.DOCUMENT_TICKET, 'ticket.jpg', MERCADONA_TEXT)
+    assert not TicketAnalyzer.save_raw_text(TicketAnalyzer.DOCUMENT_TICKET, 'ticket.jpg', MERCADONA_TEXT)
+    # El mismo archivo como devolución es otro documento
+    assert TicketAnalyzer.save_raw_text(TicketAnalyzer.DOCUMENT_RETURN, 'ticket.jpg', MERCADONA_TEXT)
+
+
+def test_dedupe_store_keeps_first_occurrence(workdir):
+    TicketStore.append_records('a.json', [{"n": 1, "i": 1}, {"n": 2, "i": 2}, {"n": 1, "i": 3}])
+    assert TicketStore.dedupe_store('a.json', key) == 1
+    assert TicketStore.read_records('a.json') == [{"n": 1, "i": 1}, {"n": 2, "i": 2}]
+    # El índice reconstruido sigue detectando el duplicado
+    appended, _ = TicketStore.append_unique('a.json', [{"n": 2}], key)
+    assert appended == []
@@ -0,0 +1,102 @@
+import os
+import time
+
+import pytest
+
+import InboxWatcher
+import OCRCache
+import TicketAnalyzer
+import TicketCLI
+
+
+@pytest.fixture
+def inbox(workdir):
+    """Carpeta de entrada con dos tickets que ya no se están escribiendo."""
+    directory = workdir / 'bandeja'
+    directory.mkdir()
+    old = time.time() - 60
+    for name in ('a.jpg', 'b.jpg'):
+        path = directory / name
+        path.write_bytes(name.encode('ascii'))
+        os.utime(path, (old, old))
+    return directory
+
+
+@pytest.fixture
+def imported(monkeypatch):
+    """Sustituye el OCR y la importación de los tickets; devuelve los archivos importados."""
+    paths = []
+
+    def process_ticket_files(file_paths, workers=None, use_cache=True):
+        paths.extend(file_paths)
+        return [(path, TicketAnalyzer.STATUS_SAVED, None) for path in file_paths]
+    monkeypatch.setattr(TicketAnalyzer, 'process_ticket_files', process_ticket_files)
+    return paths
+
+
+def watcher(inbox):
+    return InboxWatcher.InboxWatcher(str(inbox), poll_seconds=0, settle_seconds=0)
+
+
+def test_run_once_imports_ready_files(inbox, imported):
+    results = watcher(inbox).run(once=True)
+    assert sorted((os.path.basename(path), kind, error) for path, kind, error in results) == [
+        ('a.jpg', InboxWatcher.KIND_TICKET, None), ('b.jpg', InboxWatcher.KIND_TICKET, None)
+    ]
+    assert len(imported) == 2
+
+
+def test_imported_files_are_not_repeated_after_restart(inbox, imported):
+    watcher(inbox).run(once=True)
+    assert watcher(inbox).run(once=True) == []
+    assert len(imported) == 2
+
+
+def test_unreadable_file_is_reported_once(inbox, imported, monkeypatch):
+    file_hash = OCRCache.file_hash
+
+    def unreadable(path):
+        if path.endswith('a.jpg'):
+            raise OSError("permiso denegado")
+        return file_hash(path)
+    monkeypatch.setattr(OCRCache, 'file_hash', unreadable)
+
+    # Revisiones sueltas en lugar de run(once=True), que no terminaría si el error se repitiera
+    inbox_watcher = watcher(inbox)
+    results = []
+    for _ in range(4):
+        results.extend(inbox_watcher.poll_once())
+    errors = [(os.path.basename(path), error) for path, _, error in results if error is not None]
+    assert errors == [('a.jpg', "permiso denegado")]
+    assert [os.path.basename(path) for path in imported] == ['b.jpg']
+    assert not inbox_watcher.pending()
+
+
+def test_cli_watch_once_exits_with_failure_on_unreadable_file(inbox, imported, monkeypatch, capsys):
+    def unreadable(path):
+        raise OSError("ilegible")
+    monkeypatch.setattr(OCRCache, 'file_hash', unreadable)
+    code = TicketCLI.main(['watch', str(inbox), '--una-vez', '--intervalo', '0', '--espera', '0'])
+    assert code == TicketCLI.EXIT_FAILURES
+    assert '"errores": 2' in capsys.readouterr().out
+
+
+def test_failed_batch_is_retried_on_next_poll(inbox, monkeypatch):
+    calls = []
+
+    def process_ticket_files(file_paths, workers=None, use_cache=True):
+        calls.append(file_paths)
+        if len(calls) == 1:
+            raise RuntimeError("pool roto")
+        return [(path, TicketAnalyzer.STATUS_SAVED, None) for path in file_paths]
+    monkeypatch.setattr(TicketAnalyzer, 'process_ticket_files', process_ticket_files)
+
+    inbox_watcher = watcher(inbox)
+    # run(once=True) termina tras el fallo del lote en lugar de reintentarlo sin fin
+    results = inbox_watcher.run(once=True)
+    assert [error for _, _, error in results] == ["pool roto", "pool roto"]
+    assert inbox_watcher.pending()
+
+    results = inbox_watcher.poll_once()
+    assert sorted((os.path.basename(path), error) for path, _, error in results) == [('a.jpg', None), ('b.jpg', None)]
+    assert not inbox_watcher.pending()
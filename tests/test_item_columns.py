@@ -0,0 +1,51 @@
+import pytest
+
+import TicketModel
+
+import baseline
+from conftest import make_ticket_records
+
+pytest.importorskip('numpy')
+pytest.importorskip('tkinter')
+pytest.importorskip('tkcalendar')
+import AnalizadorDatos  # noqa: E402
+
+MONTHS = [(month, year) for year in (2023, 2024) for month in range(1, 13)] + [(6, 2025)]
+
+
+def results(tickets, monkeypatch, columnar=False):
+    monkeypatch.setattr(TicketModel, 'COLUMNAR', columnar)
+    return {
+        'total': AnalizadorDatos.total_expense(tickets),
+        'counts': AnalizadorDatos.count_purchased_items(tickets),
+        'pages': [AnalizadorDatos.top_purchased_items(tickets, 3, offset) for offset in (0, 2, 5, 9, 20)],
+        'months': [AnalizadorDatos.monthly_ticket(tickets, month, year) for month, year in MONTHS],
+    }
+
+
+def test_columns_match_cube_exactly(ticket_records, monkeypatch):
+    expected = results(TicketModel.Tickets(ticket_records), monkeypatch)
+    assert results(TicketModel.Tickets(ticket_records), monkeypatch, columnar=True) == expected
+    assert expected['total'] == baseline.total_expense(ticket_records)
+    assert expected['counts'] == baseline.count_purchased_items(ticket_records)
+
+
+def test_columns_are_kept_when_tickets_are_added(ticket_records, monkeypatch):
+    added = make_ticket_records(50, seed=4)
+    tickets = TicketModel.Tickets(ticket_records)
+    tickets.columns()
+    tickets.extend(added)
+    assert results(tickets, monkeypatch, columnar=True) == results(
+        TicketModel.Tickets(ticket_records + added), monkeypatch)
+
+
+def test_fractional_quantities(ticket_records, monkeypatch):
+    # Productos a peso: cantidades no enteras
+    ticket_records[0]['items'].append({"descripcion": "PLATANO", "cantidad": 0.75, "precio_unitario": 1.9})
+    tickets = TicketModel.Tickets(ticket_records)
+    assert results(tickets, monkeypatch, columnar=True) == results(TicketModel.Tickets(ticket_records), monkeypatch)
+
+
+def test_empty_store(monkeypatch):
+    assert results(TicketModel.Tickets([]), monkeypatch, columnar=True) == results(
+        TicketModel.Tickets([]), monkeypatch)
@@ -0,0 +1,42 @@
+import pytest
+
+import TicketModel
+
+import baseline
+from conftest import make_ticket_records
+
+pytest.importorskip('tkinter')
+pytest.importorskip('tkcalendar')
+import AnalizadorDatos  # noqa: E402
+
+MONTHS = [(month, year) for year in (2023, 2024) for month in range(1, 13)] + [(6, 2025)]
+
+
+def test_monthly_ticket_matches_baseline(ticket_records):
+    tickets = TicketModel.Tickets(ticket_records)
+    for month, year in MONTHS:
+        summary, total = AnalizadorDatos.monthly_ticket(tickets, month, year)
+        expected_summary, expected_total = baseline.monthly_ticket(ticket_records, month, year)
+        # Mismo orden de productos y mismas sumas, acumuladas en el orden del almacén
+        assert list(summary.items()) == list(expected_summary.items())
+        assert total == expected_total
+
+
+@pytest.mark.parametrize('product', ["PAN BARRA", "HUEVOS L", "NO EXISTE"])
+def test_product_in_month_matches_baseline(ticket_records, product):
+    tickets = TicketModel.Tickets(ticket_records)
+    for month, year in MONTHS:
+        assert AnalizadorDatos.product_in_month(tickets, month, year, product) == baseline.product_in_month(
+            ticket_records, month, year, product)
+
+
+def test_cube_is_kept_when_tickets_are_added(ticket_records):
+    tickets = TicketModel.Tickets(ticket_records)
+    tickets.cube()
+    added = make_ticket_records(50, seed=2)
+    tickets.extend(added)
+    for month, year in MONTHS:
+        assert AnalizadorDatos.monthly_ticket(tickets, month, year) == baseline.monthly_ticket(
+            ticket_records + added, month, year)
+        assert AnalizadorDatos.product_in_month(tickets, month, year, "PAN BARRA") == baseline.product_in_month(
+            ticket_records + added, month, year, "PAN BARRA")
@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+import OCRCache
+
+
+@pytest.fixture
+def cache(workdir, monkeypatch):
+    """Caché vacía en el directorio de trabajo, con la estimación de tamaño sin medir."""
+    monkeypatch.setattr(OCRCache, 'CACHE_DIR', str(workdir / 'cache'))
+    monkeypatch.setattr(OCRCache, 'ENABLED', True)
+    monkeypatch.setattr(OCRCache, '_estimated_bytes', None)
+    monkeypatch.setattr(OCRCache, '_puts_since_evict', 0)
+    return workdir / 'cache'
+
+
+def entries(cache):
+    return sorted(name[:-len(OCRCache.CACHE_EXTENSION)] for name in os.listdir(cache))
+
+
+def test_key_depends_on_content_and_config(workdir):
+    (workdir / 'a.jpg').write_bytes(b'imagen')
+    (workdir / 'b.jpg').write_bytes(b'imagen')
+    (workdir / 'c.jpg').write_bytes(b'otra imagen')
+    key = OCRCache.cache_key('a.jpg', 'psm 6')
+    assert OCRCache.cache_key('b.jpg', 'psm 6') == key
+    assert OCRCache.cache_key('c.jpg', 'psm 6') != key
+    assert OCRCache.cache_key('a.jpg', 'psm 4') != key
+
+
+def test_cached_text_extracts_once(cache, workdir):
+    (workdir / 'a.jpg').write_bytes(b'imagen')
+    calls = []
+
+    def extract(path):
+        calls.append(path)
+        return "TOTAL 1,00"
+    assert OCRCache.cached_text('a.jpg', 'cfg', extract) == "TOTAL 1,00"
+    assert OCRCache.cached_text('a.jpg', 'cfg', extract) == "TOTAL 1,00"
+    assert calls == ['a.jpg']
+    # Sin caché se extrae siempre
+    assert OCRCache.cached_text('a.jpg', 'cfg', extract, use_cache=False) == "TOTAL 1,00"
+    assert len(calls) == 2
+
+
+def test_evict_removes_least_recently_used(cache):
+    for index, key in enumerate(('a', 'b', 'c')):
+        OCRCache.put(key, 'x' * 100)
+        os.utime(cache / (key + OCRCache.CACHE_EXTENSION), (1000 + index, 1000 + index))
+    # Leer 'a' la marca como usada recientemente
+    assert OCRCache.get('a') == 'x' * 100
+    assert OCRCache.evict(max_bytes=250) <= 250
+    assert entries(cache) == ['a', 'c']
+
+
+def test_put_keeps_the_cache_under_the_limit_without_scanning_every_time(cache, monkeypatch):
+    monkeypatch.setattr(OCRCache, 'MAX_CACHE_BYTES', 1000)
+    scans = []
+    evict = OCRCache.evict
+
+    def counting_evict(max_bytes=None):
+        scans.append(max_bytes)
+        return evict(max_bytes)
+    monkeypatch.setattr(OCRCache, 'evict', counting_evict)
+
+    for index in range(500):
+        OCRCache.put(f"k{index}", 'x' * 10)
+    assert sum(os.path.getsize(cache / name) for name in os.listdir(cache)) <= 1000
+    assert len(scans) < 100
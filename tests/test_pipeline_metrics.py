@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import MetricsStore
+import PipelineMetrics
+
+
+@pytest.fixture(autouse=True)
+def metrics(monkeypatch):
+    """Acumuladores vacíos y métricas activadas."""
+    monkeypatch.setattr(PipelineMetrics, 'ENABLED', True)
+    PipelineMetrics.snapshot()
+    yield
+    PipelineMetrics.snapshot()
+
+
+def test_snapshot_returns_and_resets_accumulators():
+    PipelineMetrics.add_time(PipelineMetrics.STAGE_OCR, 0.5)
+    PipelineMetrics.add_time(PipelineMetrics.STAGE_OCR, 0.25)
+    PipelineMetrics.count(PipelineMetrics.COUNT_CACHE_HITS)
+    with PipelineMetrics.timed(PipelineMetrics.STAGE_PARSE):
+        pass
+    data = PipelineMetrics.snapshot()
+    assert data["etapas"][PipelineMetrics.STAGE_OCR] == {"llamadas": 2, "segundos": 0.75}
+    assert data["etapas"][PipelineMetrics.STAGE_PARSE]["llamadas"] == 1
+    assert data["contadores"] == {PipelineMetrics.COUNT_CACHE_HITS: 1}
+    assert PipelineMetrics.snapshot() == {"etapas": {}, "contadores": {}}
+
+
+def test_merge_adds_another_process_snapshot():
+    PipelineMetrics.count(PipelineMetrics.COUNT_CACHE_MISSES, 2)
+    PipelineMetrics.merge({"etapas": {PipelineMetrics.STAGE_OCR: {"llamadas": 3, "segundos": 1.5}},
+                           "contadores": {PipelineMetrics.COUNT_CACHE_MISSES: 1}})
+    data = PipelineMetrics.snapshot()
+    assert data["etapas"][PipelineMetrics.STAGE_OCR] == {"llamadas": 3, "segundos": 1.5}
+    assert data["contadores"] == {PipelineMetrics.COUNT_CACHE_MISSES: 3}
+
+
+def test_disabled_metrics_are_not_accumulated(monkeypatch):
+    monkeypatch.setattr(PipelineMetrics, 'ENABLED', False)
+    PipelineMetrics.count(PipelineMetrics.COUNT_CACHE_HITS)
+    assert PipelineMetrics.snapshot()["contadores"] == {}
+
+
+def test_flush_and_aggregate_runs(workdir):
+    assert MetricsStore.flush('ticket', 'metricas.json') is None
+    for command, seconds in (('ticket', 1.0), ('ticket', 3.0), ('lidl', 5.0)):
+        PipelineMetrics.add_time(PipelineMetrics.STAGE_OCR, seconds)
+        PipelineMetrics.count(PipelineMetrics.COUNT_MATCHED_LINES, 10)
+        assert MetricsStore.flush(command, 'metricas.json')["comando"] == command
+
+    totals = MetricsStore.aggregate('metricas.json', 'ticket')
+    assert totals["ejecuciones"] == 2
+    assert totals["etapas"][PipelineMetrics.STAGE_OCR] == {"llamadas": 2, "segundos": 4.0, "media": 2.0}
+    assert totals["contadores"] == {PipelineMetrics.COUNT_MATCHED_LINES: 20}
+    assert MetricsStore.aggregate('metricas.json')["ejecuciones"] == 3
+
+
+def test_pipeline_metrics_does_not_import_the_stores():
+    code = "import sys, PipelineMetrics; print('TicketStore' in sys.modules)"
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(PipelineMetrics.__file__)))
+    assert output.stdout.strip() == 'False'
@@ -0,0 +1,43 @@
+import pytest
+
+import TicketModel
+
+import baseline
+from conftest import PRODUCTS, make_ticket_records
+
+pytest.importorskip('tkinter')
+pytest.importorskip('tkcalendar')
+import AnalizadorDatos  # noqa: E402
+
+
+@pytest.mark.parametrize('product', PRODUCTS + ["NO EXISTE"])
+def test_product_queries_match_baseline(ticket_records, product):
+    tickets = TicketModel.Tickets(ticket_records)
+    assert AnalizadorDatos.product_purchases(tickets, product) == baseline.product_purchases(ticket_records, product)
+    assert AnalizadorDatos.product_price_series(tickets, product) == baseline.product_price_series(
+        ticket_records, product)
+
+
+def test_price_series_skips_bad_dates_and_keeps_returns(ticket_records):
+    tickets = TicketModel.Tickets(ticket_records)
+    bad = ticket_records[20]['items'][0]['descripcion']
+    purchases, _ = AnalizadorDatos.product_purchases(tickets, bad)
+    series = AnalizadorDatos.product_price_series(tickets, bad)
+    # El historial incluye el ticket sin fecha válida; la serie de precios no
+    assert "31/02/2024 10:00" in purchases
+    assert len(series) < len(purchases)
+    assert -1.25 in [precio for _, precio in AnalizadorDatos.product_price_series(tickets, "PAN BARRA")]
+
+
+def test_index_is_kept_when_tickets_are_added(ticket_records):
+    tickets = TicketModel.Tickets(ticket_records)
+    tickets.product_index()
+    added = make_ticket_records(50, seed=3, years=(2022,)) + [
+        {"id": None, "fecha_compra": "01/01/2025 10:00", "precio_total": 2.0,
+         "items": [{"descripcion": "PRODUCTO NUEVO", "cantidad": 2, "precio_unitario": 1.0}]}]
+    tickets.extend(added)
+    for product in PRODUCTS + ["PRODUCTO NUEVO"]:
+        assert AnalizadorDatos.product_purchases(tickets, product) == baseline.product_purchases(
+            ticket_records + added, product)
+        assert AnalizadorDatos.product_price_series(tickets, product) == baseline.product_price_series(
+            ticket_records + added, product)
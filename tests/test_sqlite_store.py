@@ -0,0 +1,89 @@
+import datetime
+import json
+
+import pytest
+
+import SQLiteStore
+import TicketModel
+import TicketStore
+
+pytest.importorskip('tkinter')
+pytest.importorskip('tkcalendar')
+import AnalizadorCB  # noqa: E402
+import AnalizadorDatos  # noqa: E402
+
+
+@pytest.fixture
+def stores(workdir, ticket_records):
+    TicketStore.append_records('mercadona_tickets.json', ticket_records)
+    return TicketModel.load('mercadona_tickets.json'), SQLiteStore.load_tickets(
+        'mercadona', 'mercadona_tickets.json', 'db.sqlite')
+
+
+def test_ticket_queries_match_json_store(stores):
+    tickets, queries = stores
+    assert len(queries) == len(tickets)
+    assert queries.records() == TicketStore.read_records('mercadona_tickets.json')
+    assert AnalizadorDatos.total_expense(queries) == pytest.approx(AnalizadorDatos.total_expense(tickets))
+    assert AnalizadorDatos.count_purchased_items(queries) == AnalizadorDatos.count_purchased_items(tickets)
+    assert AnalizadorDatos.top_purchased_items(queries, 3, 2) == AnalizadorDatos.top_purchased_items(tickets, 3, 2)
+    assert AnalizadorDatos.get_unique_products(queries) == AnalizadorDatos.get_unique_products(tickets)
+
+
+@pytest.mark.parametrize('start, end', [
+    ((2023, 1, 1), (2024, 12, 31)),
+    ((2023, 3, 15), (2023, 3, 15)),
+    ((2024, 2, 1), (2024, 2, 29)),
+    ((2025, 1, 1), (2025, 12, 31)),
+])
+def test_expense_in_date_range_matches_json_store(stores, start, end):
+    tickets, queries = stores
+    start, end = datetime.date(*start), datetime.date(*end)
+    assert AnalizadorDatos.expense_in_date_range(queries, start, end) == pytest.approx(
+        AnalizadorDatos.expense_in_date_range(tickets, start, end))
+
+
+@pytest.mark.parametrize('product', ["PAN BARRA", "CAFE MOLIDO", "NO EXISTE"])
+def test_product_queries_match_json_store(stores, product):
+    tickets, queries = stores
+    assert AnalizadorDatos.product_purchases(queries, product) == AnalizadorDatos.product_purchases(tickets, product)
+    assert AnalizadorDatos.product_price_series(queries, product) == AnalizadorDatos.product_price_series(
+        tickets, product)
+    for month, year in [(1, 2023), (2, 2024), (7, 2024)]:
+        assert AnalizadorDatos.product_in_month(queries, month, year, product) == AnalizadorDatos.product_in_month(
+            tickets, month, year, product)
+
+
+@pytest.mark.parametrize('month, year', [(1, 2023), (2, 2024), (12, 2024), (6, 2025)])
+def test_monthly_ticket_matches_json_store(stores, month, year):
+    tickets, queries = stores
+    summary, total = AnalizadorDatos.monthly_ticket(queries, month, year)
+    expected_summary, expected_total = AnalizadorDatos.monthly_ticket(tickets, month, year)
+    assert list(summary) == list(expected_summary)
+    for descripcion, values in expected_summary.items():
+        assert summary[descripcion] == pytest.approx(values)
+    assert total == pytest.approx(expected_total)
+
+
+def test_ticket_queries_resync_when_store_changes(stores, ticket_records):
+    _, queries = stores
+    TicketStore.append_records('mercadona_tickets.json', ticket_records[:5])
+    queries = SQLiteStore.load_tickets('mercadona', 'mercadona_tickets.json', 'db.sqlite')
+    assert len(queries) == len(ticket_records) + 5
+
+
+def test_transaction_queries_match_bank_json(workdir, bank_records):
+    with open('cuenta.json', 'w') as file:
+        json.dump(bank_records, file)
+    bank_data = AnalizadorCB.read_bank_data('cuenta.json')
+    queries = SQLiteStore.load_account('cuenta', 'cuenta.json', 'db.sqlite')
+
+    assert queries.records() == bank_data
+    for month in (1, 6, 12):
+        transactions, balance, saldo_inicial, saldo_final = AnalizadorCB.monthly_balance(queries, month, 2024)
+        expected = AnalizadorCB.monthly_balance(bank_data, month, 2024)
+        assert (transactions, saldo_inicial, saldo_final) == (expected[0], expected[2], expected[3])
+        assert balance == pytest.approx(expected[1])
+    assert AnalizadorCB.annual_balance(queries, 2024)[0] == AnalizadorCB.annual_balance(bank_data, 2024)[0]
+    assert AnalizadorCB.transactions_by_concept(queries, 'bizum') == AnalizadorCB.transactions_by_concept(
+        bank_data, 'bizum')
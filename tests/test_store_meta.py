@@ -0,0 +1,42 @@
+import json
+import os
+
+import TicketStore
+
+
+def test_ids_continue_across_appends(workdir):
+    TicketStore.append_records('a.json', [{"n": 1}, {"n": 2}], assign_ids=True)
+    TicketStore.append_record('a.json', {"n": 3}, assign_id=True)
+    assert [record["id"] for record in TicketStore.read_records('a.json')] == [1, 2, 3]
+    meta = TicketStore.read_meta('a.json')
+    assert (meta["next_id"], meta["count"]) == (4, 3)
+
+
+def test_each_write_bumps_the_data_version(workdir):
+    TicketStore.append_record('a.json', {"n": 1})
+    version = TicketStore.read_meta('a.json')["data_version"]
+    TicketStore.append_record('a.json', {"n": 2})
+    assert TicketStore.read_meta('a.json')["data_version"] > version
+
+
+def test_missing_meta_is_rebuilt_from_the_log(workdir):
+    TicketStore.append_records('a.json', [{"n": 1}, {"n": 2}], assign_ids=True)
+    os.remove(TicketStore.store_meta_path('a.json'))
+    TicketStore.append_record('a.json', {"n": 3}, assign_id=True)
+    assert TicketStore.read_records('a.json')[-1] == {"n": 3, "id": 3}
+
+
+def test_log_changed_outside_the_store_rebuilds_meta(workdir):
+    TicketStore.append_records('a.json', [{"n": 1}], assign_ids=True)
+    # Otra herramienta añade una línea sin pasar por TicketStore
+    with open('a.jsonl', 'a', encoding='utf-8') as file:
+        file.write(json.dumps({"n": 2, "id": 10}) + '\n')
+    meta = TicketStore.read_meta('a.json')
+    assert (meta["next_id"], meta["count"]) == (11, 2)
+
+
+def test_ids_after_migration_follow_the_highest_legacy_id(workdir):
+    with open('a.json', 'w', encoding='utf-8') as file:
+        json.dump([{"id": 1, "n": 1}, {"id": 7, "n": 2}], file)
+    TicketStore.append_record('a.json', {"n": 3}, assign_id=True)
+    assert TicketStore.read_records('a.json')[-1] == {"n": 3, "id": 8}
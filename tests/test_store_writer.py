@@ -0,0 +1,63 @@
+import TicketStore
+
+
+def key(record):
+    return [str(record["n"])]
+
+
+def stored(path):
+    return [record["n"] for record in TicketStore.read_records(path)] if TicketStore.store_exists(path) else []
+
+
+def test_full_batch_waits_for_next_source(workdir):
+    with TicketStore.StoreWriter(batch_size=3) as writer:
+        writer.begin_source('a.jpg')
+        for n in range(4):
+            writer.add('a.json', {"n": n})
+        # El lote está lleno, pero los registros de un origen se confirman juntos
+        assert stored('a.json') == []
+        writer.begin_source('b.jpg')
+        assert stored('a.json') == [0, 1, 2, 3]
+        writer.add('a.json', {"n": 4})
+        assert stored('a.json') == [0, 1, 2, 3]
+    assert stored('a.json') == [0, 1, 2, 3, 4]
+
+
+def test_writer_without_source_flushes_at_batch_size(workdir):
+    writer = TicketStore.StoreWriter(batch_size=2)
+    writer.add('a.json', {"n": 1})
+    assert stored('a.json') == []
+    writer.add('a.json', {"n": 2})
+    assert stored('a.json') == [1, 2]
+
+
+def test_stores_filled_first_are_committed_last(workdir, monkeypatch):
+    written = []
+    append = TicketStore._append
+    monkeypatch.setattr(TicketStore, '_append', lambda path, *args: written.append(path) or append(path, *args))
+    with TicketStore.StoreWriter() as writer:
+        writer.add('textos.json', {"n": 1})
+        writer.add('a.json', {"n": 1})
+    # Un corte entre las dos escrituras no deja el texto marcado como importado sin su ticket
+    assert written == ['a.json', 'textos.json']
+
+
+def test_duplicates_are_rejected_when_added(workdir):
+    TicketStore.append_records('a.json', [{"n": 1}])
+    with TicketStore.StoreWriter() as writer:
+        assert not writer.add('a.json', {"n": 1}, key_function=key)
+        assert writer.add('a.json', {"n": 2}, key_function=key)
+        assert not writer.add('a.json', {"n": 2}, key_function=key)
+    assert stored('a.json') == [1, 2]
+
+
+def test_store_writer_reports_records_rejected_at_flush(workdir):
+    with TicketStore.StoreWriter(batch_size=10) as writer:
+        writer.begin_source('a.jpg')
+        assert writer.add('a.json', {"n": 1}, key_function=key)
+        writer.begin_source('b.jpg')
+        assert writer.add('a.json', {"n": 2}, key_function=key)
+        # Otra importación guarda el mismo ticket antes de que se confirme el lote
+        TicketStore.append_unique('a.json', [{"n": 1}], key)
+    assert writer.rejected_sources() == {'a.jpg'}
+    assert stored('a.json') == [1, 2]
@@ -0,0 +1,73 @@
+import os
+import subprocess
+import sys
+
+import TableModel
+
+
+def transactions():
+    return [
+        {"fecha_oper": "05/01/2024", "concepto": "nomina", "importe": "1200,00", "saldo": "1500,00"},
+        {"fecha_oper": "28/12/2023", "concepto": "Bizum", "importe": "-12,50", "saldo": "300,00"},
+        {"fecha_oper": "05/01/2024", "concepto": "RECIBO LUZ", "importe": "-45,10", "saldo": "312,50"},
+        {"fecha_oper": "01/02/2023", "concepto": "cajero", "importe": "N/A", "saldo": "357,60"},
+    ]
+
+
+def model():
+    return TableModel.TableModel(TableModel.transaction_columns(), transactions())
+
+
+def concepts(table):
+    return [table.row(position)["concepto"] for position in range(len(table))]
+
+
+def test_rows_keep_result_order_until_sorted():
+    table = model()
+    assert concepts(table) == ["nomina", "Bizum", "RECIBO LUZ", "cajero"]
+
+
+def test_sort_by_date_is_stable_and_second_click_reverses():
+    table = model()
+    table.sort(0)
+    assert not table.descending
+    assert concepts(table) == ["cajero", "Bizum", "nomina", "RECIBO LUZ"]
+    table.sort(0)
+    assert table.descending
+    # Los empates conservan su orden también al invertir
+    assert concepts(table) == ["nomina", "RECIBO LUZ", "Bizum", "cajero"]
+    # Otra columna empieza de nuevo en orden ascendente
+    table.sort(1)
+    assert not table.descending
+    assert concepts(table) == ["Bizum", "cajero", "nomina", "RECIBO LUZ"]
+
+
+def test_sort_by_amount_puts_non_numeric_last():
+    table = model()
+    table.sort(2)
+    assert [table.row(position)["importe"] for position in range(len(table))] == [
+        "-45,10", "-12,50", "1200,00", "N/A"]
+
+
+def test_keys():
+    dates = ["05/01/2024", "28/12/2023", "01/02/2023", "31/01/2024"]
+    assert sorted(dates, key=TableModel.date_key) == ["01/02/2023", "28/12/2023", "05/01/2024", "31/01/2024"]
+    assert TableModel.amount_key("-1234,50") == -1234.5
+    assert TableModel.amount_key(3) == 3.0
+    assert TableModel.amount_key("N/A") == float('inf')
+
+
+def test_window_formats_visible_rows():
+    columns = [TableModel.Column("Producto", 0), TableModel.Column("Total", 1, format=lambda value: f"{value:.2f}")]
+    table = TableModel.TableModel(columns, [("PAN", 1.5), ("LECHE", 0.9), ("HUEVOS", 2.25)])
+    assert table.window(1, 5) == [("LECHE", "0.90"), ("HUEVOS", "2.25")]
+    table.sort(1)
+    assert table.window(0, 2) == [("LECHE", "0.90"), ("PAN", "1.50")]
+    assert table.window(3, 2) == []
+
+
+def test_table_model_does_not_import_tkinter():
+    code = "import sys, TableModel; print('tkinter' in sys.modules)"
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(TableModel.__file__)))
+    assert output.stdout.strip() == 'False'
@@ -0,0 +1,165 @@
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import TaskProgress
+import TicketModel
+
+import baseline
+
+pytest.importorskip('tkinter')
+import TaskRunner  # noqa: E402
+
+
+class FakeWidget:
+    """Sustituye a la ventana de Tk: guarda las llamadas de after() para ejecutarlas a mano."""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, ms, callback):
+        self.callbacks.append(callback)
+
+
+def run_until_idle(runner, widget, timeout=5):
+    deadline = time.monotonic() + timeout
+    while runner.tasks or widget.callbacks:
+        assert time.monotonic() < deadline, "las tareas no han terminado"
+        if widget.callbacks:
+            widget.callbacks.pop(0)()
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def runner():
+    widget = FakeWidget()
+    return TaskRunner.TaskRunner(widget), widget
+
+
+def test_progress_raises_after_cancel():
+    events = queue.Queue()
+    task = TaskProgress.Task('consulta', events)
+    task.progress(1, 10)
+    assert events.get_nowait() == (task, 'progress', (1, 10))
+    task.cancel()
+    assert task.cancelled
+    with pytest.raises(TaskProgress.Cancelled):
+        task.progress(2, 10)
+
+
+def test_result_is_delivered_on_the_tk_side(runner):
+    runner, widget = runner
+    results = []
+    runner.submit('suma', sum, ([1, 2, 3],), on_done=results.append)
+    assert len(widget.callbacks) == 1
+    run_until_idle(runner, widget)
+    assert results == [6]
+    assert not runner.polling
+
+
+def test_superseded_task_result_is_dropped(runner):
+    runner, widget = runner
+    release = threading.Event()
+    results = []
+
+    def slow():
+        release.wait(5)
+        return 'antigua'
+
+    runner.submit('consulta', slow, on_done=results.append)
+    runner.submit('consulta', lambda: 'nueva', on_done=results.append)
+    release.set()
+    run_until_idle(runner, widget)
+    # Deja tiempo a la tarea antigua para entregar su resultado, que se descarta
+    time.sleep(0.05)
+    run_until_idle(runner, widget)
+    assert results == ['nueva']
+
+
+def test_superseded_task_is_cancelled_at_next_progress(runner):
+    runner, widget = runner
+    started = threading.Event()
+    stopped = []
+
+    def loop(task):
+        started.set()
+        try:
+            while True:
+                task.progress(0, 1)
+                time.sleep(0.001)
+        except TaskProgress.Cancelled:
+            stopped.append(task)
+            raise
+
+    first = runner.submit('consulta', loop, progress=True, on_done=pytest.fail)
+    started.wait(5)
+    runner.submit('consulta', lambda task: 'nueva', progress=True)
+    run_until_idle(runner, widget)
+    deadline = time.monotonic() + 5
+    while not stopped and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert stopped == [first]
+
+
+def test_errors_go_to_on_error(runner):
+    runner, widget = runner
+    errors = []
+    runner.submit('consulta', lambda: 1 / 0, on_error=errors.append)
+    run_until_idle(runner, widget)
+    assert isinstance(errors[0], ZeroDivisionError)
+
+
+def test_submit_without_runner_runs_in_place(monkeypatch):
+    monkeypatch.setattr(TaskRunner, '_runner', None)
+    results = []
+    assert TaskRunner.submit('suma', sum, ([1, 2],), on_done=results.append, progress=True) is None
+    assert results == [3]
+    with pytest.raises(ZeroDivisionError):
+        TaskRunner.submit('consulta', lambda: 1 / 0)
+
+
+def test_concurrent_queries_build_each_index_once(ticket_records, monkeypatch):
+    tickets = TicketModel.Tickets(ticket_records)
+    builds = []
+    cube = TicketModel.MonthlyCube
+
+    def counted_cube(*args):
+        builds.append(threading.get_ident())
+        return cube(*args)
+
+    monkeypatch.setattr(TicketModel, 'MonthlyCube', counted_cube)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def query():
+        barrier.wait()
+        results.append(tickets.cube().product_totals.most_common())
+
+    threads = [threading.Thread(target=query) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
+    assert results == [baseline.count_purchased_items(ticket_records)] * 8
+
+
+def test_cancelled_build_is_repeated_on_next_query(ticket_records):
+    tickets = TicketModel.Tickets(ticket_records * 60)
+    task = TaskProgress.Task('consulta', queue.Queue())
+    task.cancel()
+    with pytest.raises(TaskProgress.Cancelled):
+        tickets.cube(task)
+    assert tickets.cube().product_totals.most_common() == baseline.count_purchased_items(ticket_records * 60)
+
+
+def test_ticket_model_does_not_import_tkinter():
+    code = "import sys, TicketModel, TaskProgress; print('tkinter' in sys.modules)"
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(TicketModel.__file__)))
+    assert output.stdout.strip() == 'False'
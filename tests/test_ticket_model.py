@@ -0,0 +1,66 @@
+import pytest
+
+import TicketModel
+import TicketStore
+
+import baseline
+
+pytest.importorskip('tkinter')
+pytest.importorskip('tkcalendar')
+import AnalizadorDatos  # noqa: E402
+
+
+@pytest.fixture
+def tickets(ticket_records):
+    return TicketModel.Tickets(ticket_records)
+
+
+def test_total_expense_matches_baseline(tickets, ticket_records):
+    assert AnalizadorDatos.total_expense(tickets) == baseline.total_expense(ticket_records)
+    # Una lista de registros se convierte al modelo
+    assert AnalizadorDatos.total_expense(ticket_records) == baseline.total_expense(ticket_records)
+
+
+def test_purchased_items_match_baseline(tickets, ticket_records):
+    assert AnalizadorDatos.count_purchased_items(tickets) == baseline.count_purchased_items(ticket_records)
+    assert AnalizadorDatos.get_unique_products(tickets) == baseline.get_unique_products(ticket_records)
+
+
+@pytest.mark.parametrize('product', ["PAN BARRA", "AGUA MINERAL", "NO EXISTE"])
+def test_product_purchases_match_baseline(tickets, ticket_records, product):
+    assert AnalizadorDatos.product_purchases(tickets, product) == baseline.product_purchases(ticket_records, product)
+
+
+def test_products_are_interned(tickets, ticket_records):
+    assert len(tickets) == len(ticket_records)
+    assert sorted(tickets.products) == baseline.get_unique_products(ticket_records)
+    for ticket in tickets:
+        for item in ticket.items:
+            assert tickets.products[item.producto] == item.descripcion
+            assert tickets.product_id(item.descripcion) == item.producto
+    assert tickets.product_id("NO EXISTE") is None
+
+
+def test_bad_dates_are_reported_once(ticket_records, capsys):
+    tickets = TicketModel.Tickets(ticket_records)
+    assert tickets.bad_dates == ["31/02/2024 10:00"]
+    assert tickets[20].fecha is None
+    assert "1 tickets con fecha no válida" in capsys.readouterr().out
+
+
+def test_extend_updates_built_structures(ticket_records):
+    tickets = TicketModel.Tickets(ticket_records[:100])
+    tickets.cube()
+    tickets.product_index()
+    tickets.date_index()
+    assert tickets.extend(ticket_records[100:]) == 100
+    assert AnalizadorDatos.count_purchased_items(tickets) == baseline.count_purchased_items(ticket_records)
+    assert AnalizadorDatos.product_purchases(tickets, "PAN BARRA") == baseline.product_purchases(
+        ticket_records, "PAN BARRA")
+
+
+def test_load_reads_the_store(workdir, ticket_records):
+    TicketStore.append_records('mercadona_tickets.json', ticket_records)
+    tickets = TicketModel.load('mercadona_tickets.json')
+    assert AnalizadorDatos.count_purchased_items(tickets) == baseline.count_purchased_items(ticket_records)
+
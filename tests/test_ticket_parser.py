@@ -0,0 +1,93 @@
+import pytest
+
+import TicketParser
+
+MERCADONA_TEXT = "\n".join([
+    "MERCADONA, S.A. A-46103834",
+    "AVDA. DE LA CONSTITUCION 12",
+    "12/03/2024 18:45 OP: 123456",
+    "Descripción P. Unit Importe",
+    "2 LECHE ENTERA 1,70",
+    "1 PAN DE MOLDE 1,25",
+    "ESTA LINEA NO ES UN ARTICULO",
+    "TOTAL (€) 2,95",
+    "TARJETA BANCARIA",
+])
+
+RETURN_TEXT = "\n".join([
+    "MERCADONA, S.A. A-46103834",
+    "15/03/2024 10:05 OP: 654321",
+    "Descripción P. Unit Importe",
+    "-1 LECHE ENTERA -0,85",
+    "TOTAL (€) -0,85",
+])
+
+LIDL_TEXT = "\n".join([
+    "LIDL SUPERMERCADOS S.A.U.",
+    "C/ MAYOR 45",
+    "20/04/2024 11:30",
+    "EUR",
+    "PLATANOS 1,99 A",
+    "YOGUR NATURAL 0,89 A",
+    "Total 2,88",
+    "Tarjeta",
+])
+
+
+def test_parse_item_line_divides_importe_by_quantity():
+    assert TicketParser.parse_item_line("2 LECHE ENTERA 1,70") == {
+        "descripcion": "LECHE ENTERA", "cantidad": 2, "precio_unitario": pytest.approx(0.85)
+    }
+
+
+def test_parse_item_line_splits_quantity_glued_by_ocr():
+    item = TicketParser.parse_item_line("1PAN DE MOLDE 1,25")
+    assert item["cantidad"] == 1
+    assert item["descripcion"] == "PAN DE MOLDE"
+    assert item["precio_unitario"] == pytest.approx(1.25)
+
+
+@pytest.mark.parametrize("line", ["", "TOTAL (€) 2,95", "LECHE ENTERA", "0 BOLSA 0,15"])
+def test_parse_item_line_rejects_non_items(line):
+    assert TicketParser.parse_item_line(line) is None
+
+
+def test_parse_return_line_keeps_negative_values():
+    assert TicketParser.parse_return_line("-1 LECHE ENTERA -0,85") == {
+        "descripcion": "LECHE ENTERA", "cantidad": -1, "precio_unitario": pytest.approx(-0.85)
+    }
+
+
+def test_parse_mercadona_ticket():
+    ticket = TicketParser.parse_ticket(MERCADONA_TEXT)
+    assert ticket.grammar == TicketParser.GRAMMAR_MERCADONA
+    assert ticket.fecha_compra == "12/03/2024 18:45"
+    assert [item["descripcion"] for item in ticket.items] == ["LECHE ENTERA", "PAN DE MOLDE"]
+    assert ticket.precio_total == pytest.approx(2.95)
+    assert ticket.unmatched_lines == 1
+    assert ticket.to_record()["precio_total"] == 2.95
+
+
+def test_parse_return_ticket_is_negative():
+    ticket = TicketParser.parse_ticket(RETURN_TEXT, TicketParser.DOCUMENT_RETURN)
+    assert ticket.grammar == TicketParser.GRAMMAR_MERCADONA_RETURN
+    assert ticket.items == [
+        {"descripcion": "LECHE ENTERA", "cantidad": -1, "precio_unitario": pytest.approx(-0.85)}
+    ]
+    assert ticket.precio_total == pytest.approx(-0.85)
+
+
+def test_parse_lidl_ticket():
+    ticket = TicketParser.parse_ticket(LIDL_TEXT)
+    assert ticket.grammar == TicketParser.GRAMMAR_LIDL
+    assert ticket.fecha_compra == "20/04/2024 11:30"
+    assert [(item["descripcion"], item["cantidad"]) for item in ticket.items] == [
+        ("PLATANOS", 1), ("YOGUR NATURAL", 1)
+    ]
+    assert ticket.precio_total == pytest.approx(2.88)
+
+
+def test_unknown_store_has_no_items():
+    ticket = TicketParser.parse_ticket("TIENDA DESCONOCIDA\n1 ALGO 1,00\nTOTAL 1,00")
+    assert ticket.grammar is None
+    assert ticket.to_record() is None
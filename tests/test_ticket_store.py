@@ -0,0 +1,61 @@
+import json
+import os
+
+import TicketStore
+
+
+def test_records_are_appended_as_json_lines(workdir):
+    TicketStore.append_records('a.json', [{"n": 1}, {"n": 2}])
+    TicketStore.append_record('a.json', {"n": 3})
+    with open('a.jsonl', encoding='utf-8') as file:
+        assert [json.loads(line) for line in file] == [{"n": 1}, {"n": 2}, {"n": 3}]
+    assert not os.path.exists('a.json')
+    assert TicketStore.store_exists('a.json')
+
+
+def test_torn_line_is_skipped_and_compacted(workdir):
+    TicketStore.append_records('a.json', [{"n": 1}, {"n": 2}], assign_ids=True)
+    # Escritura cortada a mitad de un registro
+    with open('a.jsonl', 'ab') as file:
+        file.write(b'{"n": 3, "i')
+
+    assert [record["n"] for record in TicketStore.read_records('a.json')] == [1, 2]
+
+    TicketStore.append_records('a.json', [{"n": 4}], assign_ids=True)
+    with open('a.jsonl', encoding='utf-8') as file:
+        lines = file.read().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"n": 1, "id": 1}, {"n": 2, "id": 2}, {"n": 4, "id": 3}
+    ]
+    assert TicketStore.read_meta('a.json')["count"] == 3
+
+
+def test_compact_store_drops_blank_and_torn_lines(workdir):
+    TicketStore.append_records('a.json', [{"n": 1}])
+    with open('a.jsonl', 'ab') as file:
+        file.write(b'\n\n{"n": ')
+    assert TicketStore.compact_store('a.json') == 1
+    with open('a.jsonl', encoding='utf-8') as file:
+        assert file.read() == '{"n": 1}\n'
+
+
+def test_legacy_array_is_migrated_on_first_append(workdir):
+    legacy = [{"id": 1, "n": 1}, {"id": 7, "n": 2}]
+    with open('a.json', 'w', encoding='utf-8') as file:
+        json.dump(legacy, file)
+
+    # Antes de migrar se lee el array tal cual
+    assert TicketStore.read_records('a.json') == legacy
+
+    TicketStore.append_record('a.json', {"n": 3})
+    assert not os.path.exists('a.json')
+    with open('a.json.bak', encoding='utf-8') as file:
+        assert json.load(file) == legacy
+    assert TicketStore.read_records('a.json') == legacy + [{"n": 3}]
+
+
+def test_export_json_writes_legacy_array(workdir):
+    TicketStore.append_records('a.json', [{"n": 1}, {"n": 2}], assign_ids=True)
+    assert TicketStore.export_json('a.json', 'copia.json') == 2
+    with open('copia.json', encoding='utf-8') as file:
+        assert json.load(file) == [{"n": 1, "id": 1}, {"n": 2, "id": 2}]
@@ -0,0 +1,56 @@
+import pytest
+
+import SQLiteStore
+import TicketModel
+import TicketStore
+
+import baseline
+
+pytest.importorskip('tkinter')
+pytest.importorskip('tkcalendar')
+import AnalizadorDatos  # noqa: E402
+
+PAGES = [(1, 0), (3, 0), (3, 3), (4, 7), (5, 8), (10, 0), (2, 50), (0, 2)]
+
+
+def tied_records():
+    # Muchos empates: el orden entre ellos es el de primera aparición
+    items = [{"descripcion": f"PRODUCTO {number % 12}", "cantidad": 1 + number % 3, "precio_unitario": 1.0}
+             for number in range(60)]
+    return [{"id": index + 1, "fecha_compra": f"{index % 28 + 1:02d}/01/2024 10:00", "items": items[index::6],
+             "precio_total": 1.0} for index in range(6)]
+
+
+@pytest.fixture(params=['records', 'tied'])
+def records(request, ticket_records):
+    return ticket_records if request.param == 'records' else tied_records()
+
+
+@pytest.mark.parametrize('k, offset', PAGES)
+def test_pages_are_slices_of_the_ranking(records, k, offset):
+    tickets = TicketModel.Tickets(records)
+    ranking = baseline.count_purchased_items(records)
+    assert AnalizadorDatos.count_purchased_items(tickets) == ranking
+    assert AnalizadorDatos.top_purchased_items(tickets, k, offset) == ranking[offset:offset + k]
+
+
+def test_pages_cover_the_ranking(records):
+    tickets = TicketModel.Tickets(records)
+    pages = []
+    offset = 0
+    while True:
+        page = AnalizadorDatos.top_purchased_items(tickets, 4, offset)
+        if not page:
+            break
+        pages.extend(page)
+        offset += len(page)
+    assert pages == baseline.count_purchased_items(records)
+
+
+@pytest.mark.parametrize('k, offset', PAGES)
+def test_sqlite_pages_are_slices_of_the_ranking(workdir, records, k, offset):
+    TicketStore.append_records('mercadona_tickets.json', records)
+    queries = SQLiteStore.load_tickets('mercadona', 'mercadona_tickets.json', 'db.sqlite')
+    ranking = baseline.count_purchased_items(records)
+    assert AnalizadorDatos.count_purchased_items(queries) == ranking
+    assert AnalizadorDatos.top_purchased_items(queries, k, offset) == ranking[offset:offset + k]